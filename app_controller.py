@@ -1,12 +1,14 @@
-from glob import glob
-from serial.tools import list_ports
 from logging import getLogger, debug, info, error
-from os.path import expanduser, basename
-from customtkinter import CTkButton, CTkFrame
-from tkinter import filedialog, Event
+from os.path import expanduser, basename, exists, getsize
+from shutil import copyfile
+from customtkinter import CTkButton, CTkFrame, CTkInputDialog
+from tkinter import filedialog, messagebox, Event
+from threading import Event as ThreadingEvent
 from webbrowser import open_new
 from queue import Queue, Empty
-from typing import Optional, Callable, Tuple
+from itertools import groupby
+from operator import itemgetter
+from typing import Optional, Callable, Dict, Tuple, List
 from ui.base_ui import BaseUI
 from ui.frame_device_information import FrameDeviceInformation
 from ui.frame_erase_device import FrameEraseDevice
@@ -14,9 +16,27 @@ from ui.frame_firmware_flash import FrameFirmwareFlash
 from ui.frame_search_device import FrameSearchDevice
 from ui.frame_console import FrameConsole
 from ui.frame_plugins import FramePlugIns
+from ui.toplevel_file_browser import ToplevelFileBrowser
+from ui.toplevel_batch_flash import ToplevelBatchFlash
 from esptool_plugin.esptool_command_runner import CommandRunner
+from esptool_plugin.esptool_batch_runner import BatchCommandRunner, BatchResult
+from esptool_plugin.esptool_worker_pool import worker_pool
+from esptool_plugin.esptool_progress import ProgressEvent, ProgressKind
+from esptool_plugin.esptool_device_session import DeviceSession, OperationResult
+from esptool_plugin.esptool_baud_cache import baud_cache
+from esptool_plugin.esptool_firmware_catalog import FirmwareCatalog, FirmwareEntry
+from esptool_plugin.esptool_image import EspImage, ImageValidation
+from esptool_plugin.esptool_merge_builder import MergedImage, merge_builder
+from esptool_plugin.esptool_partition_table import Partition, PartitionTable
+from esptool_plugin.esptool_filesystem_image import FilesystemImage, filesystem_builder
 from serial_plugin.serial_command_runner import SerialCommandRunner
-from config.device_configuration import BAUDRATE_OPTIONS, DEFAULT_URL, CONFIGURED_DEVICES
+from serial_plugin.serial_connection_pool import connection_pool
+from serial_plugin.serial_device_watcher import DeviceWatcher
+from scheduler.job_scheduler import Job, JobScheduler, scheduler, batch_scheduler
+from config.application_configuration import (BAUD_PROBE_RATES, BAUD_PROBE_SIZE, FIRMWARE_STORE,
+                                               FIRMWARE_SEARCH_LIMIT, CONSOLE_POLL_INTERVAL, CONSOLE_LINES_PER_TICK)
+from config.device_configuration import (BAUDRATE_OPTIONS, BAUDRATE_AUTO, BAUDRATE_DEFAULT, DEFAULT_URL,
+                                         CONFIGURED_DEVICES)
 
 
 logger = getLogger(__name__)
@@ -40,16 +60,29 @@ class MicroPythonFirmwareStudio(BaseUI):
         self._console_queue: Queue = Queue()
         self.__device_path: Optional[str] = None
         self.__selected_chip: Optional[str] = None
-        self.__selected_baudrate: Optional[int] = 460800
+        self.__selected_baudrate: Optional[str] = BAUDRATE_AUTO
         self.__selected_firmware: Optional[str] = None
+        self.__firmware_validation: Optional[ImageValidation] = None
+        self.__extra_images: List[Tuple[int, str]] = []
+        self.__busy: bool = False
         self.__url: str = DEFAULT_URL
         self.__expert_mode: bool = False
+        self._file_browser: Optional[ToplevelFileBrowser] = None
+        self._batch_flash: Optional[ToplevelBatchFlash] = None
+        self._firmware_matches: Dict[str, FirmwareEntry] = {}
 
         self.esptool_runner = CommandRunner(
             on_output=self._handle_esptool_output,
             on_error=self._handle_esptool_error,
-            on_complete=self._handle_esptool_complete
+            on_complete=self._handle_esptool_complete,
+            on_progress=self._handle_esptool_progress
         )
+        self.serial_runner = SerialCommandRunner()
+        self.device_watcher = DeviceWatcher(
+            patterns=self._device_search_path,
+            on_change=self._handle_devices_changed
+        )
+        self.firmware_catalog = FirmwareCatalog(roots=[self._firmware_search_path, FIRMWARE_STORE])
 
         debug('Adding frames to UI and configuring elements')
         # Search Device
@@ -63,18 +96,25 @@ class MicroPythonFirmwareStudio(BaseUI):
         self.information.memory_info_btn.configure(command=lambda: self._esptool_command("flash_id"))
         self.information.mac_info_btn.configure(command=lambda: self._esptool_command("read_mac"))
         self.information.flash_status_btn.configure(command=lambda: self._esptool_command("read_flash_status"))
+        self.information.report_btn.configure(command=self._device_report)
+        self.information.baud_probe_btn.configure(command=self._probe_baudrate)
+        self.information.partition_btn.configure(command=self._show_partition_table)
         self.information.mac_info_btn.pack_forget()
         self.information.flash_status_btn.pack_forget()
 
         # Erase Device
         self.erase_device = FrameEraseDevice(self)
         self.erase_device.erase_btn.configure(command=lambda: self._esptool_command("erase_flash"))
+        self.erase_device.backup_btn.configure(command=self._backup_flash)
+        self.erase_device.restore_btn.configure(command=self._restore_flash)
 
         # PlugIns
         self.plugins = FramePlugIns(self)
-        self.plugins.mp_debug_btn.configure(command=self._handler_toplevel_serial_debug)
+        self.plugins.mp_monitor_btn.configure(command=self._toggle_serial_monitor)
         self.plugins.mp_version_btn.configure(command=self._get_version)
         self.plugins.mp_structure_btn.configure(command=self._get_structure)
+        self.plugins.mp_sync_btn.configure(command=self._sync_directory)
+        self.plugins.mp_filesystem_btn.configure(command=self._flash_filesystem)
         self.plugins.grid_remove()
 
         # Flash Firmware
@@ -82,12 +122,16 @@ class MicroPythonFirmwareStudio(BaseUI):
         self.flash_firmware.expert_mode.configure(command=self.toggle_expert_mode)
         self.flash_firmware.chip_option.configure(command=self._set_chip)
         self.flash_firmware.firmware_btn.configure(command=self._handle_firmware_selection)
+        self.flash_firmware.firmware_search.configure(command=self._select_catalog_firmware)
+        self.flash_firmware.firmware_search.bind("<KeyRelease>", self._search_firmware)
         self.flash_firmware.link_label.bind("<Button-1>", self.open_url)
-        self.flash_firmware.baudrate_option.set(str(self.__selected_baudrate))
+        self.flash_firmware.baudrate_option.set(self.__selected_baudrate)
         self.flash_firmware.baudrate_option.configure(command=self._set_baudrate)
         self.flash_firmware.baudrate_checkbox.select()
         self.flash_firmware.sector_input.bind("<KeyRelease>", self._handle_sector_input)
         self.flash_firmware.flash_btn.configure(command=self._flash_firmware_command)
+        self.flash_firmware.batch_flash_btn.configure(command=self._open_batch_flash)
+        self.flash_firmware.cancel_btn.configure(command=self._cancel_jobs)
         self.flash_firmware.flash_mode_label.grid_remove()
         self.flash_firmware.flash_mode_option.grid_remove()
         self.flash_firmware.flash_mode_info.grid_remove()
@@ -95,19 +139,37 @@ class MicroPythonFirmwareStudio(BaseUI):
         self.flash_firmware.flash_frequency_option.grid_remove()
         self.flash_firmware.flash_frequency_info.grid_remove()
         self.flash_firmware.flash_size_label.grid_remove()
+        self.flash_firmware.flash_size_option.configure(command=lambda selection: self._validate_firmware())
         self.flash_firmware.flash_size_option.grid_remove()
         self.flash_firmware.flash_size_info.grid_remove()
         self.flash_firmware.erase_before_label.grid_remove()
         self.flash_firmware.erase_before_switch.grid_remove()
         self.flash_firmware.erase_before_info.grid_remove()
+        self.flash_firmware.images_btn.configure(command=self._add_flash_image)
+        self.flash_firmware.images_clear_btn.configure(command=self._clear_flash_images)
+        self.flash_firmware.merge_btn.configure(command=self._build_merged_image)
+        self.flash_firmware.images_label.grid_remove()
+        self.flash_firmware.images_btn.grid_remove()
+        self.flash_firmware.images_clear_btn.grid_remove()
+        self.flash_firmware.images_info.grid_remove()
+        self.flash_firmware.merge_btn.grid_remove()
 
         # Console
         self.console = FrameConsole(self)
         self.console.console_text.bind("<Key>", BaseUI._block_text_input)
 
-        # search for devices on the start
-        debug('Searching for USB devices')
-        self._search_devices()
+        # start an esptool worker ahead of the first command
+        worker_pool.warm_up()
+
+        # update the firmware index in the background, searches use the stored index meanwhile
+        scheduler.submit(lambda job: self.firmware_catalog.refresh(),
+                         name='Firmware index',
+                         priority=JobScheduler.LOW,
+                         callback=lambda changed: self.after(0, self._search_firmware))
+
+        # watch for devices from the start
+        debug('Watching for USB devices')
+        self.device_watcher.start()
 
         # poll the console queue for new lines
         debug('Starting console queue poll')
@@ -135,8 +197,8 @@ class MicroPythonFirmwareStudio(BaseUI):
         if self.flash_firmware.expert_mode.get():
             debug('Expert mode enabled')
             self.__expert_mode = True
-            self.information.mac_info_btn.pack(padx=10, pady=5)
-            self.information.flash_status_btn.pack(padx=10, pady=5)
+            self.information.mac_info_btn.pack(padx=10, pady=5, before=self.information.report_btn)
+            self.information.flash_status_btn.pack(padx=10, pady=5, before=self.information.report_btn)
             self.plugins.grid(row=3, column=0, padx=10, pady=5, sticky="nsew")
             self.flash_firmware.flash_mode_label.grid(row=5, column=0, padx=10, pady=5, sticky="w")
             self.flash_firmware.flash_mode_option.grid(row=5, column=1, padx=10, pady=5, sticky="w")
@@ -150,6 +212,11 @@ class MicroPythonFirmwareStudio(BaseUI):
             self.flash_firmware.erase_before_label.grid(row=8, column=0, padx=10, pady=5, sticky="w")
             self.flash_firmware.erase_before_switch.grid(row=8, column=1, padx=10, pady=5, sticky="w")
             self.flash_firmware.erase_before_info.grid(row=8, column=3, columnspan=3, padx=10, pady=5, sticky="w")
+            self.flash_firmware.images_label.grid(row=9, column=0, padx=10, pady=5, sticky="w")
+            self.flash_firmware.images_btn.grid(row=9, column=1, padx=10, pady=5, sticky="w")
+            self.flash_firmware.images_clear_btn.grid(row=9, column=3, padx=10, pady=5, sticky="w")
+            self.flash_firmware.images_info.grid(row=9, column=4, padx=10, pady=5, sticky="w")
+            self.flash_firmware.merge_btn.grid(row=9, column=5, padx=10, pady=5, sticky="e")
         else:
             debug('Expert mode disabled')
             self.__expert_mode = False
@@ -168,27 +235,75 @@ class MicroPythonFirmwareStudio(BaseUI):
             self.flash_firmware.erase_before_label.grid_remove()
             self.flash_firmware.erase_before_switch.grid_remove()
             self.flash_firmware.erase_before_info.grid_remove()
+            self.flash_firmware.images_label.grid_remove()
+            self.flash_firmware.images_btn.grid_remove()
+            self.flash_firmware.images_clear_btn.grid_remove()
+            self.flash_firmware.images_info.grid_remove()
+            self.flash_firmware.merge_btn.grid_remove()
+
+    def destroy(self) -> None:
+        """
+        Stops the device watcher, cancels all jobs and closes all pooled serial
+        connections and idle esptool workers before the application terminates.
+
+        :return: None
+        """
+        self.device_watcher.stop()
+        scheduler.cancel_all()
+        batch_scheduler.cancel_all()
+        connection_pool.close_all()
+        worker_pool.close_all()
+        super().destroy()
+
+    def _console_print(self, text: str, tag: str = "normal") -> None:
+        """
+        Posts text with a tag to the console queue, so it is shown batched with the
+        other output and does not move the view while the user scrolls back. The
+        queue is thread-safe, so this can be called from any thread.
+
+        :param text: The text to be displayed, a trailing newline ends the line.
+        :type text: str
+        :param tag: The tag of the text, e.g. "info" or "error".
+        :type tag: str, optional
+        :return: None
+        """
+        self._console_queue.put((text[:-1] if text.endswith('\n') else text, tag))
 
     def _poll_console_queue(self) -> None:
         """
         Polls the console queue for new messages and updates the text widget
         with messages retrieved from the queue. Continuously checks the
-        console queue at regular intervals, inserts retrieved lines into
-        the text widget, and ensures the view stays scrolled to the most
-        recent message.
+        console queue at regular intervals and appends the retrieved lines
+        with one insert per tag. At most a fixed number of lines is taken per
+        poll, the rest follows with the next poll, so the UI stays responsive.
 
         :raises Empty: This is silently handled within the method logic when the queue is empty.
         :return: None
         """
+        entries = []
+
         try:
-            while True:
-                line = self._console_queue.get_nowait()
-                self.console.console_text.insert("end", f'{line}\n', "normal")
-                self.console.console_text.see("end")
+            while len(entries) < CONSOLE_LINES_PER_TICK:
+                entry = self._console_queue.get_nowait()
+                entries.append(entry if isinstance(entry, tuple) else (str(entry), "normal"))
         except Empty:
             pass
 
-        self.after(100, self._poll_console_queue)
+        for tag, group in groupby(entries, key=itemgetter(1)):
+            self.console.append([text for text, _ in group], tag)
+
+        self.after(CONSOLE_POLL_INTERVAL, self._poll_console_queue)
+
+    def _cancel_jobs(self) -> None:
+        """
+        Cancels all running and queued jobs, which kills running esptool commands
+        and interrupts serial operations.
+
+        :return: None
+        """
+        cancelled = scheduler.cancel_all() + batch_scheduler.cancel_all()
+        info(f'Cancelled {cancelled} jobs')
+        self._console_print(f'[INFO] Cancelled {cancelled} jobs\n', "info")
 
     def _delete_console(self) -> None:
         """
@@ -216,7 +331,9 @@ class MicroPythonFirmwareStudio(BaseUI):
         for button in buttons:
             button.configure(state='disabled')
 
+        self.__busy = True
         self.flash_firmware.flash_btn.configure(state='disabled')
+        self.flash_firmware.batch_flash_btn.configure(state='disabled')
 
     def _enable_buttons(self) -> None:
         """
@@ -236,32 +353,75 @@ class MicroPythonFirmwareStudio(BaseUI):
         for button in buttons:
             button.configure(state='normal')
 
-        self.flash_firmware.flash_btn.configure(state='normal')
+        self.__busy = False
+        self._update_flash_buttons()
+
+    def _update_flash_buttons(self) -> None:
+        """
+        Enables the flash buttons unless a command is running or the selected
+        firmware is still being validated or failed the validation.
+
+        :return: None
+        """
+        validated = not self.__selected_firmware or (self.__firmware_validation is not None
+                                                     and self.__firmware_validation.valid)
+        state = 'normal' if validated and not self.__busy else 'disabled'
+
+        self.flash_firmware.flash_btn.configure(state=state)
+        self.flash_firmware.batch_flash_btn.configure(state=state)
 
     def _search_devices(self) -> None:
+        """
+        Requests an immediate rescan of the connected devices. The device watcher
+        updates the dropdown menu in the background, so this never blocks the UI.
+
+        :return: None
+        """
+        self.device_watcher.rescan()
+
+    def _handle_devices_changed(self, devices: List[str], added: List[str], removed: List[str]) -> None:
+        """
+        Handles a change of the connected devices by scheduling a dropdown update.
+
+        :param devices: All connected devices.
+        :type devices: List[str]
+        :param added: The devices which appeared.
+        :type added: List[str]
+        :param removed: The devices which disappeared.
+        :type removed: List[str]
+        :return: None
+        """
+        for port in added:
+            info(f'Device connected: {port} ({self.device_watcher.info(port)})')
+
+        for port in removed:
+            info(f'Device disconnected: {port}')
+            connection_pool.close(port)
+
+        self.after(0, lambda: self._update_devices(devices))
+
+    def _update_devices(self, devices: List[str]) -> None:
         """
         Updates the device dropdown menu with a list of available devices. If there are no
         connected devices, sets "No devices found" as the only dropdown value.
 
+        :param devices: All connected devices.
+        :type devices: List[str]
         :return: None
         """
         current_selection = self.search_device.device_option.get()
 
-        if self._current_platform in ["Linux", "Darwin"]:
-            devices = glob(self._device_search_path)
-        else:
-            devices = [port.device for port in list_ports.comports()]
-
         if not devices:
             devices = ['No devices found']
         else:
-            devices.insert(0, 'Select Device')
+            devices = ['Select Device'] + devices
 
         debug(f'Devices: {devices}')
         self.search_device.device_option.configure(values=devices)
 
         if current_selection in devices:
             self.search_device.device_option.set(current_selection)
+            self._set_device(current_selection)
         else:
             self.search_device.device_option.set(devices[0])
             self._set_device(None)
@@ -278,7 +438,9 @@ class MicroPythonFirmwareStudio(BaseUI):
         if selected_device and selected_device not in ("Select Device", "No devices found"):
             info(f'Selected device: {selected_device}')
             self.__device_path = selected_device
-            self.search_device.label.configure(text=f'Device Path: {self.__device_path}')
+            device_info = self.device_watcher.info(selected_device)
+            details = f' ({device_info})' if device_info and str(device_info) else ''
+            self.search_device.label.configure(text=f'Device Path: {self.__device_path}{details}')
         else:
             self.__device_path = None
             self.search_device.label.configure(text='Device Path:')
@@ -318,7 +480,7 @@ class MicroPythonFirmwareStudio(BaseUI):
         debug(f'Selected baudrate: {selection}')
 
         if selection and selection in BAUDRATE_OPTIONS:
-            self.__selected_baudrate = int(selection)
+            self.__selected_baudrate = selection
             self.flash_firmware.baudrate_checkbox.select()
         else:
             self.__selected_baudrate = None
@@ -327,7 +489,8 @@ class MicroPythonFirmwareStudio(BaseUI):
     def _handle_sector_input(self, event: Optional[Event] = None) -> None:
         """
         Handles changes to the sector input field and updates the sector checkbox
-        state accordingly.
+        state accordingly. A valid address starts a new check of the selected
+        firmware, as whether it fits into the flash depends on it.
 
         :param event: An optional event object representing a UI change.
         :return: None
@@ -339,6 +502,9 @@ class MicroPythonFirmwareStudio(BaseUI):
             self.flash_firmware.sector_checkbox.select()
         except ValueError:
             self.flash_firmware.sector_checkbox.deselect()
+            return
+
+        self._validate_firmware()
 
     def _handle_firmware_selection(self) -> None:
         """
@@ -356,26 +522,169 @@ class MicroPythonFirmwareStudio(BaseUI):
         debug(f'Selected firmware: {file_path}')
 
         if file_path:
-            self.__selected_firmware = file_path
-            self.flash_firmware.firmware_checkbox.select()
-            self.flash_firmware.firmware_btn.configure(text=str(basename(file_path)[:15]))
+            self._use_firmware(file_path)
         else:
             self.__selected_firmware = None
+            self.__firmware_validation = None
+            self.flash_firmware.firmware_checkbox.deselect()
+            self._update_flash_buttons()
+
+    def _search_firmware(self, event: Optional[Event] = None) -> None:
+        """
+        Shows the indexed firmware files matching the search text in the firmware
+        search box. Only the stored index is searched, no directory is scanned.
+
+        :param event: An optional event object representing a UI change.
+        :return: None
+        """
+        _ = event
+
+        text = self.flash_firmware.firmware_search.get()
+        if text in self._firmware_matches:
+            return
+
+        matches = self.firmware_catalog.search(text)[:FIRMWARE_SEARCH_LIMIT]
+        self._firmware_matches = {str(entry): entry for entry in matches}
+        self.flash_firmware.firmware_search.configure(values=list(self._firmware_matches))
+
+    def _select_catalog_firmware(self, selection: str) -> None:
+        """
+        Selects a firmware file from the search results.
+
+        :param selection: The selected search result.
+        :type selection: str
+        :return: None
+        """
+        entry = self._firmware_matches.get(selection)
+        if entry:
+            self._use_firmware(entry.path)
+
+    def _use_firmware(self, file_path: str) -> None:
+        """
+        Selects a firmware file and adds it to the index in the background. The
+        chip and flash address detected from its image header are set once the
+        file has been indexed.
+
+        :param file_path: The path of the firmware file.
+        :type file_path: str
+        :return: None
+        """
+        self.__selected_firmware = file_path
+        self.flash_firmware.firmware_checkbox.select()
+        self.flash_firmware.firmware_btn.configure(text=str(basename(file_path)[:15]))
+
+        scheduler.submit(lambda job: self.firmware_catalog.lookup(file_path),
+                         name=f'Index {basename(file_path)}',
+                         priority=JobScheduler.HIGH,
+                         callback=lambda entry: self.after(0, lambda: self._apply_firmware_entry(file_path, entry)),
+                         on_error=lambda message: self.after(0, lambda: self._apply_firmware_entry(file_path, None)))
+
+    def _apply_firmware_entry(self, file_path: str, entry: Optional[FirmwareEntry]) -> None:
+        """
+        Sets the chip and flash address of an indexed firmware and starts its check,
+        unless another firmware was selected meanwhile.
+
+        :param file_path: The path of the firmware file.
+        :type file_path: str
+        :param entry: The index entry of the firmware, or None if it could not be indexed.
+        :type entry: Optional[FirmwareEntry]
+        :return: None
+        """
+        if file_path != self.__selected_firmware:
+            return
+
+        if not entry or entry.chip is None:
+            info(f'No chip detected for firmware {file_path}')
+            self._validate_firmware()
+            return
+
+        device = next((name for name, config in CONFIGURED_DEVICES.items() if config['name'] == entry.chip), None)
+        info(f'Detected firmware {entry}, {entry.kind} image')
+
+        if device and CONFIGURED_DEVICES.get(self.flash_firmware.chip_option.get(), {}).get('name') != entry.chip:
+            self.flash_firmware.chip_option.set(device)
+            self._set_chip(device)
+
+        self.flash_firmware.sector_input.delete(0, "end")
+        self.flash_firmware.sector_input.insert(0, hex(entry.offset))
+        self._handle_sector_input()
+
+    def _validate_firmware(self) -> None:
+        """
+        Starts the pre-flight check of the selected firmware in the background. The
+        flash buttons stay disabled until the image passed the check.
+
+        :return: None
+        """
+        path = self.__selected_firmware
+        if not path:
+            return
+
+        try:
+            offset = int(self.flash_firmware.sector_input.get().strip(), 0)
+        except ValueError:
+            offset = None
+
+        flash_size = self.flash_firmware.flash_size_option.get() if self.__expert_mode else None
+        if flash_size in ('keep', 'detect'):
+            flash_size = None
+
+        self.__firmware_validation = None
+        self._update_flash_buttons()
+        self.flash_firmware.progress_label.configure(text=f'Validating {basename(path)}...')
+
+        scheduler.submit(lambda job: EspImage.validate(path, offset, flash_size),
+                         name=f'Validate {basename(path)}',
+                         priority=JobScheduler.HIGH,
+                         callback=lambda result: self.after(
+                             0, lambda: self._handle_firmware_validation(result, offset)),
+                         on_error=lambda message: self.after(0, lambda: self._handle_firmware_validation(
+                             ImageValidation(path, False, [message], None, 0, '', []), offset)))
+
+    def _handle_firmware_validation(self, result: ImageValidation, offset: Optional[int]) -> None:
+        """
+        Shows the result of a firmware check and gates the flash buttons. Results
+        of a firmware which is no longer selected, or of a changed flash address,
+        are ignored.
+
+        :param result: The result of the check.
+        :type result: ImageValidation
+        :param offset: The flash address the firmware was checked at.
+        :type offset: Optional[int]
+        :return: None
+        """
+        try:
+            current = int(self.flash_firmware.sector_input.get().strip(), 0)
+        except ValueError:
+            current = None
+
+        if result.path != self.__selected_firmware or current != offset:
+            return
+
+        self.__firmware_validation = result
+        self.flash_firmware.progress_label.configure(text=str(result))
+
+        if result.valid:
+            info(f'Firmware validated: {result}')
+            self.flash_firmware.firmware_checkbox.select()
+
+            for warning in result.warnings:
+                self._console_print(f'[WARNING] {warning}\n', "info")
+        else:
+            error(f'Firmware validation failed: {result}')
             self.flash_firmware.firmware_checkbox.deselect()
+            self._console_print(f'[ERROR] {result}\n', "error")
+
+        self._update_flash_buttons()
 
-    def _handle_serial_output(self, output: str, context: Optional[str] = None) -> None:
+    def _handle_serial_output(self, output: str) -> None:
         """
         Handles the processing and queuing of serial output in the application.
 
         :param output: The output to be queued for processing.
         :type output: str
-        :param context: An optional context string indicating the type of output.
-        :type context: Optional[str]
         :return: None
         """
-        if context == "structure":
-            output = f"root\n{output}"
-
         self._console_queue.put(output)
         self.after(0, self._enable_buttons)
 
@@ -394,29 +703,50 @@ class MicroPythonFirmwareStudio(BaseUI):
 
         if not self.__device_path:
             error('No device selected!')
-            self.console.console_text.insert("end", '[ERROR] No device selected!\n', "error")
+            self._console_print('[ERROR] No device selected!\n', "error")
             return
 
         self._disable_buttons()
-        self.console.console_text.insert("end", f'[INFO] {info_text}...\n', "info")
+        self._console_print(f'[INFO] {info_text}...\n', "info")
+
+        command(self.serial_runner)
 
-        runner = SerialCommandRunner()
-        command(runner)
+    def _handle_monitor_stopped(self, output: str) -> None:
+        """
+        Handles the end of a serial monitor session and restores the monitor button.
+
+        :param output: The final message of the serial monitor.
+        :type output: str
+        :return: None
+        """
+        self._console_queue.put(output)
+        self.after(0, self._enable_buttons)
+        self.after(0, lambda: self.plugins.mp_monitor_btn.configure(text='Start Monitor'))
 
-    def _handler_toplevel_serial_debug(self) -> None:
+    def _toggle_serial_monitor(self) -> None:
         """
-        Handles the creation or focus of a top-level debug window.
+        Starts a continuous serial monitor which streams the device output into the
+        console, or stops the running monitor.
 
         :return: None
         """
+        if self.serial_runner.monitor_running:
+            info('Stop Serial monitor')
+            self.serial_runner.stop_monitor()
+            return
+
         self._run_serial_task(
-            info_text="Start Serial debugging",
-            command=lambda runner: runner.get_debug(
+            info_text="Start Serial monitor",
+            command=lambda runner: runner.start_monitor(
                 port=self.__device_path,
-                callback=lambda output: self._handle_serial_output(output)
+                on_line=self._console_queue.put,
+                callback=self._handle_monitor_stopped
             )
         )
 
+        if self.serial_runner.monitor_running:
+            self.plugins.mp_monitor_btn.configure(state='normal', text='Stop Monitor')
+
     def _get_version(self) -> None:
         """
         Triggers a task to get the MicroPython version and process its output.
@@ -431,20 +761,300 @@ class MicroPythonFirmwareStudio(BaseUI):
             )
         )
 
-    def _get_structure(self) -> None:
+    def _sync_directory(self) -> None:
         """
-        Triggers a task to get the file structure and process its output.
+        Asks for a local project directory and the target directory on the device and
+        uploads the new or changed files. The target defaults to a directory named
+        like the project; stale files below it are deleted only after confirmation.
 
         :return: None
         """
+        local_dir = filedialog.askdirectory(title='Select Project Folder')
+        if not local_dir:
+            return
+
+        default = f'/{basename(local_dir.rstrip("/"))}'
+        dialog = CTkInputDialog(text=f'Target directory on the device, empty for {default}', title='Target Directory')
+        remote_dir = dialog.get_input()
+        if remote_dir is None:
+            return
+
+        remote_dir = remote_dir.strip() or default
+
         self._run_serial_task(
-            info_text="Getting device structure",
-            command=lambda runner: runner.get_structure(
+            info_text=f"Synchronizing {local_dir} to {remote_dir}",
+            command=lambda runner: runner.sync_directory(
                 port=self.__device_path,
-                callback=lambda output: self._handle_serial_output(output, "structure")
+                local_dir=local_dir,
+                callback=lambda output: self._handle_serial_output(output),
+                remote_dir=remote_dir,
+                delete=bool(self.plugins.mp_sync_delete_checkbox.get()),
+                progress=self._console_queue.put,
+                confirm=lambda paths: self._confirm_from_job('Delete Stale Files',
+                                                             self._deletion_message(paths, remote_dir))
             )
         )
 
+    @staticmethod
+    def _deletion_message(paths: List[str], remote_dir: str, limit: int = 20) -> str:
+        """
+        Creates the question whether device files are deleted, listing the first files.
+
+        :param paths: The device paths of the files.
+        :type paths: List[str]
+        :param remote_dir: The target directory on the device.
+        :type remote_dir: str
+        :param limit: The maximum number of listed files.
+        :type limit: int, optional
+        :return: The question.
+        :rtype: str
+        """
+        listed = '\n'.join(paths[:limit])
+        more = f'\n... and {len(paths) - limit} more' if len(paths) > limit else ''
+        return f'Delete {len(paths)} files below {remote_dir} which are not part of the project?\n\n{listed}{more}'
+
+    def _confirm_from_job(self, title: str, message: str) -> bool:
+        """
+        Asks a yes/no question from a background job and waits for the answer,
+        the dialog itself is shown by the UI thread.
+
+        :param title: The title of the dialog.
+        :type title: str
+        :param message: The question.
+        :type message: str
+        :return: True if the user confirmed.
+        :rtype: bool
+        """
+        answered = ThreadingEvent()
+        answer = []
+
+        def ask() -> None:
+            answer.append(messagebox.askyesno(title=title, message=message, icon='warning'))
+            answered.set()
+
+        self.after(0, ask)
+        answered.wait()
+        return bool(answer[0])
+
+    def _flash_filesystem(self) -> None:
+        """
+        Asks for a local project directory, builds a LittleFS image of it on the host
+        and flashes the image to the filesystem partition of the selected device. The
+        partition is taken from the partition table of the device, and only the
+        sectors which differ from the flash content are written.
+
+        :return: None
+        """
+        self._delete_console()
+
+        if not self.__device_path:
+            error('No device selected!')
+            self._console_print('[ERROR] No device selected!\n', "error")
+            return
+
+        local_dir = filedialog.askdirectory(title='Select Project Folder')
+        if not local_dir:
+            return
+
+        if not messagebox.askyesno(title='Replace Filesystem',
+                                   message=f'The filesystem of the device is replaced by the files of {local_dir}.\n\n'
+                                           f'All files currently on the device are lost. Continue?',
+                                   icon='warning'):
+            return
+
+        port = self.__device_path
+        chip = self.__selected_chip if self.__selected_chip else "auto"
+        baud = self._flash_baudrate(port)
+        session = DeviceSession(
+            on_output=self._handle_esptool_output,
+            on_error=self._handle_esptool_error,
+            on_progress=self._handle_esptool_progress
+        )
+
+        def flash(job: Job) -> Tuple[Partition, FilesystemImage, List[OperationResult]]:
+            results = session.execute_session(port, [DeviceSession.operation('read_partition_table')],
+                                              chip=chip, baud=baud, reset=False, job=job)
+            if not results or not results[0].success:
+                raise RuntimeError(f'Reading the partition table failed: {results[0].error if results else "aborted"}')
+
+            partition = PartitionTable.filesystem(PartitionTable.parse(bytes.fromhex(results[0].data['data'])))
+            if partition is None:
+                raise ValueError('The partition table has no filesystem partition')
+
+            self._console_queue.put(f'Filesystem partition: {partition}')
+            image = filesystem_builder.build(local_dir, partition.size)
+            job.check_cancelled()
+
+            results = session.execute_session(port, [DeviceSession.write_flash_diff(partition.offset, image.path)],
+                                              chip=chip, baud=baud, job=job)
+            return partition, image, results
+
+        def handle_result(result: Tuple[Partition, FilesystemImage, List[OperationResult]]) -> None:
+            partition, image, results = result
+            state = 'from cache' if image.cached else 'built'
+            self._console_queue.put(f'\nLittleFS image of {image.files} files {state}, '
+                                    f'flashed to {partition.label} at 0x{partition.offset:x}')
+            self._handle_flash_session(results)
+
+        def handle_error(message: str) -> None:
+            self._console_print(f'[ERROR] {message}', "error")
+            self.after(0, self._enable_buttons)
+
+        self._disable_buttons()
+        self._console_print(f'[INFO] Flashing LittleFS image of {local_dir} to {port}\n\n', "info")
+        scheduler.submit(flash,
+                         name=f'Filesystem image on {port}',
+                         port=port,
+                         priority=JobScheduler.HIGH,
+                         callback=handle_result,
+                         on_error=handle_error)
+
+    def _load_directory(self, browser: ToplevelFileBrowser, port: str, path: str, refresh: bool) -> None:
+        """
+        Requests the entries of a device directory for the file browser.
+
+        :param browser: The file browser which shows the entries.
+        :type browser: ToplevelFileBrowser
+        :param port: The serial port of the device.
+        :type port: str
+        :param path: The device directory path.
+        :type path: str
+        :param refresh: Whether a cached listing is bypassed.
+        :type refresh: bool
+        :return: None
+        """
+        self.serial_runner.list_directory(
+            port=port,
+            path=path,
+            callback=lambda directory, entries: self.after(0, lambda: browser.show_entries(directory, entries)),
+            on_error=lambda message: self.after(0, lambda: browser.show_error(message)),
+            refresh=refresh
+        )
+
+    def _handle_transfer_progress(self, browser: ToplevelFileBrowser, done: int, total: int, rate: float) -> None:
+        """
+        Shows the progress and throughput of a file transfer in the file browser.
+
+        :param browser: The file browser which shows the progress.
+        :type browser: ToplevelFileBrowser
+        :param done: The number of bytes transferred so far.
+        :type done: int
+        :param total: The total number of bytes.
+        :type total: int
+        :param rate: The transfer rate in bytes/s.
+        :type rate: float
+        :return: None
+        """
+        percent = done * 100 // total if total else 100
+        self.after(0, lambda: browser.show_status(f'{done}/{total} bytes ({percent} %), {rate / 1024:.1f} kB/s'))
+
+    def _handle_transfer_complete(self, browser: ToplevelFileBrowser, output: str, directory: Optional[str]) -> None:
+        """
+        Shows the result of a file transfer and lists the changed directory again.
+
+        :param browser: The file browser which started the transfer.
+        :type browser: ToplevelFileBrowser
+        :param output: The transfer summary or error message.
+        :type output: str
+        :param directory: The device directory which changed, if any.
+        :type directory: Optional[str]
+        :return: None
+        """
+        self._console_queue.put(output)
+
+        def update() -> None:
+            browser.show_status(output)
+            if directory:
+                browser.request(directory, refresh=False)
+
+        self.after(0, update)
+
+    def _upload_file(self, browser: ToplevelFileBrowser, port: str, directory: str) -> None:
+        """
+        Asks for a local file and uploads it into a device directory.
+
+        :param browser: The file browser which started the upload.
+        :type browser: ToplevelFileBrowser
+        :param port: The serial port of the device.
+        :type port: str
+        :param directory: The device directory to upload into.
+        :type directory: str
+        :return: None
+        """
+        local_path = filedialog.askopenfilename(parent=browser, title='Select File to Upload')
+        if not local_path:
+            return
+
+        remote_path = f"{directory.rstrip('/')}/{basename(local_path)}"
+        info(f'Uploading {local_path} to {remote_path}')
+
+        self.serial_runner.put_file(
+            port=port,
+            local_path=local_path,
+            remote_path=remote_path,
+            callback=lambda output: self._handle_transfer_complete(browser, output, directory),
+            progress=lambda done, total, rate: self._handle_transfer_progress(browser, done, total, rate)
+        )
+
+    def _download_file(self, browser: ToplevelFileBrowser, port: str, remote_path: str) -> None:
+        """
+        Asks for a local target file and downloads a device file to it.
+
+        :param browser: The file browser which started the download.
+        :type browser: ToplevelFileBrowser
+        :param port: The serial port of the device.
+        :type port: str
+        :param remote_path: The path of the file on the device.
+        :type remote_path: str
+        :return: None
+        """
+        local_path = filedialog.asksaveasfilename(parent=browser,
+                                                  title='Save Device File',
+                                                  initialfile=basename(remote_path))
+        if not local_path:
+            return
+
+        info(f'Downloading {remote_path} to {local_path}')
+
+        self.serial_runner.get_file(
+            port=port,
+            remote_path=remote_path,
+            local_path=local_path,
+            callback=lambda output: self._handle_transfer_complete(browser, output, None),
+            progress=lambda done, total, rate: self._handle_transfer_progress(browser, done, total, rate)
+        )
+
+    def _get_structure(self) -> None:
+        """
+        Opens the file browser for the selected device, or focuses it if it is already open.
+
+        :return: None
+        """
+        info('Open device file browser')
+
+        if not self.__device_path:
+            error('No device selected!')
+            self._delete_console()
+            self._console_print('[ERROR] No device selected!\n', "error")
+            return
+
+        if self._file_browser and self._file_browser.winfo_exists():
+            if self._file_browser.port == self.__device_path:
+                self._file_browser.focus()
+                return
+
+            self._file_browser.destroy()
+
+        port = self.__device_path
+        self._file_browser = ToplevelFileBrowser(
+            self,
+            port=port,
+            loader=lambda path, refresh: self._load_directory(self._file_browser, port, path, refresh),
+            on_upload=lambda directory: self._upload_file(self._file_browser, port, directory),
+            on_download=lambda remote_path: self._download_file(self._file_browser, port, remote_path)
+        )
+        self._file_browser.request('/', refresh=False)
+
     def _handle_esptool_output(self, text: str) -> None:
         """
         Handles the output by scheduling a task for posting the text to the console queue.
@@ -457,13 +1067,39 @@ class MicroPythonFirmwareStudio(BaseUI):
 
     def _handle_esptool_error(self, text: str) -> None:
         """
-        Handles errors by updating the console text widget with the provided error message.
+        Handles errors by posting the provided error message to the console queue.
 
         :param text: The error message to be displayed in the console.
         :type text: str
         :return: None
         """
-        self.after(0, lambda: self.console.console_text.insert("end", f'[ERROR] {text}\n', "error"))
+        self._console_print(f'[ERROR] {text}', "error")
+
+    def _handle_esptool_progress(self, event: ProgressEvent) -> None:
+        """
+        Handles a progress event by scheduling an update of the progress bar. Events
+        arrive throttled, so the UI is updated only a few times per second.
+
+        :param event: The progress event of the running command.
+        :type event: ProgressEvent
+        :return: None
+        """
+        self.after(0, lambda: self._show_progress(event))
+
+    def _show_progress(self, event: ProgressEvent) -> None:
+        """
+        Shows a progress event in the progress bar and its label.
+
+        :param event: The progress event of the running command.
+        :type event: ProgressEvent
+        :return: None
+        """
+        if event.percent is not None:
+            self.flash_firmware.progress_bar.set(event.percent / 100)
+        elif event.kind == ProgressKind.CONNECT:
+            self.flash_firmware.progress_bar.set(0)
+
+        self.flash_firmware.progress_label.configure(text=str(event))
 
     def _handle_esptool_complete(self) -> None:
         """
@@ -487,75 +1123,842 @@ class MicroPythonFirmwareStudio(BaseUI):
         allowed_commands = {"chip_id", "flash_id", "read_mac", "read_flash_status", "erase_flash"}
         if command_name not in allowed_commands:
             error(f'Invalid command: {command_name}')
-            self.console.console_text.insert("end", f'[ERROR] Invalid command: {command_name}\n', "error")
+            self._console_print(f'[ERROR] Invalid command: {command_name}\n', "error")
             return
 
         if not self.__device_path:
             error('No device selected!')
-            self.console.console_text.insert("end", '[ERROR] No device selected!\n', "error")
+            self._console_print('[ERROR] No device selected!\n', "error")
             return
 
         chip = self.__selected_chip if self.__selected_chip else "auto"
-        cmd = ["python", "-m", "esptool",
-               "-c", chip,
-               "-p",
-               self.__device_path,
+        cmd = ["-c", chip,
+               "-p", self.__device_path,
                command_name]
 
         self._disable_buttons()
-        self.console.console_text.insert("end", f'[INFO] {" ".join(cmd)}\n\n', "info")
+        self._console_print(f'[INFO] esptool {" ".join(cmd)}\n\n', "info")
         self.esptool_runner.run_threaded_command(command=cmd)
 
-    def _flash_firmware_command(self) -> None:
+    def _device_report(self) -> None:
         """
-        Validate and prepares the esptool flash firmware command based on user input.
+        Reads chip, MAC address, flash id and flash status over a single esptool
+        connection and shows the results as a report.
 
         :return: None
         """
-        info('Prepare esptool command for: firmware flash')
+        info('Prepare esptool session for: device report')
         self._delete_console()
 
-        errors = []
         if not self.__device_path:
-            errors.append('No device path selected')
+            error('No device selected!')
+            self._console_print('[ERROR] No device selected!\n', "error")
+            return
 
-        if not self.__selected_chip:
-            errors.append('No chip selected')
+        chip = self.__selected_chip if self.__selected_chip else "auto"
+        session = DeviceSession(
+            on_output=self._handle_esptool_output,
+            on_error=self._handle_esptool_error,
+            on_complete=self._handle_device_report
+        )
 
-        if not self.__selected_firmware:
-            errors.append('No firmware selected')
+        self._disable_buttons()
+        self._console_print(f'[INFO] Device report: {", ".join(DeviceSession.REPORT)}\n\n', "info")
+        session.run_threaded_session(self.__device_path, DeviceSession.REPORT, chip=chip)
 
-        if not self.__selected_baudrate:
-            errors.append('No baudrate selected')
+    def _handle_device_report(self, results: List[OperationResult]) -> None:
+        """
+        Shows the results of a device report and enables the buttons again.
 
-        if not self.flash_firmware.sector_input.get().strip():
-            errors.append('No sector value provided')
+        :param results: The results of the report operations.
+        :type results: List[OperationResult]
+        :return: None
+        """
+        report = DeviceSession.format_report(results)
 
-        if errors:
-            error(f'Found errors: {errors}')
-            self.console.console_text.insert("end", f'[ERROR] {", ".join(errors)}\n', "error")
-            return
+        def update() -> None:
+            if report:
+                self._console_queue.put(f'\n{report}')
+            self._enable_buttons()
 
-        cmd = ["python", "-m", "esptool",
-               '-p', self.__device_path,
-               '-c', self.__selected_chip,
-               '-b', str(self.__selected_baudrate),
-               'write_flash', self.flash_firmware.sector_input.get().strip(),
-               self.__selected_firmware]
+        self.after(0, update)
 
-        if self.__expert_mode:
-            flash_mode = self.flash_firmware.flash_mode_option.get().strip()
-            flash_freq = self.flash_firmware.flash_frequency_option.get().strip()
-            flash_size = self.flash_firmware.flash_size_option.get().strip()
+    def _device_key(self, port: str) -> Optional[str]:
+        """
+        Returns the baud rate cache key of the device on a port.
 
-            expert_args = ['-fm', flash_mode, '-ff', flash_freq, '-fs', flash_size]
+        :param port: The serial port of the device.
+        :type port: str
+        :return: The cache key, or None if the port has no USB ids.
+        :rtype: Optional[str]
+        """
+        device_info = self.device_watcher.info(port)
+        if not device_info:
+            return None
 
-            if self.flash_firmware.erase_before_switch.get():
-                expert_args.append('-e')
+        return baud_cache.key(device_info.vid, device_info.pid, device_info.serial_number)
+
+    def _flash_baudrate(self, port: str) -> int:
+        """
+        Returns the baud rate for flashing a device. In automatic mode the probed
+        rate of the device is used, or the default rate if it was never probed.
 
-            index = cmd.index('write_flash') + 1
-            cmd = cmd[:index] + expert_args + cmd[index:]
+        :param port: The serial port of the device.
+        :type port: str
+        :return: The baud rate.
+        :rtype: int
+        """
+        if self.__selected_baudrate != BAUDRATE_AUTO:
+            return int(self.__selected_baudrate)
 
-        self._disable_buttons()
-        self.console.console_text.insert("end", f'[INFO] {" ".join(cmd)}\n\n', "info")
-        self.esptool_runner.run_threaded_command(command=cmd)
+        return baud_cache.get(self._device_key(port)) or BAUDRATE_DEFAULT
+
+    def _probe_baudrate(self) -> None:
+        """
+        Probes the fastest baud rate at which the selected device transfers data
+        without checksum errors and remembers it for automatic flashing.
+
+        :return: None
+        """
+        info('Prepare esptool session for: baud rate probe')
+        self._delete_console()
+
+        if not self.__device_path:
+            error('No device selected!')
+            self._console_print('[ERROR] No device selected!\n', "error")
+            return
+
+        port = self.__device_path
+        chip = self.__selected_chip if self.__selected_chip else "auto"
+        session = DeviceSession(
+            on_output=self._handle_esptool_output,
+            on_error=self._handle_esptool_error,
+            on_complete=lambda results: self._handle_baud_probe(port, results)
+        )
+        operation = DeviceSession.operation('probe_baud', rates=BAUD_PROBE_RATES, size=BAUD_PROBE_SIZE)
+
+        self._disable_buttons()
+        self._console_print(f'[INFO] Probing baud rates {BAUD_PROBE_RATES} on {port}\n\n', "info")
+        session.run_threaded_session(port, [operation], chip=chip)
+
+    def _handle_baud_probe(self, port: str, results: List[OperationResult]) -> None:
+        """
+        Stores the result of a baud rate probe and enables the buttons again.
+
+        :param port: The serial port of the probed device.
+        :type port: str
+        :param results: The result of the probe operation.
+        :type results: List[OperationResult]
+        :return: None
+        """
+        baud = next((result.data['baud'] for result in results if result.success), None)
+        key = self._device_key(port)
+
+        if baud:
+            baud_cache.store(key, baud)
+
+        def update() -> None:
+            if baud and key:
+                self._console_queue.put(f'\nMax stable baud rate of {port}: {baud} (used for automatic flashing)')
+            elif baud:
+                self._console_queue.put(f'\nMax stable baud rate of {port}: {baud} (not cached, no USB ids)')
+            self._enable_buttons()
+
+        self.after(0, update)
+
+    def _show_partition_table(self) -> None:
+        """
+        Reads the partition table of the selected device and shows it in the console.
+
+        :return: None
+        """
+        info('Prepare esptool session for: partition table')
+        self._delete_console()
+
+        if not self.__device_path:
+            error('No device selected!')
+            self._console_print('[ERROR] No device selected!\n', "error")
+            return
+
+        port = self.__device_path
+        session = DeviceSession(
+            on_output=self._handle_esptool_output,
+            on_error=self._handle_esptool_error,
+            on_complete=self._handle_partition_table
+        )
+
+        self._disable_buttons()
+        self._console_print(f'[INFO] Reading partition table of {port}\n\n', "info")
+        session.run_threaded_session(port, ['read_partition_table'], chip=self.__selected_chip or "auto",
+                                     baud=self._flash_baudrate(port))
+
+    def _handle_partition_table(self, results: List[OperationResult]) -> None:
+        """
+        Shows a read partition table with the booted app and enables the buttons again.
+
+        :param results: The result of the read operation.
+        :type results: List[OperationResult]
+        :return: None
+        """
+        text = None
+
+        if results and results[0].success:
+            try:
+                partitions, boot = self._parse_partition_table(results[0])
+                text = PartitionTable.format(partitions, boot)
+            except ValueError as err:
+                text = f'[ERROR] {err}'
+
+        def update() -> None:
+            if text:
+                self._console_queue.put(f'\n{text}')
+            self._enable_buttons()
+
+        self.after(0, update)
+
+    @staticmethod
+    def _parse_partition_table(result: OperationResult) -> Tuple[List[Partition], Optional[Partition]]:
+        """
+        Parses the result of a partition table read and finds the app partition which boots.
+
+        :param result: The successful result of the read operation.
+        :type result: OperationResult
+        :return: The partitions and the booted app partition, if any.
+        :rtype: Tuple[List[Partition], Optional[Partition]]
+        :raises ValueError: If the data contains no partition table.
+        """
+        partitions = PartitionTable.parse(bytes.fromhex(result.data['data']))
+        otadata = bytes.fromhex(result.data['otadata']) if 'otadata' in result.data else None
+        return partitions, PartitionTable.boot_app(partitions, otadata)
+
+    def _app_flash_command(self) -> None:
+        """
+        Writes only the application of the firmware to the app partition the device
+        boots, instead of the whole image. A merged image must contain the partition
+        table of the device; its application is cut out of the image.
+
+        :return: None
+        """
+        port = self.__device_path
+        chip = self.__selected_chip
+        baud = self._flash_baudrate(port)
+        diff = self._use_diff_flash()
+        session = DeviceSession(
+            on_output=self._handle_esptool_output,
+            on_error=self._handle_esptool_error,
+            on_progress=self._handle_esptool_progress
+        )
+
+        try:
+            address, firmware = self._flash_images()[0]
+        except ValueError as err:
+            error(f'Preparing firmware failed: {err}')
+            self._console_print(f'[ERROR] Preparing firmware failed: {err}\n', "error")
+            return
+
+        def flash(job: Job) -> Tuple[Partition, MergedImage, List[OperationResult]]:
+            results = session.execute_session(port, ['read_partition_table'],
+                                              chip=chip, baud=baud, reset=False, job=job)
+            if not results or not results[0].success:
+                raise RuntimeError(f'Reading the partition table failed: {results[0].error if results else "aborted"}')
+
+            partitions, target = self._parse_partition_table(results[0])
+            if target is None:
+                raise ValueError('The partition table has no app partition')
+
+            header = EspImage.read_header(firmware)
+            if header.kind == 'app':
+                if getsize(firmware) > target.size:
+                    raise ValueError(f'The application does not fit into {target.label} of {target.size} bytes')
+                start = 0
+            elif header.kind == 'merged':
+                if PartitionTable.read_image(firmware, address) != partitions:
+                    raise ValueError('The partition table of the image differs from the device, flash the whole image')
+                start = PartitionTable.boot_app(partitions).offset - address
+            else:
+                raise ValueError(f'The image is a {header.kind} image without application')
+
+            region = merge_builder.extract(firmware, start, target.size, target.offset)
+            self._console_queue.put(f'Application: {region.size} bytes to {target.label} at 0x{target.offset:x}')
+            job.check_cancelled()
+
+            if diff:
+                operation = DeviceSession.write_flash_diff(target.offset, region.path)
+            else:
+                operation = DeviceSession.operation('write_flash', address=target.offset, file=region.path)
+
+            return target, region, session.execute_session(port, [operation], chip=chip, baud=baud, job=job)
+
+        def handle_result(result: Tuple[Partition, MergedImage, List[OperationResult]]) -> None:
+            target, region, results = result
+            self._console_queue.put(f'\nApplication update of {target.label}: {region.size} bytes')
+            self._handle_flash_session(results)
+
+        def handle_error(message: str) -> None:
+            self._console_print(f'[ERROR] {message}', "error")
+            self.after(0, self._enable_buttons)
+
+        self._disable_buttons()
+        self._console_print(f'[INFO] Updating application of {port} from {firmware}\n\n', "info")
+        scheduler.submit(flash,
+                         name=f'Application update on {port}',
+                         port=port,
+                         priority=JobScheduler.HIGH,
+                         callback=handle_result,
+                         on_error=handle_error)
+
+    def _backup_flash(self) -> None:
+        """
+        Asks for a target file and streams the whole flash of the selected device
+        into it as a compressed backup with a hash manifest.
+
+        :return: None
+        """
+        self._delete_console()
+
+        if not self.__device_path:
+            error('No device selected!')
+            self._console_print('[ERROR] No device selected!\n', "error")
+            return
+
+        target = filedialog.asksaveasfilename(title='Save Flash Backup',
+                                              defaultextension='.bin.gz',
+                                              initialfile='flash_backup.bin.gz',
+                                              filetypes=(("Compressed backups", "*.bin.gz"),))
+        if not target:
+            return
+
+        self._run_backup_session(DeviceSession.backup_flash(target), f'Backing up flash to {target}')
+
+    def _restore_flash(self) -> None:
+        """
+        Asks for a backup file and writes it back to the flash of the selected device.
+        Blocks which already match the backup are not written.
+
+        :return: None
+        """
+        self._delete_console()
+
+        if not self.__device_path:
+            error('No device selected!')
+            self._console_print('[ERROR] No device selected!\n', "error")
+            return
+
+        source = filedialog.askopenfilename(title='Select Flash Backup',
+                                            filetypes=(("Compressed backups", "*.bin.gz"),))
+        if not source:
+            return
+
+        operation = DeviceSession.restore_flash(source)
+        if not exists(operation['manifest']):
+            error(f'Backup manifest {operation["manifest"]} not found')
+            self._console_print(f'[ERROR] Backup manifest {operation["manifest"]} not found\n', "error")
+            return
+
+        self._run_backup_session(operation, f'Restoring flash from {source}')
+
+    def _run_backup_session(self, operation: Dict, text: str) -> None:
+        """
+        Runs a backup or restore operation on the selected device and shows its progress.
+
+        :param operation: The session operation.
+        :type operation: Dict
+        :param text: The information shown in the console.
+        :type text: str
+        :return: None
+        """
+        port = self.__device_path
+        baud = self._flash_baudrate(port)
+        session = DeviceSession(
+            on_output=self._handle_esptool_output,
+            on_error=self._handle_esptool_error,
+            on_complete=self._handle_flash_session,
+            on_progress=self._handle_esptool_progress
+        )
+
+        self.flash_firmware.progress_bar.set(0)
+        self.flash_firmware.progress_label.configure(text='')
+        self._disable_buttons()
+        self._console_print(f'[INFO] {text} on {port} at {baud}\n\n', "info")
+        session.run_threaded_session(port, [operation], chip=self.__selected_chip or "auto", baud=baud)
+
+    def _flash_errors(self, require_device: bool = True) -> List[str]:
+        """
+        Validates the user input of the firmware flash frame.
+
+        :param require_device: Whether a selected device path is required.
+        :type require_device: bool, optional
+        :return: The found errors, empty if the input is valid.
+        :rtype: List[str]
+        """
+        errors = []
+        if require_device and not self.__device_path:
+            errors.append('No device path selected')
+
+        if not self.__selected_chip:
+            errors.append('No chip selected')
+
+        if not self.__selected_firmware:
+            errors.append('No firmware selected')
+        elif self.__firmware_validation is None:
+            errors.append('Firmware validation is still running')
+        elif not self.__firmware_validation.valid:
+            errors.extend(self.__firmware_validation.errors)
+
+        header = self.__firmware_validation.header if self.__firmware_validation else None
+        if header and header.chip and self.__selected_chip and header.chip != self.__selected_chip:
+            errors.append(f'Firmware is built for {header.chip}, not for {self.__selected_chip}')
+
+        if not self.__selected_baudrate:
+            errors.append('No baudrate selected')
+
+        try:
+            int(self.flash_firmware.sector_input.get().strip(), 0)
+        except ValueError:
+            errors.append('No valid sector value provided')
+
+        return errors
+
+    def _build_flash_command(self, port: str) -> List[str]:
+        """
+        Builds the esptool flash firmware command for a single device.
+
+        :param port: The serial port of the device.
+        :type port: str
+        :return: The esptool command.
+        :rtype: List[str]
+        :raises ValueError: If the sector value is not a number.
+        """
+        expert_args = []
+
+        if self.__expert_mode:
+            flash_mode = self.flash_firmware.flash_mode_option.get().strip()
+            flash_freq = self.flash_firmware.flash_frequency_option.get().strip()
+            flash_size = self.flash_firmware.flash_size_option.get().strip()
+
+            expert_args = ['-fm', flash_mode, '-ff', flash_freq, '-fs', flash_size]
+
+            if self.flash_firmware.erase_before_switch.get():
+                expert_args.append('-e')
+
+        return CommandRunner.write_flash_command(port, self.__selected_chip, self._flash_baudrate(port),
+                                                 self._flash_images(), expert_args)
+
+    def _flash_images(self) -> List[Tuple[int, str]]:
+        """
+        Returns the selected firmware with its flash address and, in expert mode,
+        the additional images.
+
+        :return: The flash addresses and paths of the images.
+        :rtype: List[Tuple[int, str]]
+        :raises ValueError: If the sector value is not a number.
+        """
+        images = [(int(self.flash_firmware.sector_input.get().strip(), 0), self.__selected_firmware)]
+
+        if self.__expert_mode:
+            images += self.__extra_images
+
+        return images
+
+    def _show_flash_images(self) -> None:
+        """
+        Shows the additional images in the flash frame.
+
+        :return: None
+        """
+        text = ', '.join(f'0x{address:x} {basename(path)}' for address, path in sorted(self.__extra_images))
+        self.flash_firmware.images_info.configure(text=text or 'Add bootloader, partition or filesystem images')
+
+    def _add_flash_image(self) -> None:
+        """
+        Asks for an additional image and its flash address, which are written in
+        the same run as the firmware.
+
+        :return: None
+        """
+        file_path = filedialog.askopenfilename(
+            initialdir=expanduser(self._firmware_search_path),
+            title='Select Additional Image',
+            filetypes=(("Binary files", "*.bin"), ("All files", "*.*"))
+        )
+        if not file_path:
+            return
+
+        dialog = CTkInputDialog(text=f'Flash address of {basename(file_path)}, e.g. 0x8000', title='Flash Address')
+        address = dialog.get_input()
+
+        try:
+            self.__extra_images.append((int(address.strip(), 0), file_path))
+        except (AttributeError, ValueError):
+            error(f'Invalid flash address: {address}')
+            self._console_print(f'[ERROR] Invalid flash address: {address}\n', "error")
+            return
+
+        info(f'Added image {file_path} at {address}')
+        self._show_flash_images()
+
+    def _clear_flash_images(self) -> None:
+        """
+        Removes all additional images.
+
+        :return: None
+        """
+        self.__extra_images = []
+        self._show_flash_images()
+
+    def _build_merged_image(self) -> None:
+        """
+        Merges the firmware and the additional images into one file, which can be
+        flashed in one run. The merged image is built in the background and cached
+        by the hashes of its inputs.
+
+        :return: None
+        """
+        self._delete_console()
+
+        try:
+            images = self._flash_images() if self.__selected_firmware else []
+        except ValueError:
+            images = []
+
+        if not images:
+            error('No firmware or sector value selected')
+            self._console_print('[ERROR] No firmware or sector value selected\n', "error")
+            return
+
+        target = filedialog.asksaveasfilename(title='Save Merged Image',
+                                              defaultextension='.bin',
+                                              initialfile='merged.bin',
+                                              filetypes=(("Binary files", "*.bin"),))
+        if not target:
+            return
+
+        def build(job: Job) -> MergedImage:
+            merged = merge_builder.build(images)
+            job.check_cancelled()
+            copyfile(merged.path, target)
+            return merged
+
+        def handle_result(merged: MergedImage) -> None:
+            state = 'from cache' if merged.cached else 'built'
+            self._console_queue.put(f'Merged image {target} {state}: {merged.size} bytes, flash at 0x{merged.offset:x}')
+
+        self._console_print(f'[INFO] Merging {len(images)} images into {target}\n', "info")
+        scheduler.submit(build,
+                         name=f'Merge {target}',
+                         priority=JobScheduler.NORMAL,
+                         callback=handle_result,
+                         on_error=lambda message: self._console_print(f'[ERROR] {message}', "error"))
+
+    def _use_diff_flash(self) -> bool:
+        """
+        Indicates whether only changed sectors are written. Erasing the flash before
+        flashing requires writing the whole image.
+
+        :return: True if the image is written sector-differentially.
+        :rtype: bool
+        """
+        erase_before = self.__expert_mode and self.flash_firmware.erase_before_switch.get()
+        return bool(self.flash_firmware.diff_switch.get()) and not erase_before
+
+    def _flash_params(self) -> Dict[str, str]:
+        """
+        Returns the flash parameters selected in expert mode.
+
+        :return: The flash mode, frequency and size, or no parameters outside expert mode.
+        :rtype: Dict[str, str]
+        """
+        if not self.__expert_mode:
+            return {}
+
+        return {'flash_mode': self.flash_firmware.flash_mode_option.get().strip(),
+                'flash_freq': self.flash_firmware.flash_frequency_option.get().strip(),
+                'flash_size': self.flash_firmware.flash_size_option.get().strip()}
+
+    @staticmethod
+    def _build_flash_operations(images: List[Tuple[int, str]], params: Dict[str, str]) -> List[Dict]:
+        """
+        Builds the session operations which write only the changed sectors of the
+        firmware and the additional images, with the image hashes computed once per image.
+        Hashing reads every image, so it runs in a job and not on the UI thread.
+
+        :param images: The flash addresses and paths of the images.
+        :type images: List[Tuple[int, str]]
+        :param params: The flash parameters of the operations.
+        :type params: Dict[str, str]
+        :return: The session operations.
+        :rtype: List[Dict]
+        :raises OSError: If an image cannot be read.
+        """
+        return [DeviceSession.write_flash_diff(address, path, **params) for address, path in sorted(images)]
+
+    def _handle_flash_session(self, results: List[OperationResult]) -> None:
+        """
+        Shows the result of a flash, backup or restore session and enables the buttons again.
+
+        :param results: The result of the flash operation.
+        :type results: List[OperationResult]
+        :return: None
+        """
+        report = DeviceSession.format_report(results)
+
+        def update() -> None:
+            if report:
+                self._console_queue.put(f'\n{report}')
+            self._enable_buttons()
+
+        self.after(0, update)
+
+    def _flash_firmware_command(self) -> None:
+        """
+        Validate and prepares the esptool flash firmware command based on user input.
+
+        :return: None
+        """
+        info('Prepare esptool command for: firmware flash')
+        self._delete_console()
+
+        errors = self._flash_errors()
+        if errors:
+            error(f'Found errors: {errors}')
+            self._console_print(f'[ERROR] {", ".join(errors)}\n', "error")
+            return
+
+        self.flash_firmware.progress_bar.set(0)
+        self.flash_firmware.progress_label.configure(text='')
+
+        if self.flash_firmware.app_only_switch.get():
+            self._app_flash_command()
+            return
+
+        if self._use_diff_flash():
+            self._diff_flash_command()
+            return
+
+        cmd = self._build_flash_command(self.__device_path)
+
+        self._disable_buttons()
+        self._console_print(f'[INFO] esptool {" ".join(cmd)}\n\n', "info")
+        self.esptool_runner.run_threaded_command(command=cmd)
+
+    def _diff_flash_command(self) -> None:
+        """
+        Compares the firmware and the additional images with the flash content of the
+        selected device and writes only the changed sectors, or nothing if the device
+        already runs the firmware.
+
+        :return: None
+        """
+        port = self.__device_path
+        chip = self.__selected_chip
+        baud = self._flash_baudrate(port)
+
+        try:
+            images = self._flash_images()
+        except ValueError as err:
+            error(f'Preparing firmware failed: {err}')
+            self._console_print(f'[ERROR] Preparing firmware failed: {err}\n', "error")
+            return
+
+        params = self._flash_params()
+        session = DeviceSession(
+            on_output=self._handle_esptool_output,
+            on_error=self._handle_esptool_error,
+            on_complete=self._handle_flash_session,
+            on_progress=self._handle_esptool_progress
+        )
+
+        def flash(job: Job) -> List[OperationResult]:
+            operations = self._build_flash_operations(images, params)
+            job.check_cancelled()
+
+            self._console_print(''.join(f'[INFO] esptool write_flash_diff 0x{operation["address"]:x} '
+                                        f'{operation["file"]} ({len(operation["blocks"])} blocks) '
+                                        f'on {port} at {baud}\n' for operation in operations) + '\n', "info")
+            return session.execute_session(port, operations, chip=chip, baud=baud, job=job)
+
+        def handle_error(message: str) -> None:
+            self._console_print(f'[ERROR] {message}', "error")
+            self.after(0, self._enable_buttons)
+
+        self._disable_buttons()
+        scheduler.submit(flash,
+                         name=f'Differential flash on {port}',
+                         port=port,
+                         priority=JobScheduler.HIGH,
+                         on_error=handle_error)
+
+    def _batch_flash_errors(self) -> List[str]:
+        """
+        Validates the user input for a batch flash. Flashing the app partition only
+        depends on the partition table of every single device, so it is not
+        supported by a batch flash.
+
+        :return: The list of errors.
+        :rtype: List[str]
+        """
+        errors = self._flash_errors(require_device=False)
+
+        if self.flash_firmware.app_only_switch.get():
+            errors.append('App partition only is not supported by batch flash, turn it off to flash the full image')
+
+        return errors
+
+    def _open_batch_flash(self) -> None:
+        """
+        Opens the batch flash window with all currently connected devices.
+
+        :return: None
+        """
+        errors = self._batch_flash_errors()
+        ports = [device for device in self.search_device.device_option.cget("values")
+                 if device not in ("Select Device", "No devices found")]
+
+        if not ports:
+            errors.append('No devices found')
+
+        if errors:
+            error(f'Found errors: {errors}')
+            self._delete_console()
+            self._console_print(f'[ERROR] {", ".join(errors)}\n', "error")
+            return
+
+        if self._batch_flash and self._batch_flash.winfo_exists():
+            self._batch_flash.destroy()
+
+        self._batch_flash = ToplevelBatchFlash(self, ports=ports, on_start=self._batch_flash_command,
+                                               max_parallel=batch_scheduler.max_workers)
+
+    def _batch_flash_command(self, ports: List[str]) -> None:
+        """
+        Flashes the selected firmware to several devices concurrently.
+
+        :param ports: The serial ports of the devices.
+        :type ports: List[str]
+        :return: None
+        """
+        info(f'Prepare esptool batch flash for: {ports}')
+        self._delete_console()
+
+        errors = self._batch_flash_errors()
+        if errors:
+            error(f'Found errors: {errors}')
+            self._console_print(f'[ERROR] {", ".join(errors)}\n', "error")
+            self._batch_flash.show_summary(", ".join(errors))
+            return
+
+        window = self._batch_flash
+        chip = self.__selected_chip
+        bauds = {port: self._flash_baudrate(port) for port in ports}
+        diff = self._use_diff_flash()
+
+        try:
+            images = self._flash_images()
+            commands = {} if diff else {port: self._build_flash_command(port) for port in ports}
+        except ValueError as err:
+            error(f'Preparing firmware failed: {err}')
+            self._console_print(f'[ERROR] Preparing firmware failed: {err}\n', "error")
+            window.show_summary(f'Preparing firmware failed: {err}')
+            return
+
+        params = self._flash_params()
+        runner = BatchCommandRunner(
+            on_output=lambda port, line: self.after(0, lambda: self._handle_batch_output(window, port, line)),
+            on_progress=lambda port, event: self.after(0, lambda: self._handle_batch_output(window, port, str(event))),
+            on_device_complete=lambda result: self._handle_batch_device_complete(window, result),
+            on_complete=lambda results: self._handle_batch_complete(window, results)
+        )
+
+        def prepare(job: Job) -> Dict[str, Dict]:
+            operations = self._build_flash_operations(images, params)
+            return {port: DeviceSession.request(port, operations, chip=chip, baud=bauds[port]) for port in ports}
+
+        def handle_error(message: str) -> None:
+            self._console_print(f'[ERROR] Preparing firmware failed: {message}', "error")
+            self.after(0, lambda: self._handle_batch_prepare_error(window, message))
+
+        self._disable_buttons()
+        self._console_print(f'[INFO] Batch flash of {len(ports)} devices\n\n', "info")
+
+        if not diff:
+            runner.run_threaded_batch(commands)
+            return
+
+        scheduler.submit(prepare,
+                         name=f'Prepare batch flash of {len(ports)} devices',
+                         priority=JobScheduler.HIGH,
+                         callback=runner.run_threaded_batch,
+                         on_error=handle_error)
+
+    def _handle_batch_prepare_error(self, window: ToplevelBatchFlash, message: str) -> None:
+        """
+        Shows that the images of a batch flash could not be prepared and enables the buttons again.
+
+        :param window: The batch flash window which started the batch.
+        :type window: ToplevelBatchFlash
+        :param message: The error message.
+        :type message: str
+        :return: None
+        """
+        if window.winfo_exists():
+            window.show_summary(f'Preparing firmware failed: {message}')
+
+        self._enable_buttons()
+
+    @staticmethod
+    def _handle_batch_output(window: ToplevelBatchFlash, port: str, line: str) -> None:
+        """
+        Shows the latest output line of a device in the batch flash window.
+
+        :param window: The batch flash window which started the batch.
+        :type window: ToplevelBatchFlash
+        :param port: The serial port of the device.
+        :type port: str
+        :param line: The output line of the device.
+        :type line: str
+        :return: None
+        """
+        if line.strip() and window.winfo_exists():
+            window.show_status(port, line.strip())
+
+    def _handle_batch_device_complete(self, window: ToplevelBatchFlash, result: BatchResult) -> None:
+        """
+        Shows the result of a single device of a batch flash.
+
+        :param window: The batch flash window which started the batch.
+        :type window: ToplevelBatchFlash
+        :param result: The result of the device.
+        :type result: BatchResult
+        :return: None
+        """
+        state = 'OK' if result.success else f'FAILED {result.message}'
+        text = f'{result.port}: {state} in {result.duration:.1f}s'
+
+        def update() -> None:
+            self._console_queue.put(text)
+
+            if window.winfo_exists():
+                window.show_status(result.port, state)
+
+        self.after(0, update)
+
+    def _handle_batch_complete(self, window: ToplevelBatchFlash, results: List[BatchResult]) -> None:
+        """
+        Shows the summary of a finished batch flash and enables the buttons again.
+
+        :param window: The batch flash window which started the batch.
+        :type window: ToplevelBatchFlash
+        :param results: The results of all devices.
+        :type results: List[BatchResult]
+        :return: None
+        """
+        summary = BatchCommandRunner.summarize(results)
+
+        def update() -> None:
+            self._console_queue.put(f'\n{summary}')
+            self._enable_buttons()
+
+            if window.winfo_exists():
+                window.show_summary(summary)
+
+        self.after(0, update)
@@ -0,0 +1,156 @@
+"""
+Benchmark of SerialBase.read_until against the former byte-wise reader.
+
+A pseudo terminal stands in for the device: a responder thread answers every
+code submission, which ends with CTRL-D, like the raw REPL does with 'OK', the
+output and the end markers. Both readers receive the same responses over the
+same serial connection, so the timings compare the read loops only.
+
+Run it from the repository root on Linux or macOS, no device is required:
+
+    python benchmarks/read_until_benchmark.py --lines 2000 --rounds 20
+"""
+import os
+import pty
+import sys
+import tty
+from argparse import ArgumentParser
+from os.path import abspath, dirname
+from threading import Event, Thread
+from time import monotonic, time
+from typing import Callable, List
+
+from serial import Serial
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from serial_plugin.serial_base import SerialBase  # noqa: E402
+
+
+TERMINATOR = b'\x04>'
+
+
+def respond(master: int, response: bytes, stop: Event) -> None:
+    """
+    Answers every code submission on the device side of the pseudo terminal.
+
+    :param master: The file descriptor of the device side.
+    :type master: int
+    :param response: The complete raw REPL response to send.
+    :type response: bytes
+    :param stop: The event which ends the responder.
+    :type stop: Event
+    :return: None
+    """
+    while not stop.is_set():
+        try:
+            request = os.read(master, 4096)
+        except OSError:
+            return
+
+        for _ in range(request.count(b'\x04')):
+            view = memoryview(response)
+            while view:
+                view = view[os.write(master, view):]
+
+
+def read_bytewise(ser: Serial, timeout: float) -> bytes:
+    """
+    Reads a response one byte per call, like the reader read_until replaced.
+
+    :param ser: The serial connection.
+    :type ser: Serial
+    :param timeout: The maximum number of seconds to wait for the response.
+    :type timeout: float
+    :return: The received data including the terminator.
+    :rtype: bytes
+    """
+    output = b''
+    start = time()
+
+    while True:
+        if time() - start > timeout:
+            output = b'[ERROR] Timeout'
+            break
+
+        data = ser.read(1)
+        if not data:
+            break
+        output += data
+        if output.endswith(TERMINATOR):
+            break
+
+    return output
+
+
+def measure(name: str, ser: Serial, read: Callable[[], bytes], expected: bytes, rounds: int) -> float:
+    """
+    Submits code and reads the response a number of times and prints the throughput.
+
+    :param name: The name of the reader.
+    :type name: str
+    :param ser: The serial connection.
+    :type ser: Serial
+    :param read: The function which reads one response.
+    :type read: Callable[[], bytes]
+    :param expected: The response the reader has to return.
+    :type expected: bytes
+    :param rounds: The number of responses to read.
+    :type rounds: int
+    :return: The mean number of seconds per response.
+    :rtype: float
+    """
+    durations: List[float] = []
+
+    for _ in range(rounds):
+        start = monotonic()
+        ser.write(b'\x04')
+        data = read()
+        durations.append(monotonic() - start)
+
+        if data != expected:
+            raise RuntimeError(f'{name} returned {len(data)} unexpected bytes')
+
+    mean = sum(durations) / rounds
+    print(f'{name:<12} {mean * 1000:9.1f} ms per response, {len(expected) / mean / 1024:9.1f} KiB/s')
+    return mean
+
+
+def main() -> None:
+    """
+    Parses the arguments, starts the responder and compares both readers.
+
+    :return: None
+    """
+    parser = ArgumentParser(description='Compare read_until with the former byte-wise reader over a pty.')
+    parser.add_argument('--lines', type=int, default=2000, help='number of output lines per response')
+    parser.add_argument('--rounds', type=int, default=20, help='number of responses read by each reader')
+    args = parser.parse_args()
+
+    output = b''.join(b"('file_%05d.py', False, %d, %d)\r\n" % (index, index * 7, index * 7)
+                      for index in range(args.lines))
+    response = b'OK' + output + b'\x04' + TERMINATOR
+
+    master, slave = pty.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    stop = Event()
+    Thread(target=respond, args=(master, response, stop), daemon=True).start()
+
+    ser = Serial(os.ttyname(slave), timeout=2)
+    reader = SerialBase(port=ser.port)
+    reader._ser = ser
+
+    print(f'{len(response)} bytes per response, {args.rounds} rounds')
+    old = measure('byte-wise', ser, lambda: read_bytewise(ser, timeout=10), response, args.rounds)
+    new = measure('read_until', ser, lambda: reader.read_until(TERMINATOR, timeout=10), response, args.rounds)
+    print(f'read_until is {old / new:.1f} times faster')
+
+    stop.set()
+    ser.close()
+    os.close(slave)
+    os.close(master)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,9 @@ COLOR_THEME: str = 'blue'
 CONSOLE_INFO: str = "green2"
 CONSOLE_COMMAND: str = "white"
 CONSOLE_ERROR: str = "OrangeRed2"
+CONSOLE_MAX_LINES: int = 5000
+CONSOLE_POLL_INTERVAL: int = 100
+CONSOLE_LINES_PER_TICK: int = 2000
 LINK_OBJECT: str = "dodger blue"
 
 # application fonts
@@ -15,12 +18,46 @@ FONT_PATH: tuple = ('Arial', 20, 'bold')
 FONT_CATEGORY: tuple = ('Arial', 16, 'bold')
 FONT_DESCRIPTION: tuple = ('Arial', 14)
 
+# cache
+CACHE_PATH: str = '~/.micropython_firmware_studio'
+
 # images
 RELOAD_ICON: str = 'img/reload.png'
 
 # plugin
 SERIAL_RATE: int = 115200
-SERIAL_SECONDS: int = 5
+SERIAL_MONITOR_LINES: int = 1000
+SERIAL_IDLE_TIMEOUT: int = 30
+SERIAL_TRANSFER_CHUNK: int = 2048
+SERIAL_TRANSFER_WINDOW: int = 256
+SYNC_HASH_CACHE: str = 'sync_hashes.json'
+SYNC_IGNORE: list = ['.*', '__pycache__', '*.pyc']
+SCHEDULER_MAX_WORKERS: int = 8
+BATCH_MAX_WORKERS: int = 16
+ESPTOOL_SPARE_WORKERS: int = 1
+PROGRESS_INTERVAL: float = 0.25
+ESPTOOL_TIMEOUTS: dict = {'default': 120, 'erase_flash': 300, 'write_flash': 900, 'write_flash_diff': 900,
+                          'read_flash': 1800, 'backup_flash': 1800, 'restore_flash': 1800}
+BAUD_CACHE: str = 'baud_rates.json'
+BAUD_PROBE_RATES: list = [230400, 460800, 921600, 1500000, 2000000]
+BAUD_PROBE_SIZE: int = 0x10000
+IMAGE_HASH_CACHE: str = 'image_hashes.json'
+FLASH_DIFF_BLOCK: int = 0x1000
+FIRMWARE_INDEX: str = 'firmware_index.json'
+FIRMWARE_STORE: str = '~/.micropython_firmware_studio/firmware'
+FIRMWARE_SEARCH_LIMIT: int = 50
+MERGED_IMAGE_CACHE: str = 'merged'
+FILESYSTEM_IMAGE_CACHE: str = 'filesystems'
+LFS_BLOCK_SIZE: int = 4096
+LFS_READ_SIZE: int = 32
+LFS_PROG_SIZE: int = 32
+LFS_LOOKAHEAD_SIZE: int = 32
+LFS_DISK_VERSION: int = 0x00020000
+BACKUP_READ_CHUNK: int = 0x40000
+BACKUP_MANIFEST_SUFFIX: str = '.json'
+RESTORE_REGION_SIZE: int = 0x100000
+DEVICE_POLL_INTERVAL: float = 1.0
 FRAME_BTN_COLOR_ERASE: str = 'red'
+FRAME_BTN_COLOR_BACKUP: str = 'dodgerblue4'
 FRAME_BTN_COLOR_INFORMATION: str = 'green'
 FRAME_BTN_COLOR_PLUGINS: str = 'plum4'
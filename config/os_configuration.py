@@ -1,14 +1,14 @@
 OPERATING_SYSTEM: dict = {
     "Darwin": {
-        "device_path": "/dev/cu.usb*",
+        "device_path": ["/dev/cu.usb*"],
         "search_path": "~/Downloads"
     },
     "Linux": {
-        "device_path": "/dev/ttyUSB*",
+        "device_path": ["/dev/ttyUSB*", "/dev/ttyACM*"],
         "search_path": "~/Downloads"
     },
     "Windows": {
-        "device_path": "COM*",
+        "device_path": ["COM*"],
         "search_path": "C:/Users/"
     }
 }
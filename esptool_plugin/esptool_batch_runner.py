@@ -0,0 +1,141 @@
+from logging import getLogger, debug, info
+from threading import Lock
+from time import monotonic
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+from .esptool_command_runner import CommandRunner
+from .esptool_device_session import DeviceSession
+from .esptool_progress import ProgressEvent
+from scheduler.job_scheduler import Job, JobScheduler, batch_scheduler
+
+
+logger = getLogger(__name__)
+
+
+class BatchResult(NamedTuple):
+    """
+    Represents the result of a command on a single device of a batch.
+    """
+    port: str
+    success: bool
+    duration: float
+    message: str
+
+
+class BatchCommandRunner:
+    """
+    Represents a utility for running esptool commands on many devices concurrently,
+    reporting output and results per device. The devices run as jobs of the batch
+    scheduler, which has its own workers, so a batch is neither limited by nor
+    blocks the monitor, listing and validation jobs of the shared scheduler.
+    """
+
+    def __init__(self,
+                 on_output: Optional[Callable[[str, str], None]] = None,
+                 on_device_complete: Optional[Callable[[BatchResult], None]] = None,
+                 on_complete: Optional[Callable[[List[BatchResult]], None]] = None,
+                 on_progress: Optional[Callable[[str, ProgressEvent], None]] = None):
+        """
+        Initializes a batch runner with optional callbacks for output and results.
+
+        :param on_output: A callback function to handle the port and an output line of its command.
+        :type on_output: Optional[Callable[[str, str], None]]
+        :param on_device_complete: A callback function to handle the result of a single device.
+        :type on_device_complete: Optional[Callable[[BatchResult], None]]
+        :param on_complete: A callback function to handle the results of all devices.
+        :type on_complete: Optional[Callable[[List[BatchResult]], None]]
+        :param on_progress: A callback function to handle the port and a progress event of its command.
+        :type on_progress: Optional[Callable[[str, ProgressEvent], None]]
+        """
+        self._on_output = on_output
+        self._on_device_complete = on_device_complete
+        self._on_complete = on_complete
+        self._on_progress = on_progress
+
+    @staticmethod
+    def summarize(results: List[BatchResult]) -> str:
+        """
+        Creates a summary of a finished batch with the duration of every device.
+
+        :param results: The results of all devices.
+        :type results: List[BatchResult]
+        :return: The summary text.
+        :rtype: str
+        """
+        succeeded = [result for result in results if result.success]
+        lines = [f'Batch finished: {len(succeeded)} succeeded, {len(results) - len(succeeded)} failed']
+
+        for result in sorted(results, key=lambda item: item.port):
+            state = 'OK' if result.success else 'FAILED'
+            lines.append(f'{result.port}: {state} in {result.duration:.1f}s {result.message}'.rstrip())
+
+        return "\n".join(lines)
+
+    def run_threaded_batch(self, commands: Dict[str, Union[List[str], dict]]) -> List[Job]:
+        """
+        Submits one job per port, which run concurrently within the bounds of the
+        batch scheduler. Each result is reported as soon as its device is done.
+
+        :param commands: The esptool arguments or session requests to be executed, keyed by port.
+        :type commands: Dict[str, Union[List[str], dict]]
+        :return: The submitted jobs, one per port.
+        :rtype: List[Job]
+        """
+        info(f'Starting batch on {len(commands)} devices')
+        results: List[BatchResult] = []
+        lock = Lock()
+
+        def finish(result: BatchResult) -> None:
+            with lock:
+                results.append(result)
+                done = len(results) == len(commands)
+
+            if self._on_device_complete:
+                self._on_device_complete(result)
+
+            if done and self._on_complete:
+                self._on_complete(list(results))
+
+        return [batch_scheduler.submit(lambda job, port=port, command=command: self._execute_device(port, command, job),
+                                       name=f'Batch flash {port}',
+                                       port=port,
+                                       priority=JobScheduler.NORMAL,
+                                       callback=finish,
+                                       on_error=lambda message, port=port: finish(BatchResult(port, False, 0.0,
+                                                                                               message)))
+                for port, command in commands.items()]
+
+    def _execute_device(self, port: str, command: Union[List[str], dict], job: Job) -> BatchResult:
+        """
+        Executes the command of a single device and measures its duration. A
+        session request runs in a device session, which collects its result lines.
+
+        :param port: The serial port of the device.
+        :type port: str
+        :param command: The esptool arguments or session request to be executed.
+        :type command: Union[List[str], dict]
+        :param job: The scheduler job which runs the command.
+        :type job: Job
+        :return: The result of the device.
+        :rtype: BatchResult
+        """
+        errors = []
+        runner_class = DeviceSession if isinstance(command, dict) else CommandRunner
+        runner = runner_class(
+            on_output=lambda line: self._on_output(port, line) if self._on_output else None,
+            on_error=errors.append,
+            on_progress=(lambda event: self._on_progress(port, event)) if self._on_progress else None
+        )
+
+        start = monotonic()
+        try:
+            returncode = runner.execute_command(command, job=job)
+        except Exception as err:
+            returncode = -1
+            errors.append(str(err))
+
+        duration = monotonic() - start
+        debug(f'batch device {port} finished with {returncode} in {duration:.1f}s')
+
+        failed = returncode != 0 and errors and errors[-1].strip()
+        message = errors[-1].strip().splitlines()[-1] if failed else ''
+        return BatchResult(port, returncode == 0, duration, message)
@@ -0,0 +1,108 @@
+from logging import getLogger, debug, error
+from json import load, dump
+from os import makedirs
+from os.path import expanduser, join, dirname
+from threading import Lock
+from typing import Dict, Optional
+from config.application_configuration import CACHE_PATH, BAUD_CACHE
+
+
+logger = getLogger(__name__)
+
+
+class BaudRateCache:
+    """
+    Remembers the fastest stable baud rate found by a probe for every device. A
+    device is identified by the USB vendor and product id of its bridge plus its
+    serial number, so the rate follows the board to any port.
+    """
+
+    def __init__(self, file_name: str = BAUD_CACHE):
+        """
+        Initializes the cache, which is loaded from disk on first use.
+
+        :param file_name: The name of the cache file below the cache path.
+        :type file_name: str, optional
+        """
+        self._path = join(expanduser(CACHE_PATH), file_name)
+        self._lock = Lock()
+        self._rates: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def key(vid: Optional[int], pid: Optional[int], serial_number: Optional[str]) -> Optional[str]:
+        """
+        Returns the cache key of a device.
+
+        :param vid: The USB vendor id.
+        :type vid: Optional[int]
+        :param pid: The USB product id.
+        :type pid: Optional[int]
+        :param serial_number: The USB serial number.
+        :type serial_number: Optional[str]
+        :return: The key, or None if the device has no USB ids.
+        :rtype: Optional[str]
+        """
+        if vid is None or pid is None:
+            return None
+
+        return f'{vid:04x}:{pid:04x}:{serial_number or ""}'
+
+    def _load(self) -> Dict[str, int]:
+        """
+        Returns the cached rates, which are read from disk the first time.
+
+        :return: The device keys mapped to baud rates.
+        :rtype: Dict[str, int]
+        """
+        if self._rates is None:
+            try:
+                with open(self._path, 'r', encoding='utf-8') as file:
+                    self._rates = load(file)
+            except (OSError, ValueError):
+                self._rates = {}
+
+        return self._rates
+
+    def get(self, key: Optional[str]) -> Optional[int]:
+        """
+        Returns the probed baud rate of a device.
+
+        :param key: The cache key of the device.
+        :type key: Optional[str]
+        :return: The baud rate, or None if the device was not probed.
+        :rtype: Optional[int]
+        """
+        if key is None:
+            return None
+
+        with self._lock:
+            return self._load().get(key)
+
+    def store(self, key: Optional[str], baud: int) -> None:
+        """
+        Stores the probed baud rate of a device.
+
+        :param key: The cache key of the device.
+        :type key: Optional[str]
+        :param baud: The fastest stable baud rate.
+        :type baud: int
+        :return: None
+        """
+        if key is None:
+            return
+
+        with self._lock:
+            rates = self._load()
+            rates[key] = baud
+
+            try:
+                makedirs(dirname(self._path), exist_ok=True)
+                with open(self._path, 'w', encoding='utf-8') as file:
+                    dump(rates, file, indent=2)
+            except OSError as err:
+                error(f"Saving baud rate cache failed: {err}")
+
+        debug(f'stored baud rate {baud} for {key}')
+
+
+baud_cache = BaudRateCache()
@@ -1,7 +1,15 @@
 from logging import getLogger, debug, error
+from json import dumps
+from queue import Queue, Empty
 from threading import Thread
-from subprocess import Popen, PIPE
-from typing import List, Callable, Optional
+from time import monotonic
+from typing import IO, List, Callable, Optional, Tuple, Union
+from .esptool_worker_pool import worker_pool
+from .esptool_progress import ProgressEvent, ProgressParser
+from scheduler.job_scheduler import Job, JobScheduler, scheduler
+from scheduler.port_lock_manager import port_locks
+from serial_plugin.serial_connection_pool import connection_pool
+from config.application_configuration import ESPTOOL_TIMEOUTS
 
 
 logger = getLogger(__name__)
@@ -9,15 +17,20 @@ logger = getLogger(__name__)
 
 class CommandRunner:
     """
-    Represents a utility for running esptool commands in a subprocess with support for threaded execution
-    and optional callback handling for output, errors, and completion.
+    Represents a utility for running esptool commands in a pre-warmed worker process with support for
+    threaded execution and optional callback handling for output, errors, and completion.
+
+    :ivar transcript: The timestamped stdout and stderr lines of the last command, in order of arrival.
     """
     def __init__(self,
                  on_output: Optional[Callable[[str], None]] = None,
                  on_error: Optional[Callable[[str], None]] = None,
-                 on_complete: Optional[Callable[[], None]] = None):
+                 on_complete: Optional[Callable[[], None]] = None,
+                 on_progress: Optional[Callable[[ProgressEvent], None]] = None):
         """
-        Initializes an object with optional callbacks for output, error, and completion handling.
+        Initializes an object with optional callbacks for output, error, completion and progress handling.
+        If a progress callback is given, write and read progress lines are delivered as throttled
+        progress events instead of output lines.
 
         :param on_output: A callback function to handle output from the command.
         :type on_output: Optional[Callable[[str], None]]
@@ -25,47 +38,279 @@ class CommandRunner:
         :type on_error: Optional[Callable[[str], None]]
         :param on_complete: A callback function to handle completion of the command.
         :type on_complete: Optional[Callable[[], None]]
+        :param on_progress: A callback function to handle structured progress events.
+        :type on_progress: Optional[Callable[[ProgressEvent], None]]
         """
         self._on_output = on_output
         self._on_error = on_error
         self._on_complete = on_complete
+        self._on_progress = on_progress
+        self._parser = ProgressParser()
+        self.transcript: List[Tuple[float, str, str]] = []
+
+    @staticmethod
+    def write_flash_command(port: str,
+                            chip: str,
+                            baud: int,
+                            images: List[Tuple[int, str]],
+                            options: Optional[List[str]] = None) -> List[str]:
+        """
+        Builds the esptool arguments which write one or more images in a single run,
+        e.g. a bootloader, partition table, application and filesystem image.
+
+        :param port: The serial port of the device.
+        :type port: str
+        :param chip: The esptool chip name or 'auto'.
+        :type chip: str
+        :param baud: The baud rate used for writing.
+        :type baud: int
+        :param images: The flash addresses and paths of the images.
+        :type images: List[Tuple[int, str]]
+        :param options: Optional write_flash options, e.g. ['-fm', 'dio'].
+        :type options: Optional[List[str]]
+        :return: The esptool arguments.
+        :rtype: List[str]
+        """
+        command = ['-p', port, '-c', chip, '-b', str(baud), 'write_flash'] + (options or [])
+
+        for address, path in sorted(images):
+            command += [hex(address), path]
+
+        return command
+
+    @staticmethod
+    def _port_of(command: Union[List[str], dict]) -> Optional[str]:
+        """
+        Returns the serial port a command uses.
+
+        :param command: The esptool arguments or a session request.
+        :type command: Union[List[str], dict]
+        :return: The serial port, or None if the command does not name one.
+        :rtype: Optional[str]
+        """
+        if isinstance(command, dict):
+            return command.get('port')
+
+        for option in ('-p', '--port'):
+            if option in command[:-1]:
+                return command[command.index(option) + 1]
+
+        return None
+
+    def run_threaded_command(self, command: Union[List[str], dict], priority: int = JobScheduler.HIGH) -> Job:
+        """
+        Submits a command as a job of the shared scheduler. Commands on the same
+        port run one after another, and the job can be cancelled, which kills
+        the esptool worker.
 
-    def run_threaded_command(self, command: List[str]) -> None:
+        :param command: The esptool arguments to be executed.
+        :type command: Union[List[str], dict]
+        :param priority: The priority of the job.
+        :type priority: int, optional
+        :return: The submitted job.
+        :rtype: Job
         """
-        Starts a thread to execute a command.
+        reported = []
 
-        :param command: The command to be executed.
-        :type command: List[str]
+        def execute(job: Job) -> int:
+            returncode = self.execute_command(command, job=job)
+            reported.append(returncode)
+            return returncode
+
+        def handle_error(message: str) -> None:
+            if reported:
+                return
+
+            if self._on_error:
+                self._on_error(message)
+            if self._on_complete:
+                self._on_complete()
+
+        return scheduler.submit(execute,
+                                name=f'esptool {command if isinstance(command, dict) else " ".join(command)}',
+                                port=self._port_of(command),
+                                priority=priority,
+                                on_error=handle_error)
+
+    def _handle_output(self, line: str) -> None:
+        """
+        Passes a single output line of the command to the output callback, and
+        parsed events to the progress callback.
+
+        :param line: The stripped output line.
+        :type line: str
         :return: None
         """
-        thread = Thread(target=self._execute_command, args=(command,))
-        thread.start()
+        if self._on_progress:
+            event = self._parser.parse(line)
+
+            if event is not None:
+                if self._parser.is_due(event):
+                    self._on_progress(event)
+
+                if self._parser.is_progress(event):
+                    return
+
+        if self._on_output:
+            self._on_output(line)
+
+    @staticmethod
+    def _timeout_for(command: Union[List[str], dict]) -> float:
+        """
+        Returns the configured timeout of a command. A session gets the sum of the
+        timeouts of its operations.
+
+        :param command: The esptool arguments or a session request.
+        :type command: Union[List[str], dict]
+        :return: The timeout in seconds.
+        :rtype: float
+        """
+        default = ESPTOOL_TIMEOUTS['default']
 
-    def _execute_command(self, command: List[str]) -> None:
+        if isinstance(command, dict):
+            return sum(ESPTOOL_TIMEOUTS.get(operation['name'], default) for operation in command['operations'])
+
+        return next((ESPTOOL_TIMEOUTS[item] for item in command if item in ESPTOOL_TIMEOUTS), default)
+
+    @staticmethod
+    def _drain(stream: IO[str], name: str, lines: Queue) -> None:
         """
-        Executes a command in a subprocess and handles its output.
+        Reads a stream of the worker line by line into the shared queue. A final
+        None line marks the end of the stream.
 
-        :param command: The command to be executed.
-        :type command: List[str]
+        :param stream: The stdout or stderr pipe of the worker.
+        :type stream: IO[str]
+        :param name: The name of the stream.
+        :type name: str
+        :param lines: The queue of timestamped lines.
+        :type lines: Queue
         :return: None
         """
+        for line in iter(stream.readline, ''):
+            lines.put((monotonic(), name, line.strip()))
+
+        lines.put((monotonic(), name, None))
+
+    def execute_command(self,
+                        command: Union[List[str], dict],
+                        timeout: Optional[float] = None,
+                        job: Optional[Job] = None) -> int:
+        """
+        Waits for exclusive access to the port of the command and executes it. Waiting
+        for a port in use by another command or plugin is reported as output. A pooled
+        serial connection of the port is closed first, so esptool can open the port.
+
+        :param command: The esptool arguments to be executed, e.g. ['-p', port, 'chip_id'], or a session request.
+        :type command: Union[List[str], dict]
+        :param timeout: The maximum number of seconds the command may run, by default the configured one.
+        :type timeout: Optional[float]
+        :param job: The scheduler job which runs the command, if any.
+        :type job: Optional[Job]
+        :return: The return code of the command.
+        :rtype: int
+        """
+        port = self._port_of(command)
+
+        if not port:
+            return self._run_process(command, timeout, job)
+
+        try:
+            with port_locks.hold(port, 'esptool', self._on_output, (lambda: job.cancelled) if job else None):
+                connection_pool.close(port)
+                return self._run_process(command, timeout, job)
+        except InterruptedError as err:
+            if self._on_error:
+                self._on_error(str(err))
+            if self._on_complete:
+                self._on_complete()
+
+            return -1
+
+    def _run_process(self, command: Union[List[str], dict], timeout: Optional[float], job: Optional[Job]) -> int:
+        """
+        Executes a command in an esptool worker process and handles its output. Stdout
+        and stderr are read at the same time, so neither pipe can fill up, and stderr
+        lines are passed to the error callback as they arrive. All lines are kept in
+        order with their timestamps in the transcript. A command which exceeds its
+        timeout or whose job is cancelled is killed.
+
+        :param command: The esptool arguments to be executed, e.g. ['-p', port, 'chip_id'], or a session request.
+        :type command: Union[List[str], dict]
+        :param timeout: The maximum number of seconds the command may run, by default the configured one.
+        :type timeout: Optional[float]
+        :param job: The scheduler job which runs the command, if any.
+        :type job: Optional[Job]
+        :return: The return code of the command.
+        :rtype: int
+        """
         debug(f'running esptool command: {command}')
-        process = Popen(command, stdout=PIPE, stderr=PIPE, text=True)
+        timeout = timeout or self._timeout_for(command)
+        deadline = monotonic() + timeout
+        lines: Queue = Queue()
+        errors = 0
+        open_streams = 2
 
-        for line in iter(process.stdout.readline, ''):
-            stripped = line.strip()
+        self._parser = ProgressParser()
+        self.transcript = []
 
-            if self._on_output:
-                self._on_output(stripped)
+        process = worker_pool.acquire()
+        process.stdin.write(f'{dumps(command)}\n')
+        process.stdin.close()
+
+        if job:
+            job.on_cancel(process.kill)
+
+        readers = [Thread(target=self._drain, args=(process.stdout, 'stdout', lines), daemon=True),
+                   Thread(target=self._drain, args=(process.stderr, 'stderr', lines), daemon=True)]
+        for reader in readers:
+            reader.start()
+
+        while open_streams:
+            try:
+                stamp, name, line = lines.get(timeout=max(deadline - monotonic(), 0))
+            except Empty:
+                error(f'esptool command timed out after {timeout:g}s: {command}')
+                process.kill()
+                errors += 1
+
+                if self._on_error:
+                    self._on_error(f'Command timed out after {timeout:g}s and was killed')
+                break
+
+            if line is None:
+                open_streams -= 1
+                continue
+
+            if job and job.cancelled:
+                continue
+
+            self.transcript.append((stamp, name, line))
+
+            if name == 'stdout':
+                self._handle_output(line)
+            elif line:
+                errors += 1
+
+                if self._on_error:
+                    self._on_error(line)
 
         process.wait()
+        for reader in readers:
+            reader.join(timeout=1)
 
-        if process.returncode != 0:
-            error_output = process.stderr.read().strip()
-            error(f'esptool command failed: {error_output}')
+        if job and job.cancelled:
+            errors += 1
 
             if self._on_error:
-                self._on_error(error_output)
+                self._on_error('Command cancelled')
+
+        if process.returncode != 0:
+            error(f'esptool command failed with {process.returncode}: {command}')
+
+            if not errors and self._on_error:
+                self._on_error(f'esptool exited with {process.returncode}')
 
         if self._on_complete:
             self._on_complete()
+
+        return process.returncode
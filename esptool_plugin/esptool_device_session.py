@@ -0,0 +1,292 @@
+from logging import getLogger, debug
+from json import loads
+from typing import Callable, Dict, List, NamedTuple, Optional
+from .esptool_command_runner import CommandRunner
+from .esptool_progress import ProgressEvent
+from .esptool_image_hashes import image_hashes
+from .esptool_worker import RESULT_MARKER
+from config.application_configuration import (BACKUP_READ_CHUNK, BACKUP_MANIFEST_SUFFIX, RESTORE_REGION_SIZE,
+                                               FLASH_DIFF_BLOCK, SERIAL_RATE)
+from scheduler.job_scheduler import Job, JobScheduler, scheduler
+
+
+logger = getLogger(__name__)
+
+
+class OperationResult(NamedTuple):
+    """
+    Represents the structured result of one operation of a device session.
+    """
+    operation: str
+    success: bool
+    data: dict
+    error: str
+
+
+class DeviceSession(CommandRunner):
+    """
+    Represents a utility for running several esptool operations over a single
+    connection. The device is reset, synchronized and receives the stub only
+    once, instead of once per operation.
+
+    :ivar REPORT: The operations of a device report.
+    :ivar _LABELS: The readable names of the result fields.
+    """
+    REPORT = ['chip_info', 'read_mac', 'flash_id', 'read_flash_status']
+    _LABELS = {
+        'chip': 'Chip',
+        'features': 'Features',
+        'crystal_mhz': 'Crystal (MHz)',
+        'mac': 'MAC',
+        'manufacturer': 'Flash manufacturer',
+        'device': 'Flash device',
+        'size': 'Flash size',
+        'status': 'Flash status',
+        'baud': 'Max stable baud',
+        'address': 'Address',
+        'file': 'Image',
+        'written': 'Bytes written',
+        'skipped': 'Identical, skipped',
+        'read': 'Bytes read',
+        'md5': 'MD5'
+    }
+
+    def __init__(self,
+                 on_output: Optional[Callable[[str], None]] = None,
+                 on_error: Optional[Callable[[str], None]] = None,
+                 on_complete: Optional[Callable[[List[OperationResult]], None]] = None,
+                 on_progress: Optional[Callable[[ProgressEvent], None]] = None):
+        """
+        Initializes a session with optional callbacks for output, error, results and progress.
+
+        :param on_output: A callback function to handle output from the session.
+        :type on_output: Optional[Callable[[str], None]]
+        :param on_error: A callback function to handle error output from the session.
+        :type on_error: Optional[Callable[[str], None]]
+        :param on_complete: A callback function to handle the results of all operations.
+        :type on_complete: Optional[Callable[[List[OperationResult]], None]]
+        :param on_progress: A callback function to handle structured progress events.
+        :type on_progress: Optional[Callable[[ProgressEvent], None]]
+        """
+        super().__init__(on_output=on_output, on_error=on_error, on_progress=on_progress)
+        self._on_results = on_complete
+        self._results: List[OperationResult] = []
+
+    @staticmethod
+    def operation(name: str, **params) -> Dict:
+        """
+        Creates an operation for a session, e.g. operation('write_flash', address=0x1000, file='fw.bin').
+
+        :param name: The name of the operation.
+        :type name: str
+        :param params: The parameters of the operation.
+        :return: The operation.
+        :rtype: Dict
+        """
+        return {'name': name, **params}
+
+    @staticmethod
+    def write_flash_diff(address: int, file: str, **params) -> Dict:
+        """
+        Creates an operation which writes only the blocks of an image that differ
+        from the flash content. The block hashes of the image are computed once
+        and cached on the host.
+
+        :param address: The flash address of the image.
+        :type address: int
+        :param file: The path of the image.
+        :type file: str
+        :param params: Optional flash parameters, e.g. flash_mode='dio'.
+        :return: The operation.
+        :rtype: Dict
+        :raises OSError: If the image cannot be read.
+        """
+        hashes = image_hashes.get(file)
+        return {'name': 'write_flash_diff', 'address': address, 'file': file, 'size': hashes.size,
+                'md5': hashes.md5, 'block_size': hashes.block_size, 'blocks': hashes.blocks, **params}
+
+    @staticmethod
+    def backup_flash(file: str, address: int = 0, size: Optional[int] = None) -> Dict:
+        """
+        Creates an operation which streams the flash content into a compressed
+        backup file and stores a manifest with the block hashes next to it.
+
+        :param file: The path of the backup file.
+        :type file: str
+        :param address: The first flash address of the backup.
+        :type address: int, optional
+        :param size: The number of bytes, by default up to the end of the flash.
+        :type size: Optional[int]
+        :return: The operation.
+        :rtype: Dict
+        """
+        return {'name': 'backup_flash', 'file': file, 'manifest': f'{file}{BACKUP_MANIFEST_SUFFIX}',
+                'address': address, 'size': size, 'chunk': BACKUP_READ_CHUNK, 'block_size': FLASH_DIFF_BLOCK}
+
+    @staticmethod
+    def restore_flash(file: str) -> Dict:
+        """
+        Creates an operation which writes a backup back to the flash, skipping the
+        blocks which already match the manifest.
+
+        :param file: The path of the backup file.
+        :type file: str
+        :return: The operation.
+        :rtype: Dict
+        """
+        return {'name': 'restore_flash', 'file': file, 'manifest': f'{file}{BACKUP_MANIFEST_SUFFIX}',
+                'region': RESTORE_REGION_SIZE}
+
+    @classmethod
+    def request(cls,
+                port: str,
+                operations: List[Dict],
+                chip: str = 'auto',
+                baud: int = SERIAL_RATE,
+                reset: bool = True) -> Dict:
+        """
+        Creates the request of a session, which can also be executed as a command.
+
+        :param port: The serial port of the device.
+        :type port: str
+        :param operations: The operations, created with operation() or given as names.
+        :type operations: List[Dict]
+        :param chip: The esptool chip name or 'auto'.
+        :type chip: str, optional
+        :param baud: The baud rate used after the connection was established.
+        :type baud: int, optional
+        :param reset: Whether the device is hard reset after the last operation.
+        :type reset: bool, optional
+        :return: The session request.
+        :rtype: Dict
+        """
+        return {
+            'port': port,
+            'chip': chip,
+            'baud': baud,
+            'operations': [cls.operation(item) if isinstance(item, str) else item for item in operations],
+            'after': 'hard_reset' if reset else 'no_reset'
+        }
+
+    def _handle_output(self, line: str) -> None:
+        """
+        Collects result lines and passes all other lines to the output callback.
+
+        :param line: The stripped output line.
+        :type line: str
+        :return: None
+        """
+        if line.startswith(RESULT_MARKER):
+            result = loads(line[len(RESULT_MARKER):])
+            self._results.append(OperationResult(**result))
+            return
+
+        super()._handle_output(line)
+
+    def execute_session(self,
+                        port: str,
+                        operations: List[Dict],
+                        chip: str = 'auto',
+                        baud: int = SERIAL_RATE,
+                        reset: bool = True,
+                        job: Optional[Job] = None) -> List[OperationResult]:
+        """
+        Connects once and executes the operations in order. The session stops at the
+        first failing operation; operations which did not run are not part of the result.
+
+        :param port: The serial port of the device.
+        :type port: str
+        :param operations: The operations, created with operation() or given as names.
+        :type operations: List[Dict]
+        :param chip: The esptool chip name or 'auto'.
+        :type chip: str, optional
+        :param baud: The baud rate used after the connection was established.
+        :type baud: int, optional
+        :param reset: Whether the device is hard reset after the last operation.
+        :type reset: bool, optional
+        :param job: The scheduler job which runs the session, if any.
+        :type job: Optional[Job]
+        :return: The results of the executed operations.
+        :rtype: List[OperationResult]
+        """
+        self._results = []
+        request = self.request(port, operations, chip, baud, reset)
+
+        debug(f'running esptool session on {port}: {request["operations"]}')
+        self.execute_command(request, job=job)
+        results = list(self._results)
+
+        if self._on_results:
+            self._on_results(results)
+
+        return results
+
+    def run_threaded_session(self,
+                             port: str,
+                             operations: List[Dict],
+                             chip: str = 'auto',
+                             baud: int = SERIAL_RATE) -> Job:
+        """
+        Submits a session as a job of the shared scheduler.
+
+        :param port: The serial port of the device.
+        :type port: str
+        :param operations: The operations, created with operation() or given as names.
+        :type operations: List[Dict]
+        :param chip: The esptool chip name or 'auto'.
+        :type chip: str, optional
+        :param baud: The baud rate used after the connection was established.
+        :type baud: int, optional
+        :return: The submitted job.
+        :rtype: Job
+        """
+        reported = []
+
+        def execute(job: Job) -> List[OperationResult]:
+            results = self.execute_session(port, operations, chip, baud, job=job)
+            reported.append(results)
+            return results
+
+        def handle_error(message: str) -> None:
+            if reported:
+                return
+
+            if self._on_error:
+                self._on_error(message)
+            if self._on_results:
+                self._on_results([])
+
+        return scheduler.submit(execute, name=f'esptool session on {port}', port=port,
+                                priority=JobScheduler.HIGH, on_error=handle_error)
+
+    @classmethod
+    def format_report(cls, results: List[OperationResult]) -> str:
+        """
+        Formats the results of a device report as readable text.
+
+        :param results: The results of the report operations.
+        :type results: List[OperationResult]
+        :return: The report text.
+        :rtype: str
+        """
+        lines = []
+
+        for result in results:
+            if not result.success:
+                lines.append(f'{result.operation}: FAILED {result.error}')
+                continue
+
+            data = dict(result.data)
+            if result.operation == 'flash_id':
+                data['manufacturer'] = f"{data['manufacturer']:02x}"
+                data['device'] = f"{data['device']:04x}"
+            elif result.operation == 'read_flash_status':
+                data['status'] = f"0x{data['status']:04x}"
+            elif 'address' in data:
+                data['address'] = f"0x{data['address']:08x}"
+            elif result.operation == 'chip_info':
+                data['features'] = ', '.join(data['features'])
+
+            lines.extend(f'{cls._LABELS.get(key, key)}: {value}' for key, value in data.items())
+
+        return "\n".join(lines)
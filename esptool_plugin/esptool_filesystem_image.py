@@ -0,0 +1,157 @@
+from logging import getLogger, debug, info
+from fnmatch import fnmatch
+from hashlib import sha256
+from os import makedirs, replace, walk
+from os.path import expanduser, join, exists, getsize, relpath
+from typing import List, NamedTuple, Tuple
+from littlefs import LittleFS
+from config.application_configuration import (CACHE_PATH, FILESYSTEM_IMAGE_CACHE, SYNC_IGNORE, LFS_BLOCK_SIZE,
+                                               LFS_READ_SIZE, LFS_PROG_SIZE, LFS_LOOKAHEAD_SIZE, LFS_DISK_VERSION)
+
+
+logger = getLogger(__name__)
+
+
+class FilesystemImage(NamedTuple):
+    """
+    Represents a filesystem image built from a local directory.
+    """
+    path: str
+    size: int
+    files: int
+    cached: bool
+
+
+class FilesystemImageBuilder:
+    """
+    Represents a utility for building a LittleFS image of a local directory on the
+    host, which is flashed to the filesystem partition instead of uploading every
+    file over the REPL. The image uses the parameters MicroPython mounts its
+    filesystem with and the on-disk format 2.0, which MicroPython builds with
+    an older littlefs can mount as well. Images are cached by the content hash
+    of the directory and the partition size, so an unchanged directory is built
+    only once.
+    """
+
+    def __init__(self, directory: str = FILESYSTEM_IMAGE_CACHE, block_size: int = LFS_BLOCK_SIZE):
+        """
+        Initializes the builder with its cache directory.
+
+        :param directory: The name of the cache directory below the cache path.
+        :type directory: str, optional
+        :param block_size: The erase block size of the filesystem in bytes.
+        :type block_size: int, optional
+        """
+        self._directory = join(expanduser(CACHE_PATH), directory)
+        self._block_size = block_size
+
+    @staticmethod
+    def _ignored(name: str) -> bool:
+        """
+        Checks whether a file or directory name matches one of the ignore patterns.
+
+        :param name: The file or directory name.
+        :type name: str
+        :return: True if the entry is not part of the image.
+        :rtype: bool
+        """
+        return any(fnmatch(name, pattern) for pattern in SYNC_IGNORE)
+
+    def _collect(self, local_dir: str) -> List[Tuple[str, str]]:
+        """
+        Returns the files below a directory which are part of the image.
+
+        :param local_dir: The local directory.
+        :type local_dir: str
+        :return: The device paths and local paths of the files, sorted by device path.
+        :rtype: List[Tuple[str, str]]
+        """
+        files = []
+
+        for root, directories, names in walk(local_dir):
+            directories[:] = sorted(item for item in directories if not self._ignored(item))
+
+            for name in sorted(names):
+                if not self._ignored(name):
+                    path = join(root, name)
+                    files.append(('/' + relpath(path, local_dir).replace('\\', '/'), path))
+
+        return sorted(files)
+
+    def _content_key(self, files: List[Tuple[str, str]], size: int) -> str:
+        """
+        Calculates the hash of the directory content and the image geometry.
+
+        :param files: The device paths and local paths of the files.
+        :type files: List[Tuple[str, str]]
+        :param size: The size of the image in bytes.
+        :type size: int
+        :return: The hex digest of the content.
+        :rtype: str
+        """
+        geometry = f'{size}:{self._block_size}:{LFS_READ_SIZE}:{LFS_PROG_SIZE}:{LFS_DISK_VERSION}'
+        digest = sha256(f'littlefs:{geometry}'.encode())
+
+        for device_path, path in files:
+            digest.update(f'\n{device_path}\n'.encode())
+
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(65536), b''):
+                    digest.update(block)
+
+        return digest.hexdigest()
+
+    def build(self, local_dir: str, size: int) -> FilesystemImage:
+        """
+        Builds a LittleFS image of a directory, which fills a partition of the given size.
+
+        :param local_dir: The local directory.
+        :type local_dir: str
+        :param size: The size of the filesystem partition in bytes.
+        :type size: int
+        :return: The filesystem image.
+        :rtype: FilesystemImage
+        :raises ValueError: If the partition is too small for the filesystem.
+        :raises OSError: If a file cannot be read or the image cannot be written.
+        :raises LittleFSError: If the files do not fit into the partition.
+        """
+        block_count = size // self._block_size
+        if block_count < 2:
+            raise ValueError(f'Partition of {size} bytes is too small for a filesystem')
+
+        files = self._collect(local_dir)
+        key = self._content_key(files, size)
+        path = join(self._directory, f'littlefs_{key[:16]}.bin')
+
+        if exists(path):
+            debug(f'filesystem image cache hit: {path}')
+            return FilesystemImage(path, getsize(path), len(files), True)
+
+        filesystem = LittleFS(block_size=self._block_size,
+                              block_count=block_count,
+                              read_size=LFS_READ_SIZE,
+                              prog_size=LFS_PROG_SIZE,
+                              lookahead_size=LFS_LOOKAHEAD_SIZE,
+                              disk_version=LFS_DISK_VERSION)
+
+        for device_path, local_path in files:
+            directory = device_path.rsplit('/', 1)[0]
+            if directory:
+                filesystem.makedirs(directory, exist_ok=True)
+
+            with open(local_path, 'rb') as source, filesystem.open(device_path, 'wb') as target:
+                for block in iter(lambda: source.read(65536), b''):
+                    target.write(block)
+
+        makedirs(self._directory, exist_ok=True)
+        partial = f'{path}.partial'
+
+        with open(partial, 'wb') as output:
+            output.write(filesystem.context.buffer)
+
+        replace(partial, path)
+        info(f'Built LittleFS image {path} of {local_dir}: {len(files)} files, {size} bytes')
+        return FilesystemImage(path, size, len(files), False)
+
+
+filesystem_builder = FilesystemImageBuilder()
@@ -0,0 +1,285 @@
+from logging import getLogger, debug, info, error
+from glob import glob
+from hashlib import sha256
+from json import load, dump
+from os import makedirs, stat
+from os.path import expanduser, join, dirname, abspath, basename, isdir
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from .esptool_image import EspImage
+from config.application_configuration import CACHE_PATH, FIRMWARE_INDEX
+
+
+logger = getLogger(__name__)
+
+
+class FirmwareEntry(NamedTuple):
+    """
+    Represents an indexed firmware image with the target detected from its header.
+    """
+    path: str
+    name: str
+    size: int
+    mtime: float
+    sha256: str
+    chip: Optional[str]
+    offset: Optional[int]
+    kind: str
+    flash_mode: Optional[str]
+    flash_size: Optional[str]
+
+    def __str__(self) -> str:
+        """
+        Returns the file name with the detected chip and flash address.
+
+        :return: The description of the firmware.
+        :rtype: str
+        """
+        if self.chip is None:
+            return f'{self.name} [{self.kind}]'
+
+        return f'{self.name} [{self.chip} @ 0x{self.offset:x}]'
+
+
+class FirmwareCatalog:
+    """
+    Keeps a persistent index of local firmware images. Files are indexed by their
+    SHA-256 content hash together with the parsed image header, so the chip and
+    flash address are known without reading the file again. A refresh only hashes
+    files whose size or modification time changed.
+
+    :ivar PATTERN: The glob pattern of firmware files.
+    """
+    PATTERN = '*.bin'
+
+    def __init__(self, roots: List[str], file_name: str = FIRMWARE_INDEX):
+        """
+        Initializes the catalog, which is loaded from disk on first use.
+
+        :param roots: The directories which are scanned for firmware files.
+        :type roots: List[str]
+        :param file_name: The name of the index file below the cache path.
+        :type file_name: str, optional
+        """
+        self._roots = [expanduser(root) for root in roots]
+        self._path = join(expanduser(CACHE_PATH), file_name)
+        self._lock = Lock()
+        self._index: Optional[Dict[str, dict]] = None
+
+    def _load(self) -> Dict[str, dict]:
+        """
+        Returns the index, which is read from disk the first time.
+
+        :return: The files with size, mtime and hash, and the image details by hash.
+        :rtype: Dict[str, dict]
+        """
+        if self._index is None:
+            try:
+                with open(self._path, 'r', encoding='utf-8') as file:
+                    self._index = load(file)
+            except (OSError, ValueError):
+                self._index = {'files': {}, 'images': {}}
+
+        return self._index
+
+    def _save(self) -> None:
+        """
+        Stores the index.
+
+        :return: None
+        """
+        try:
+            makedirs(dirname(self._path), exist_ok=True)
+            with open(self._path, 'w', encoding='utf-8') as file:
+                dump(self._index, file)
+        except OSError as err:
+            error(f"Saving firmware index failed: {err}")
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """
+        Calculates the SHA-256 hash of a file.
+
+        :param path: The path of the file.
+        :type path: str
+        :return: The hex digest of the file.
+        :rtype: str
+        """
+        digest = sha256()
+
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(65536), b''):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+    def _scan(self, path: str, cached: Optional[list]) -> Optional[Tuple[list, dict]]:
+        """
+        Hashes a file and reads its image header, if its size or modification time
+        differ from the indexed ones. The index lock must not be held, so searches
+        are not blocked while files are hashed.
+
+        :param path: The absolute path of the file.
+        :type path: str
+        :param cached: The indexed size, mtime and hash of the file, if any.
+        :type cached: Optional[list]
+        :return: The new size, mtime and hash and the image details, or None if the index is up to date.
+        :rtype: Optional[Tuple[list, dict]]
+        :raises OSError: If the file cannot be read.
+        """
+        file_stat = stat(path)
+
+        if cached and cached[0] == file_stat.st_size and cached[1] == file_stat.st_mtime_ns:
+            return None
+
+        digest = self._hash_file(path)
+
+        try:
+            header = EspImage.read_header(path)
+            image = {'chip': header.chip, 'offset': header.offset, 'kind': header.kind,
+                     'flash_mode': header.flash_mode, 'flash_size': header.flash_size}
+        except ValueError:
+            image = {'chip': None, 'offset': None, 'kind': 'not an ESP image', 'flash_mode': None, 'flash_size': None}
+
+        return [file_stat.st_size, file_stat.st_mtime_ns, digest], image
+
+    def _apply(self, path: str, scanned: Tuple[list, dict]) -> None:
+        """
+        Stores the result of a scan in the index. The index lock must be held.
+
+        :param path: The absolute path of the file.
+        :type path: str
+        :param scanned: The size, mtime and hash and the image details of the file.
+        :type scanned: Tuple[list, dict]
+        :return: None
+        """
+        index = self._load()
+        file_entry, image = scanned
+        index['files'][path] = file_entry
+        index['images'].setdefault(file_entry[2], image)
+
+    def _entry(self, path: str) -> Optional[FirmwareEntry]:
+        """
+        Creates the entry of an indexed file. The index lock must be held.
+
+        :param path: The absolute path of the file.
+        :type path: str
+        :return: The entry, or None if the file is not indexed.
+        :rtype: Optional[FirmwareEntry]
+        """
+        index = self._load()
+        cached = index['files'].get(path)
+        if not cached:
+            return None
+
+        image = index['images'][cached[2]]
+        return FirmwareEntry(path, basename(path), cached[0], cached[1] / 1e9, cached[2], **image)
+
+    def refresh(self) -> int:
+        """
+        Scans the firmware directories, indexes new and changed files and drops
+        files which no longer exist. Files are hashed without holding the index
+        lock, which is only taken to read and to update the index.
+
+        :return: The number of files which were added, changed or removed.
+        :rtype: int
+        """
+        paths = {abspath(path) for root in self._roots if isdir(root) for path in glob(join(root, self.PATTERN))}
+
+        with self._lock:
+            known = dict(self._load()['files'])
+
+        removed = [path for path in known if path not in paths and not self._exists(path)]
+        scanned = {}
+
+        for path in sorted(paths):
+            try:
+                result = self._scan(path, known.get(path))
+            except OSError as err:
+                debug(f'indexing {path} failed: {err}')
+                continue
+
+            if result:
+                scanned[path] = result
+
+        changed = len(removed) + len(scanned)
+
+        if changed:
+            with self._lock:
+                index = self._load()
+
+                for path in removed:
+                    index['files'].pop(path, None)
+                for path, result in scanned.items():
+                    self._apply(path, result)
+
+                used = {cached[2] for cached in index['files'].values()}
+                index['images'] = {digest: image for digest, image in index['images'].items() if digest in used}
+                self._save()
+
+        info(f'Firmware index: {len(paths)} files in {self._roots}, {changed} changed')
+        return changed
+
+    @staticmethod
+    def _exists(path: str) -> bool:
+        """
+        Checks whether a file still exists.
+
+        :param path: The path of the file.
+        :type path: str
+        :return: True if the file exists.
+        :rtype: bool
+        """
+        try:
+            stat(path)
+            return True
+        except OSError:
+            return False
+
+    def lookup(self, path: str) -> Optional[FirmwareEntry]:
+        """
+        Returns the entry of a file, which is indexed first if it is unknown or changed.
+        Files outside the firmware directories stay in the index until they are removed.
+        The file is hashed without holding the index lock.
+
+        :param path: The path of the file.
+        :type path: str
+        :return: The entry, or None if the file cannot be read.
+        :rtype: Optional[FirmwareEntry]
+        """
+        path = abspath(path)
+
+        with self._lock:
+            cached = self._load()['files'].get(path)
+
+        try:
+            scanned = self._scan(path, cached)
+        except OSError as err:
+            error(f'Indexing {path} failed: {err}')
+            return None
+
+        with self._lock:
+            if scanned:
+                self._apply(path, scanned)
+                self._save()
+
+            return self._entry(path)
+
+    def search(self, text: str = '') -> List[FirmwareEntry]:
+        """
+        Returns the indexed files whose name, chip or image kind contain all words
+        of the search text, newest first. The index is not refreshed.
+
+        :param text: The search text.
+        :type text: str, optional
+        :return: The matching entries.
+        :rtype: List[FirmwareEntry]
+        """
+        words = text.lower().split()
+
+        with self._lock:
+            entries = [self._entry(path) for path in self._load()['files']]
+
+        matches = [entry for entry in entries
+                   if all(word in f'{entry.name} {entry.chip} {entry.kind}'.lower() for word in words)]
+        return sorted(matches, key=lambda entry: entry.mtime, reverse=True)
@@ -0,0 +1,334 @@
+from logging import getLogger, debug
+from hashlib import md5, sha256
+from struct import unpack_from
+from typing import List, NamedTuple, Optional
+
+
+logger = getLogger(__name__)
+
+
+class ImageHeader(NamedTuple):
+    """
+    Represents the header of an ESP firmware image and the flash address derived from it.
+    """
+    chip: Optional[str]
+    chip_id: Optional[int]
+    segments: int
+    flash_mode: str
+    flash_size: str
+    hash_appended: bool
+    kind: str
+    offset: Optional[int]
+
+
+class ImageValidation(NamedTuple):
+    """
+    Represents the result of a pre-flight check of a firmware image.
+    """
+    path: str
+    valid: bool
+    errors: List[str]
+    header: Optional[ImageHeader]
+    size: int
+    md5: str
+    warnings: List[str]
+
+    def __str__(self) -> str:
+        """
+        Returns a short description of the check result.
+
+        :return: The description of the result.
+        :rtype: str
+        """
+        if not self.valid:
+            return '; '.join(self.errors)
+
+        return '; '.join([f'Image OK: {self.size} bytes, MD5 {self.md5}'] + self.warnings)
+
+
+class EspImage:
+    """
+    Represents a utility for reading and checking ESP firmware images without
+    esptool. The target chip is taken from the extended header, and the image is
+    classified as a merged image (bootloader, partition table and application),
+    a bare bootloader or a bare application to derive its flash address.
+
+    :ivar MAGIC: The first byte of an ESP image.
+    :ivar MAGIC_V2: The first byte of an ESP8266 V2 image.
+    :ivar HEADER_SIZE: The size of the common and the extended header.
+    :ivar APP_OFFSET: The default flash address of an application.
+    :ivar PARTITION_TABLE: The flash address of the partition table.
+    :ivar _PARTITION_MAGIC: The first bytes of a partition table entry.
+    :ivar _APP_DESC_MAGIC: The first word of the application description.
+    :ivar _CHIP_IDS: The esptool chip names by image chip id.
+    :ivar _BOOTLOADER_OFFSETS: The flash address of the bootloader per chip.
+    :ivar _FLASH_MODES: The flash modes by header value.
+    :ivar _FLASH_SIZES: The flash sizes by header value of ESP32 chips.
+    :ivar _FLASH_SIZES_ESP8266: The flash sizes by header value of the ESP8266.
+    :ivar _CHECKSUM_SEED: The initial value of the image checksum.
+    """
+    MAGIC = 0xE9
+    MAGIC_V2 = 0xEA
+    HEADER_SIZE = 24
+    APP_OFFSET = 0x10000
+    PARTITION_TABLE = 0x8000
+    _PARTITION_MAGIC = b'\xaa\x50'
+    _APP_DESC_MAGIC = 0xABCD5432
+    _CHIP_IDS = {
+        0: 'esp32',
+        2: 'esp32s2',
+        5: 'esp32c3',
+        9: 'esp32s3',
+        12: 'esp32c2',
+        13: 'esp32c6',
+        16: 'esp32h2',
+        18: 'esp32p4',
+        23: 'esp32c5'
+    }
+    _BOOTLOADER_OFFSETS = {
+        'esp8266': 0x0,
+        'esp32': 0x1000,
+        'esp32s2': 0x1000,
+        'esp32p4': 0x2000,
+        'esp32c5': 0x2000
+    }
+    _FLASH_MODES = {0: 'qio', 1: 'qout', 2: 'dio', 3: 'dout'}
+    _FLASH_SIZES = {0: '1MB', 1: '2MB', 2: '4MB', 3: '8MB', 4: '16MB', 5: '32MB', 6: '64MB', 7: '128MB'}
+    _FLASH_SIZES_ESP8266 = {0: '512KB', 1: '256KB', 2: '1MB', 3: '2MB', 4: '4MB', 5: '2MB-c1', 6: '4MB-c1',
+                            8: '8MB', 9: '16MB'}
+    _CHECKSUM_SEED = 0xEF
+
+    @classmethod
+    def bootloader_offset(cls, chip: str) -> int:
+        """
+        Returns the flash address of the bootloader of a chip.
+
+        :param chip: The esptool chip name.
+        :type chip: str
+        :return: The flash address.
+        :rtype: int
+        """
+        return cls._BOOTLOADER_OFFSETS.get(chip, 0x0)
+
+    @staticmethod
+    def _is_esp8266(data: bytes) -> bool:
+        """
+        Checks whether an image has no extended header, which only ESP8266 images
+        lack: their first segment header follows the common header directly and
+        starts with a load address in RAM.
+
+        :param data: The beginning of the image.
+        :type data: bytes
+        :return: True if the image is an ESP8266 image.
+        :rtype: bool
+        """
+        if data[0] == EspImage.MAGIC_V2:
+            return True
+
+        load_address = unpack_from('<I', data, 8)[0]
+        return 0x3FF00000 <= load_address < 0x40300000
+
+    @classmethod
+    def parse_header(cls, data: bytes) -> ImageHeader:
+        """
+        Parses the header of an image and derives its chip and flash address.
+
+        :param data: The beginning of the image, at least up to the partition table of a merged image.
+        :type data: bytes
+        :return: The parsed header.
+        :rtype: ImageHeader
+        :raises ValueError: If the data is not an ESP image.
+        """
+        if len(data) < cls.HEADER_SIZE or data[0] not in (cls.MAGIC, cls.MAGIC_V2):
+            raise ValueError('Not an ESP image, the magic byte 0xE9 is missing')
+
+        segments, mode, size_freq = data[1], data[2], data[3]
+        flash_mode = cls._FLASH_MODES.get(mode, f'unknown ({mode})')
+
+        if cls._is_esp8266(data):
+            flash_size = cls._FLASH_SIZES_ESP8266.get(size_freq >> 4, 'unknown')
+            return ImageHeader('esp8266', None, segments, flash_mode, flash_size, False, 'merged', 0x0)
+
+        chip_id = unpack_from('<H', data, 12)[0]
+        chip = cls._CHIP_IDS.get(chip_id)
+        flash_size = cls._FLASH_SIZES.get(size_freq >> 4, 'unknown')
+        hash_appended = data[23] == 1
+
+        if chip is None:
+            return ImageHeader(None, chip_id, segments, flash_mode, flash_size, hash_appended, 'unknown', None)
+
+        boot_offset = cls.bootloader_offset(chip)
+        table = cls.PARTITION_TABLE - boot_offset
+
+        if data[table:table + 2] == cls._PARTITION_MAGIC:
+            kind, offset = 'merged', boot_offset
+        elif data[cls.HEADER_SIZE + 8:cls.HEADER_SIZE + 12] == cls._APP_DESC_MAGIC.to_bytes(4, 'little'):
+            kind, offset = 'app', cls.APP_OFFSET
+        else:
+            kind, offset = 'bootloader', boot_offset
+
+        debug(f'image header: {chip} {kind} at 0x{offset:x}')
+        return ImageHeader(chip, chip_id, segments, flash_mode, flash_size, hash_appended, kind, offset)
+
+    @staticmethod
+    def _xor_bytes(data: bytes) -> int:
+        """
+        Combines all bytes with XOR, by folding the data as one large integer.
+
+        :param data: The data.
+        :type data: bytes
+        :return: The XOR of all bytes.
+        :rtype: int
+        """
+        value = int.from_bytes(data, 'little')
+        width = len(data)
+
+        while width > 1:
+            half = (width + 1) // 2
+            value = (value & ((1 << (8 * half)) - 1)) ^ (value >> (8 * half))
+            width = half
+
+        return value
+
+    @classmethod
+    def _check_image(cls, data: bytes, start: int, esp8266: bool) -> List[str]:
+        """
+        Walks the segment table of one image and checks its checksum and, if the
+        header says so, its appended SHA-256 digest.
+
+        :param data: The whole file.
+        :type data: bytes
+        :param start: The position of the image in the file.
+        :type start: int
+        :param esp8266: Whether the image has no extended header.
+        :type esp8266: bool
+        :return: The found errors, empty if the image is intact.
+        :rtype: List[str]
+        """
+        if data[start] == cls.MAGIC_V2:
+            return []
+
+        position = start + (8 if esp8266 else cls.HEADER_SIZE)
+        checksum = cls._CHECKSUM_SEED
+        name = f'Image at 0x{start:x}'
+
+        for index in range(data[start + 1]):
+            if position + 8 > len(data):
+                return [f'{name} is truncated in the header of segment {index}']
+
+            length = unpack_from('<I', data, position + 4)[0]
+            position += 8
+
+            if position + length > len(data):
+                return [f'{name} is truncated in segment {index} ({len(data) - position} of {length} bytes)']
+
+            checksum ^= cls._xor_bytes(data[position:position + length])
+            position += length
+
+        position += 15 - position % 16
+        if position >= len(data):
+            return [f'{name} is truncated, the checksum is missing']
+
+        if data[position] != checksum:
+            return [f'{name} has checksum 0x{data[position]:02x}, expected 0x{checksum:02x}']
+
+        if not esp8266 and data[start + 23] == 1:
+            digest = data[position + 1:position + 33]
+
+            if len(digest) < 32:
+                return [f'{name} is truncated, the SHA-256 digest is missing']
+
+            if sha256(data[start:position + 1]).digest() != digest:
+                return [f'{name} does not match its appended SHA-256 digest']
+
+        return []
+
+    @staticmethod
+    def _size_bytes(flash_size: Optional[str]) -> Optional[int]:
+        """
+        Converts a flash size like '4MB' into bytes.
+
+        :param flash_size: The flash size.
+        :type flash_size: Optional[str]
+        :return: The number of bytes, or None if the size is unknown.
+        :rtype: Optional[int]
+        """
+        if not flash_size:
+            return None
+
+        number = flash_size.split('-')[0].upper()
+        for unit, factor in (('MB', 1024 * 1024), ('KB', 1024)):
+            if number.endswith(unit) and number[:-len(unit)].isdigit():
+                return int(number[:-len(unit)]) * factor
+
+        return None
+
+    @classmethod
+    def validate(cls, path: str, offset: Optional[int] = None, flash_size: Optional[str] = None) -> ImageValidation:
+        """
+        Checks an image before it is flashed: the segment tables and checksums of
+        the contained images, their SHA-256 digests and whether the image fits the
+        flash. The MD5 esptool verifies the written image against is computed as well.
+        A file without an ESP image header, like a partition table or a filesystem
+        image, is only reported with a warning, as it is flashed as raw data.
+
+        :param path: The path of the image.
+        :type path: str
+        :param offset: The flash address, by default the one derived from the header.
+        :type offset: Optional[int]
+        :param flash_size: The flash size like '4MB', by default the one from the header.
+        :type flash_size: Optional[str]
+        :return: The result of the check.
+        :rtype: ImageValidation
+        """
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError as err:
+            return ImageValidation(path, False, [f'Reading the image failed: {err}'], None, 0, '', [])
+
+        errors = []
+        warnings = []
+        header = None
+        padded = data + b'\xff' * (-len(data) % 4)
+
+        try:
+            header = cls.parse_header(data)
+        except ValueError as err:
+            warnings.append(f'{err}, it is flashed as raw data')
+
+        if header:
+            esp8266 = header.chip == 'esp8266'
+            errors.extend(cls._check_image(data, 0, esp8266))
+
+            app = cls.APP_OFFSET - header.offset if header.kind == 'merged' and header.offset is not None else None
+            if app and not esp8266 and len(data) > app and data[app] == cls.MAGIC:
+                errors.extend(cls._check_image(data, app, esp8266))
+
+            offset = header.offset if offset is None else offset
+
+        size = cls._size_bytes(flash_size) or (cls._size_bytes(header.flash_size) if header else None)
+
+        if size and offset is not None and offset + len(data) > size:
+            errors.append(f'Image of {len(data)} bytes at 0x{offset:x} '
+                          f'does not fit into {size // 1024} KB of flash')
+
+        debug(f'validated {path}: {errors or warnings or "ok"}')
+        return ImageValidation(path, not errors, errors, header, len(data), md5(padded).hexdigest(), warnings)
+
+    @classmethod
+    def read_header(cls, path: str) -> ImageHeader:
+        """
+        Reads and parses the header of an image file.
+
+        :param path: The path of the image.
+        :type path: str
+        :return: The parsed header.
+        :rtype: ImageHeader
+        :raises OSError: If the image cannot be read.
+        :raises ValueError: If the file is not an ESP image.
+        """
+        with open(path, 'rb') as file:
+            data = file.read(cls.PARTITION_TABLE + 2)
+
+        return cls.parse_header(data)
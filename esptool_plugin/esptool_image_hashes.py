@@ -0,0 +1,123 @@
+from logging import getLogger, debug, error
+from hashlib import md5
+from json import load, dump
+from os import makedirs, stat
+from os.path import expanduser, join, dirname, abspath
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional
+from config.application_configuration import CACHE_PATH, IMAGE_HASH_CACHE, FLASH_DIFF_BLOCK
+
+
+logger = getLogger(__name__)
+
+
+class ImageHashes(NamedTuple):
+    """
+    Represents the MD5 hashes of a firmware image, as a whole and per flash block.
+    """
+    size: int
+    md5: str
+    block_size: int
+    blocks: List[str]
+
+
+class ImageHashCache:
+    """
+    Computes the MD5 hashes of firmware images once and keeps them on disk. An
+    image is hashed again only if its size or modification time changed.
+    """
+
+    def __init__(self, file_name: str = IMAGE_HASH_CACHE, block_size: int = FLASH_DIFF_BLOCK):
+        """
+        Initializes the cache, which is loaded from disk on first use.
+
+        :param file_name: The name of the cache file below the cache path.
+        :type file_name: str, optional
+        :param block_size: The size of the hashed blocks in bytes.
+        :type block_size: int, optional
+        """
+        self._path = join(expanduser(CACHE_PATH), file_name)
+        self._block_size = block_size
+        self._lock = Lock()
+        self._entries: Optional[Dict[str, list]] = None
+
+    def _load(self) -> Dict[str, list]:
+        """
+        Returns the cached entries, which are read from disk the first time.
+
+        :return: Absolute image paths mapped to size, mtime, block size, hash and block hashes.
+        :rtype: Dict[str, list]
+        """
+        if self._entries is None:
+            try:
+                with open(self._path, 'r', encoding='utf-8') as file:
+                    self._entries = load(file)
+            except (OSError, ValueError):
+                self._entries = {}
+
+        return self._entries
+
+    def _save(self) -> None:
+        """
+        Stores the cached entries.
+
+        :return: None
+        """
+        try:
+            makedirs(dirname(self._path), exist_ok=True)
+            with open(self._path, 'w', encoding='utf-8') as file:
+                dump(self._entries, file)
+        except OSError as err:
+            error(f"Saving image hash cache failed: {err}")
+
+    def _hash(self, path: str) -> ImageHashes:
+        """
+        Reads an image once and hashes it as a whole and per block.
+
+        :param path: The path of the image.
+        :type path: str
+        :return: The hashes of the image.
+        :rtype: ImageHashes
+        """
+        digest = md5()
+        blocks = []
+        size = 0
+
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(self._block_size), b''):
+                digest.update(block)
+                blocks.append(md5(block).hexdigest())
+                size += len(block)
+
+        return ImageHashes(size, digest.hexdigest(), self._block_size, blocks)
+
+    def get(self, path: str) -> ImageHashes:
+        """
+        Returns the hashes of an image, computing them only if the image changed.
+
+        :param path: The path of the image.
+        :type path: str
+        :return: The hashes of the image.
+        :rtype: ImageHashes
+        :raises OSError: If the image cannot be read.
+        """
+        path = abspath(path)
+        file_stat = stat(path)
+
+        with self._lock:
+            entries = self._load()
+            cached = entries.get(path)
+
+            if (cached and cached[0] == file_stat.st_size and cached[1] == file_stat.st_mtime_ns
+                    and cached[2] == self._block_size):
+                return ImageHashes(cached[0], cached[3], cached[2], cached[4])
+
+            hashes = self._hash(path)
+            entries[path] = [file_stat.st_size, file_stat.st_mtime_ns, hashes.block_size, hashes.md5, hashes.blocks]
+            self._save()
+
+        debug(f'hashed image {path}: {len(hashes.blocks)} blocks')
+        return hashes
+
+
+image_hashes = ImageHashCache()
@@ -0,0 +1,164 @@
+from logging import getLogger, debug, info
+from hashlib import sha256
+from os import makedirs, replace
+from os.path import expanduser, join, exists, getsize
+from typing import List, NamedTuple, Tuple
+from config.application_configuration import CACHE_PATH, MERGED_IMAGE_CACHE
+
+
+logger = getLogger(__name__)
+
+
+class MergedImage(NamedTuple):
+    """
+    Represents a merged image and the flash address it has to be written to.
+    """
+    path: str
+    offset: int
+    size: int
+    cached: bool
+
+
+class MergedImageBuilder:
+    """
+    Represents a utility for merging several images with their flash addresses into
+    one file, like the merge_bin command of esptool. Gaps between the images are
+    filled with erased flash bytes. Merged images are cached by the hashes of their
+    inputs, so the same set of images is merged only once. Regions cut out of an
+    image are cached the same way.
+
+    :ivar FILL: The byte of erased flash.
+    """
+    FILL = b'\xff'
+
+    def __init__(self, directory: str = MERGED_IMAGE_CACHE):
+        """
+        Initializes the builder with its cache directory.
+
+        :param directory: The name of the cache directory below the cache path.
+        :type directory: str, optional
+        """
+        self._directory = join(expanduser(CACHE_PATH), directory)
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """
+        Calculates the SHA-256 hash of a file.
+
+        :param path: The path of the file.
+        :type path: str
+        :return: The hex digest of the file.
+        :rtype: str
+        """
+        digest = sha256()
+
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(65536), b''):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def _check_overlaps(images: List[Tuple[int, str]]) -> None:
+        """
+        Checks that no image overlaps the next one.
+
+        :param images: The flash addresses and paths of the images, sorted by address.
+        :type images: List[Tuple[int, str]]
+        :return: None
+        :raises ValueError: If two images overlap.
+        """
+        for (offset, path), (next_offset, next_path) in zip(images, images[1:]):
+            if offset + getsize(path) > next_offset:
+                raise ValueError(f'{path} at 0x{offset:x} overlaps {next_path} at 0x{next_offset:x}')
+
+    def extract(self, path: str, start: int, size: int, offset: int) -> MergedImage:
+        """
+        Cuts a region out of an image, e.g. the application of a merged image, so
+        it can be written on its own.
+
+        :param path: The path of the image.
+        :type path: str
+        :param start: The position of the region in the image.
+        :type start: int
+        :param size: The maximum size of the region; it ends earlier at the end of the image.
+        :type size: int
+        :param offset: The flash address the region has to be written to.
+        :type offset: int
+        :return: The region as image.
+        :rtype: MergedImage
+        :raises ValueError: If the image ends before the region starts.
+        :raises OSError: If the image cannot be read or the region cannot be written.
+        """
+        if getsize(path) <= start:
+            raise ValueError(f'{path} ends before 0x{start:x}')
+
+        key = sha256(f'{start:x}:{size:x}:{self._hash_file(path)}'.encode())
+        region = join(self._directory, f'region_{key.hexdigest()[:16]}.bin')
+
+        if exists(region):
+            debug(f'image region cache hit: {region}')
+            return MergedImage(region, offset, getsize(region), True)
+
+        makedirs(self._directory, exist_ok=True)
+        partial = f'{region}.partial'
+
+        with open(path, 'rb') as file, open(partial, 'wb') as output:
+            file.seek(start)
+            remaining = size
+
+            for block in iter(lambda: file.read(min(65536, remaining)), b''):
+                output.write(block)
+                remaining -= len(block)
+
+            length = output.tell()
+
+        replace(partial, region)
+        info(f'Extracted 0x{start:x}+{length} bytes of {path} into {region}')
+        return MergedImage(region, offset, length, False)
+
+    def build(self, images: List[Tuple[int, str]]) -> MergedImage:
+        """
+        Merges images into one file, which is written to the lowest flash address.
+
+        :param images: The flash addresses and paths of the images.
+        :type images: List[Tuple[int, str]]
+        :return: The merged image.
+        :rtype: MergedImage
+        :raises ValueError: If no image is given or two images overlap.
+        :raises OSError: If an image cannot be read or the merged image cannot be written.
+        """
+        if not images:
+            raise ValueError('No images to merge')
+
+        images = sorted(images)
+        self._check_overlaps(images)
+
+        key = sha256(';'.join(f'{offset:x}:{self._hash_file(path)}' for offset, path in images).encode())
+        path = join(self._directory, f'merged_{key.hexdigest()[:16]}.bin')
+        base = images[0][0]
+
+        if exists(path):
+            debug(f'merged image cache hit: {path}')
+            return MergedImage(path, base, getsize(path), True)
+
+        makedirs(self._directory, exist_ok=True)
+        partial = f'{path}.partial'
+
+        with open(partial, 'wb') as output:
+            for offset, image in images:
+                output.write(self.FILL * (offset - base - output.tell()))
+
+                with open(image, 'rb') as file:
+                    for block in iter(lambda: file.read(65536), b''):
+                        output.write(block)
+
+            output.write(self.FILL * (-output.tell() % 4))
+            size = output.tell()
+
+        replace(partial, path)
+        info(f'Merged {len(images)} images into {path} ({size} bytes at 0x{base:x})')
+        return MergedImage(path, base, size, False)
+
+
+merge_builder = MergedImageBuilder()
@@ -0,0 +1,232 @@
+from logging import getLogger, debug
+from struct import pack, unpack_from
+from zlib import crc32
+from typing import List, NamedTuple, Optional
+
+
+logger = getLogger(__name__)
+
+
+class Partition(NamedTuple):
+    """
+    Represents an entry of an ESP partition table.
+    """
+    label: str
+    type: int
+    subtype: int
+    offset: int
+    size: int
+    flags: int
+
+    @property
+    def type_name(self) -> str:
+        """
+        Returns the readable name of the partition type.
+
+        :return: The type name.
+        :rtype: str
+        """
+        return PartitionTable.TYPES.get(self.type, f'0x{self.type:02x}')
+
+    @property
+    def subtype_name(self) -> str:
+        """
+        Returns the readable name of the partition subtype.
+
+        :return: The subtype name.
+        :rtype: str
+        """
+        if self.type == PartitionTable.TYPE_APP:
+            if self.subtype == 0x00:
+                return 'factory'
+            if 0x10 <= self.subtype < 0x20:
+                return f'ota_{self.subtype - 0x10}'
+            if self.subtype == 0x20:
+                return 'test'
+
+        if self.type == PartitionTable.TYPE_DATA:
+            return PartitionTable.DATA_SUBTYPES.get(self.subtype, f'0x{self.subtype:02x}')
+
+        return f'0x{self.subtype:02x}'
+
+    def __str__(self) -> str:
+        """
+        Returns the partition as a row of the table.
+
+        :return: The description of the partition.
+        :rtype: str
+        """
+        return (f'{self.label:<16} {self.type_name:<5} {self.subtype_name:<9} '
+                f'0x{self.offset:08x} {self.size // 1024:>6} KB')
+
+
+class PartitionTable:
+    """
+    Represents a utility for parsing the binary partition table of ESP32 chips,
+    which esptool reads from the flash.
+
+    :ivar OFFSET: The default flash address of the partition table.
+    :ivar SIZE: The maximum size of the partition table.
+    :ivar TYPE_APP: The partition type of applications.
+    :ivar TYPE_DATA: The partition type of data.
+    :ivar TYPES: The names of the partition types.
+    :ivar DATA_SUBTYPES: The names of the data partition subtypes.
+    :ivar FILESYSTEMS: The data subtypes of filesystem partitions.
+    :ivar _ENTRY_SIZE: The size of one entry.
+    :ivar _MAGIC: The first bytes of an entry.
+    :ivar _MD5_MAGIC: The first bytes of the optional MD5 entry.
+    :ivar _OTA_SLOTS: The app subtypes of the OTA slots.
+    :ivar _OTA_INVALID: The OTA states of a slot which must not be booted.
+    """
+    OFFSET = 0x8000
+    SIZE = 0xC00
+    TYPE_APP = 0x00
+    TYPE_DATA = 0x01
+    TYPES = {0x00: 'app', 0x01: 'data'}
+    DATA_SUBTYPES = {0x00: 'ota', 0x01: 'phy', 0x02: 'nvs', 0x03: 'coredump', 0x04: 'nvs_keys',
+                     0x05: 'efuse', 0x80: 'esphttpd', 0x81: 'fat', 0x82: 'spiffs', 0x83: 'littlefs'}
+    FILESYSTEMS = (0x81, 0x82, 0x83)
+    _ENTRY_SIZE = 32
+    _MAGIC = b'\xaa\x50'
+    _MD5_MAGIC = b'\xeb\xeb'
+    _OTA_SLOTS = range(0x10, 0x20)
+    _OTA_INVALID = (3, 4)
+
+    @classmethod
+    def parse(cls, data: bytes) -> List[Partition]:
+        """
+        Parses a binary partition table until its end marker.
+
+        :param data: The partition table as read from the flash.
+        :type data: bytes
+        :return: The partitions in table order.
+        :rtype: List[Partition]
+        :raises ValueError: If the data contains no partition table.
+        """
+        partitions = []
+
+        for position in range(0, len(data) - cls._ENTRY_SIZE + 1, cls._ENTRY_SIZE):
+            entry = data[position:position + cls._ENTRY_SIZE]
+
+            if entry[:2] != cls._MAGIC:
+                if entry[:2] == cls._MD5_MAGIC or entry[:2] == b'\xff\xff':
+                    break
+                raise ValueError(f'Invalid partition table entry at 0x{position:x}')
+
+            partition_type, subtype, offset, size = unpack_from('<BBII', entry, 2)
+            label = entry[12:28].split(b'\x00')[0].decode(errors='replace')
+            flags = unpack_from('<I', entry, 28)[0]
+            partitions.append(Partition(label, partition_type, subtype, offset, size, flags))
+
+        if not partitions:
+            raise ValueError('No partition table found')
+
+        debug(f'partition table: {[partition.label for partition in partitions]}')
+        return partitions
+
+    @classmethod
+    def read_image(cls, path: str, offset: int) -> List[Partition]:
+        """
+        Parses the partition table contained in a merged image.
+
+        :param path: The path of the image.
+        :type path: str
+        :param offset: The flash address the image is written to.
+        :type offset: int
+        :return: The partitions in table order.
+        :rtype: List[Partition]
+        :raises OSError: If the image cannot be read.
+        :raises ValueError: If the image contains no partition table.
+        """
+        with open(path, 'rb') as file:
+            file.seek(cls.OFFSET - offset)
+            return cls.parse(file.read(cls.SIZE))
+
+    @classmethod
+    def format(cls, partitions: List[Partition], boot: Optional[Partition] = None) -> str:
+        """
+        Formats the partitions as a readable table, the booted app is marked.
+
+        :param partitions: The partitions of the table.
+        :type partitions: List[Partition]
+        :param boot: The app partition the bootloader starts, if known.
+        :type boot: Optional[Partition]
+        :return: The table text.
+        :rtype: str
+        """
+        lines = [f'  {"Label":<16} {"Type":<5} {"Subtype":<9} {"Offset":<10} {"Size":>9}']
+        lines.extend(f'{"*" if partition == boot else " "} {partition}' for partition in partitions)
+        return "\n".join(lines)
+
+    @classmethod
+    def filesystem(cls, partitions: List[Partition], label: Optional[str] = None) -> Optional[Partition]:
+        """
+        Returns the filesystem partition, by label or else the first data partition
+        with a filesystem subtype. MicroPython names its partition 'vfs'.
+
+        :param partitions: The partitions of the table.
+        :type partitions: List[Partition]
+        :param label: The label of the partition, by default 'vfs' if present.
+        :type label: Optional[str]
+        :return: The filesystem partition, or None if there is none.
+        :rtype: Optional[Partition]
+        """
+        candidates = [partition for partition in partitions
+                      if partition.type == cls.TYPE_DATA and partition.subtype in cls.FILESYSTEMS]
+
+        if label:
+            return next((partition for partition in candidates if partition.label == label), None)
+
+        return next((partition for partition in candidates if partition.label == 'vfs'),
+                    candidates[0] if candidates else None)
+
+    @classmethod
+    def _ota_sequence(cls, otadata: bytes) -> Optional[int]:
+        """
+        Returns the highest valid sequence number of the two OTA selection entries.
+
+        :param otadata: The first 32 bytes of both sectors of the OTA data partition.
+        :type otadata: bytes
+        :return: The sequence number, or None if no entry is valid.
+        :rtype: Optional[int]
+        """
+        sequences = []
+
+        for position in (0, 32):
+            if len(otadata) < position + 32:
+                break
+
+            sequence, state, crc = unpack_from('<I20xII', otadata, position)
+            if sequence in (0, 0xFFFFFFFF) or state in cls._OTA_INVALID:
+                continue
+
+            if crc32(pack('<I', sequence), 0xFFFFFFFF) == crc:
+                sequences.append(sequence)
+
+        return max(sequences, default=None)
+
+    @classmethod
+    def boot_app(cls, partitions: List[Partition], otadata: Optional[bytes] = None) -> Optional[Partition]:
+        """
+        Returns the app partition the bootloader starts: the OTA slot selected in
+        the OTA data partition, else the factory app, else the first OTA slot.
+
+        :param partitions: The partitions of the table.
+        :type partitions: List[Partition]
+        :param otadata: The selection entries of the OTA data partition, if there is one.
+        :type otadata: Optional[bytes]
+        :return: The app partition, or None if the table has no app partition.
+        :rtype: Optional[Partition]
+        """
+        apps = [partition for partition in partitions if partition.type == cls.TYPE_APP]
+        slots = sorted((partition for partition in apps if partition.subtype in cls._OTA_SLOTS),
+                       key=lambda partition: partition.subtype)
+        sequence = cls._ota_sequence(otadata) if otadata and slots else None
+
+        if sequence is not None:
+            slot = (sequence - 1) % len(slots)
+            debug(f'OTA sequence {sequence} selects {slots[slot].label}')
+            return slots[slot]
+
+        factory = next((partition for partition in apps if partition.subtype == 0x00), None)
+        return factory or (slots[0] if slots else None)
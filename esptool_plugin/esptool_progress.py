@@ -0,0 +1,190 @@
+from logging import getLogger
+from enum import Enum
+from re import compile as compile_pattern
+from time import monotonic
+from typing import NamedTuple, Optional
+from config.application_configuration import PROGRESS_INTERVAL
+
+
+logger = getLogger(__name__)
+
+
+class ProgressKind(str, Enum):
+    """
+    The kinds of events which are recognized in the esptool output.
+    """
+    CONNECT = 'connect'
+    CHIP = 'chip'
+    STUB = 'stub'
+    BAUD = 'baud'
+    ERASE = 'erase'
+    WRITE = 'write'
+    READ = 'read'
+    WROTE = 'wrote'
+    VERIFIED = 'verified'
+    RESET = 'reset'
+
+
+class ProgressEvent(NamedTuple):
+    """
+    Represents a single structured event of an esptool command.
+    """
+    kind: ProgressKind
+    message: str
+    percent: Optional[float] = None
+    offset: Optional[int] = None
+    rate: Optional[float] = None
+    eta: Optional[float] = None
+
+    def __str__(self) -> str:
+        """
+        Returns a short text with percentage, throughput and remaining time, if known.
+
+        :return: The description of the event.
+        :rtype: str
+        """
+        if self.percent is None:
+            return self.message
+
+        head = f'{self.kind.value.capitalize()} {self.percent:.0f}%'
+        if self.offset is not None:
+            head += f' at 0x{self.offset:08x}'
+
+        parts = [head]
+        if self.rate:
+            parts.append(f'{self.rate / 1024:.1f} KiB/s')
+        if self.eta is not None:
+            parts.append(f'ETA {self.eta:.0f}s')
+
+        return ', '.join(parts)
+
+
+class ProgressParser:
+    """
+    Turns esptool output lines into progress events and decides which progress
+    events are due, so they are delivered at most once per interval.
+
+    :ivar _PATTERNS: The output patterns of the events without progress.
+    """
+    _PATTERNS = [
+        (ProgressKind.CONNECT, compile_pattern(r'^Connecting')),
+        (ProgressKind.CHIP, compile_pattern(r'^Chip is ')),
+        (ProgressKind.STUB, compile_pattern(r'^Stub running')),
+        (ProgressKind.BAUD, compile_pattern(r'^Changed\.$')),
+        (ProgressKind.ERASE, compile_pattern(r'^(Erasing|Flash will be erased|Chip erase completed)')),
+        (ProgressKind.WROTE, compile_pattern(r'^(Wrote|Read) \d+ bytes')),
+        (ProgressKind.VERIFIED, compile_pattern(r'^Hash of data verified')),
+        (ProgressKind.RESET, compile_pattern(r'^(Hard resetting|Leaving)')),
+    ]
+    _COMPRESSED = compile_pattern(r'^Compressed (\d+) bytes to (\d+)')
+    _WRITING = compile_pattern(r'^Writing at 0x([0-9a-fA-F]+)\.\.\. \((\d+) ?%\)')
+    _READING = compile_pattern(r'^(\d+) \((\d+) ?%\)$')
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL):
+        """
+        Initializes a parser for the output of one command.
+
+        :param interval: The minimum number of seconds between two progress events.
+        :type interval: float, optional
+        """
+        self._interval = interval
+        self._total: Optional[int] = None
+        self._start: Optional[float] = None
+        self._last = 0.0
+
+    def _progress(self, kind: ProgressKind, line: str, percent: float,
+                  offset: Optional[int], done: Optional[int]) -> ProgressEvent:
+        """
+        Creates a progress event with throughput and remaining time.
+
+        :param kind: The kind of the event.
+        :type kind: ProgressKind
+        :param line: The output line.
+        :type line: str
+        :param percent: The progress in percent.
+        :type percent: float
+        :param offset: The current flash offset, if known.
+        :type offset: Optional[int]
+        :param done: The number of bytes done, if known.
+        :type done: Optional[int]
+        :return: The event.
+        :rtype: ProgressEvent
+        """
+        now = monotonic()
+
+        if self._start is None:
+            self._start = now
+            self._last = 0.0
+
+        elapsed = now - self._start
+
+        if done is None and self._total:
+            done = int(self._total * percent / 100)
+
+        rate = done / elapsed if done and elapsed > 0 else None
+        eta = elapsed * (100 - percent) / percent if 0 < percent and elapsed > 0 else None
+
+        return ProgressEvent(kind, line, percent, offset, rate, eta)
+
+    def parse(self, line: str) -> Optional[ProgressEvent]:
+        """
+        Parses a single output line.
+
+        :param line: The stripped output line.
+        :type line: str
+        :return: The event, or None if the line is not an event.
+        :rtype: Optional[ProgressEvent]
+        """
+        match = self._WRITING.match(line)
+        if match:
+            return self._progress(ProgressKind.WRITE, line, float(match.group(2)), int(match.group(1), 16), None)
+
+        match = self._READING.match(line)
+        if match:
+            return self._progress(ProgressKind.READ, line, float(match.group(2)), None, int(match.group(1)))
+
+        match = self._COMPRESSED.match(line)
+        if match:
+            self._total = int(match.group(1))
+            self._start = None
+            return None
+
+        for kind, pattern in self._PATTERNS:
+            if pattern.match(line):
+                if kind == ProgressKind.WROTE:
+                    self._start = None
+                return ProgressEvent(kind, line)
+
+        return None
+
+    @staticmethod
+    def is_progress(event: ProgressEvent) -> bool:
+        """
+        Checks whether an event reports the progress of a transfer.
+
+        :param event: The event.
+        :type event: ProgressEvent
+        :return: True for write and read progress.
+        :rtype: bool
+        """
+        return event.kind in (ProgressKind.WRITE, ProgressKind.READ)
+
+    def is_due(self, event: ProgressEvent) -> bool:
+        """
+        Checks whether an event is delivered. Progress events are throttled to one
+        per interval, the first and the final one are always delivered.
+
+        :param event: The event.
+        :type event: ProgressEvent
+        :return: True if the event is delivered.
+        :rtype: bool
+        """
+        if not self.is_progress(event):
+            return True
+
+        now = monotonic()
+        if event.percent < 100 and now - self._last < self._interval:
+            return False
+
+        self._last = now
+        return True
@@ -0,0 +1,601 @@
+from logging import getLogger
+from argparse import Namespace
+from gzip import open as gzip_open
+from hashlib import md5, sha256
+from io import BytesIO
+from json import dump, dumps, load, loads
+from struct import unpack_from
+from os import replace
+from sys import exit, stdin, stderr
+from time import monotonic
+from traceback import format_exc
+from typing import Tuple
+from serial import SerialException
+from esptool import FatalError, NotImplementedInROMError, cmds, main as esptool_main
+from esptool.loader import ESPLoader
+from esptool.targets import CHIP_DEFS
+from esptool.util import flash_size_bytes
+
+
+logger = getLogger(__name__)
+
+
+RESULT_MARKER = '#RESULT '
+
+
+def _connect(port: str, chip: str, baud: int) -> Tuple[ESPLoader, int]:
+    """
+    Connects to the device, uploads the stub, switches to the requested baud rate
+    and configures the detected flash size, like esptool does before flash commands.
+
+    :param port: The serial port of the device.
+    :type port: str
+    :param chip: The esptool chip name or 'auto'.
+    :type chip: str
+    :param baud: The baud rate used after the connection was established.
+    :type baud: int
+    :return: The connected loader and the baud rate of the connection.
+    :rtype: Tuple[ESPLoader, int]
+    """
+    if chip == 'auto':
+        esp = cmds.detect_chip(port, ESPLoader.ESP_ROM_BAUD)
+    else:
+        esp = CHIP_DEFS[chip](port, ESPLoader.ESP_ROM_BAUD)
+        esp.connect()
+
+    print(f"Chip is {esp.get_chip_description()}")
+
+    if not esp.secure_download_mode and not esp.stub_is_disabled:
+        esp = esp.run_stub()
+    else:
+        esp.flash_spi_attach(0)
+
+    current = ESPLoader.ESP_ROM_BAUD
+    if baud > ESPLoader.ESP_ROM_BAUD:
+        try:
+            esp.change_baud(baud)
+            current = baud
+        except NotImplementedInROMError:
+            print(f"WARNING: ROM doesn't support changing baud rate. Keeping {ESPLoader.ESP_ROM_BAUD}")
+
+    flash_size = cmds.detect_flash_size(esp)
+    if flash_size is not None:
+        print("Configuring flash size...")
+        esp.flash_set_parameters(flash_size_bytes(flash_size))
+
+    return esp, current
+
+
+def _flash_args(esp: ESPLoader, operation: dict, addr_filename: list) -> Namespace:
+    """
+    Creates the arguments which the esptool flash commands expect.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation with optional flash parameters.
+    :type operation: dict
+    :param addr_filename: The flash addresses and opened files to write or verify.
+    :type addr_filename: list
+    :return: The esptool arguments.
+    :rtype: Namespace
+    """
+    chip = next(name for name, loader in CHIP_DEFS.items() if loader.CHIP_NAME == esp.CHIP_NAME)
+
+    return Namespace(
+        chip=chip,
+        addr_filename=addr_filename,
+        flash_mode=operation.get('flash_mode', 'keep'),
+        flash_freq=operation.get('flash_freq', 'keep'),
+        flash_size=operation.get('flash_size', 'keep'),
+        compress=None,
+        no_compress=False,
+        no_stub=not esp.IS_STUB,
+        encrypt=False,
+        encrypt_files=None,
+        erase_all=False,
+        force=False,
+        ignore_flash_encryption_efuse_setting=False,
+        verify=False,
+        diff='no'
+    )
+
+
+def _chip_info(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Reads the chip description, features and crystal frequency.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation and its parameters.
+    :type operation: dict
+    :return: The structured result.
+    :rtype: dict
+    """
+    _ = operation
+    return {'chip': esp.get_chip_description(),
+            'features': esp.get_chip_features(),
+            'crystal_mhz': esp.get_crystal_freq()}
+
+
+def _read_mac(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Reads the MAC address.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation and its parameters.
+    :type operation: dict
+    :return: The structured result.
+    :rtype: dict
+    """
+    _ = operation
+    return {'mac': ':'.join(f'{byte:02x}' for byte in esp.read_mac())}
+
+
+def _flash_id(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Reads the manufacturer, device id and detected size of the flash chip.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation and its parameters.
+    :type operation: dict
+    :return: The structured result.
+    :rtype: dict
+    """
+    _ = operation
+    flash_id = esp.flash_id()
+    size_id = (flash_id >> 16) & 0xFF
+    return {'manufacturer': flash_id & 0xFF,
+            'device': (((flash_id >> 8) & 0xFF) << 8) | size_id,
+            'size': cmds.DETECTED_FLASH_SIZES.get(size_id)}
+
+
+def _read_flash_status(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Reads the status register of the flash chip.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation and its parameters.
+    :type operation: dict
+    :return: The structured result.
+    :rtype: dict
+    """
+    return {'status': esp.read_status(operation.get('bytes', 2))}
+
+
+def _erase_flash(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Erases the whole flash.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation and its parameters.
+    :type operation: dict
+    :return: The structured result.
+    :rtype: dict
+    """
+    _ = operation
+    cmds.erase_flash(esp, Namespace(force=False))
+    return {}
+
+
+def _write_flash(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Writes an image file to the flash at the given address, or several images
+    given as a list of address and file pairs.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation and its parameters.
+    :type operation: dict
+    :return: The structured result.
+    :rtype: dict
+    """
+    if 'images' not in operation:
+        with open(operation['file'], 'rb') as file:
+            cmds.write_flash(esp, _flash_args(esp, operation, [(operation['address'], file)]))
+        return {'address': operation['address'], 'file': operation['file']}
+
+    files = []
+    try:
+        for address, path in sorted(operation['images']):
+            files.append((address, open(path, 'rb')))
+        cmds.write_flash(esp, _flash_args(esp, operation, files))
+    finally:
+        for _, file in files:
+            file.close()
+
+    return {'images': len(files)}
+
+
+def _verify_flash(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Verifies the flash content at the given address against an image file.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation and its parameters.
+    :type operation: dict
+    :return: The structured result.
+    :rtype: dict
+    """
+    with open(operation['file'], 'rb') as file:
+        cmds.verify_flash(esp, _flash_args(esp, operation, [(operation['address'], file)]))
+    return {'address': operation['address'], 'file': operation['file'], 'verified': True}
+
+
+def _write_flash_diff(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Writes only the blocks of an image which differ from the flash content. The
+    MD5 of the whole region is compared first, so an identical image is skipped
+    after a single command; otherwise every block is compared with its hash
+    precomputed on the host, and adjacent changed blocks are written together.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation with address, file, image hash, block size and block hashes.
+    :type operation: dict
+    :return: The structured result.
+    :rtype: dict
+    """
+    address = operation['address']
+    result = {'address': address, 'file': operation['file']}
+
+    if any(operation.get(key, 'keep') != 'keep' for key in ('flash_mode', 'flash_freq', 'flash_size')):
+        print("Flash parameters change the image header, writing the whole image")
+        return {**_write_flash(esp, operation), 'written': operation['size'], 'skipped': False}
+
+    if esp.flash_md5sum(address, operation['size']) == operation['md5']:
+        print(f"Flash content at 0x{address:08x} is identical, skipping write")
+        return {**result, 'written': 0, 'skipped': True}
+
+    with open(operation['file'], 'rb') as file:
+        image = file.read()
+
+    block_size = operation['block_size']
+    runs = []
+
+    for index, digest in enumerate(operation['blocks']):
+        block = image[index * block_size:(index + 1) * block_size]
+        if esp.flash_md5sum(address + index * block_size, len(block)) == digest:
+            continue
+
+        if runs and runs[-1][1] == index:
+            runs[-1][1] = index + 1
+        else:
+            runs.append([index, index + 1])
+
+    regions = []
+    for first, last in runs:
+        region = BytesIO(image[first * block_size:last * block_size])
+        region.name = f"{operation['file']}@0x{address + first * block_size:x}"
+        regions.append((address + first * block_size, region))
+
+    changed = sum(last - first for first, last in runs)
+    print(f"{changed} of {len(operation['blocks'])} blocks differ, writing {len(regions)} regions")
+
+    if regions:
+        cmds.write_flash(esp, _flash_args(esp, operation, regions))
+
+    return {**result, 'written': sum(len(region.getvalue()) for _, region in regions), 'skipped': not regions}
+
+
+def _restore_baud(esp: ESPLoader, rate: int, size: int, expected: str) -> bool:
+    """
+    Switches the connection back to a stable baud rate after a failed probe rate
+    and checks that the device answers again with the expected checksum.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param rate: The stable baud rate.
+    :type rate: int
+    :param size: The size of the test block.
+    :type size: int
+    :param expected: The MD5 of the test block.
+    :type expected: str
+    :return: True if the connection works at the stable rate again.
+    :rtype: bool
+    """
+    try:
+        esp.flush_input()
+        esp.change_baud(rate)
+        restored = esp.flash_md5sum(0, size) == expected
+    except (FatalError, SerialException, StopIteration) as err:
+        print(f"Returning to baud rate {rate} failed: {err}")
+        return False
+
+    print(f"Returned to baud rate {rate}" if restored else f"Returning to baud rate {rate} failed: checksum mismatch")
+    return restored
+
+
+def _probe_baud(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Finds the fastest baud rate at which a block of flash is read back with the
+    checksum the device calculates itself. The rates are tried in ascending order
+    and the probe stops at the first failing one, then the connection returns to
+    the fastest stable rate.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation with the candidate rates, the size of the test block and the current rate.
+    :type operation: dict
+    :return: The structured result, with whether the connection works at the reported rate.
+    :rtype: dict
+    """
+    size = operation.get('size', 0x10000)
+    expected = esp.flash_md5sum(0, size)
+    stable = operation['baud']
+
+    for rate in sorted(operation['rates']):
+        if rate <= stable:
+            continue
+
+        try:
+            esp.change_baud(rate)
+            received = md5(esp.read_flash(0, size)).hexdigest()
+        except (FatalError, SerialException, StopIteration) as err:
+            print(f"Baud rate {rate} failed: {err}")
+            return {'baud': stable, 'restored': _restore_baud(esp, stable, size, expected)}
+
+        if received != expected:
+            print(f"Baud rate {rate} failed: checksum mismatch")
+            return {'baud': stable, 'restored': _restore_baud(esp, stable, size, expected)}
+
+        print(f"Baud rate {rate} passed")
+        stable = rate
+
+    return {'baud': stable, 'restored': True}
+
+
+def _read_partition_table(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Reads the binary partition table from the flash and, if the table has an OTA
+    data partition, its two selection entries, which tell the booted app slot.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation with the optional address and size of the table.
+    :type operation: dict
+    :return: The structured result with the table and the OTA data as hex strings.
+    :rtype: dict
+    """
+    data = esp.read_flash(operation.get('address', 0x8000), operation.get('size', 0xC00))
+    result = {'data': data.hex()}
+
+    for position in range(0, len(data) - 31, 32):
+        if data[position:position + 2] != b'\xaa\x50':
+            break
+
+        if data[position + 2:position + 4] == b'\x01\x00':
+            offset = unpack_from('<I', data, position + 4)[0]
+            result['otadata'] = (esp.read_flash(offset, 32) + esp.read_flash(offset + 0x1000, 32)).hex()
+            break
+
+    return result
+
+
+def _backup_flash(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Streams the flash content into a gzip compressed file, one chunk at a time,
+    and stores a manifest with the MD5 of the whole region and of every block
+    next to it. The progress is written in the format of esptool's read progress
+    while the data arrives, once per percent.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation with file, manifest, chunk and block size, and optional address and size.
+    :type operation: dict
+    :return: The structured result.
+    :rtype: dict
+    :raises FatalError: If the flash size cannot be detected or the chunk is smaller than a block.
+    """
+    address = operation.get('address', 0)
+    size = operation.get('size')
+    if not size:
+        flash_size = cmds.detect_flash_size(esp)
+        if flash_size is None:
+            raise FatalError("The flash size cannot be detected, the backup needs a size")
+        size = flash_size_bytes(flash_size) - address
+    block_size = operation['block_size']
+    chunk = operation['chunk'] - operation['chunk'] % block_size
+    if chunk < block_size:
+        raise FatalError(f"The backup read chunk of {operation['chunk']} bytes is smaller than a block of "
+                         f"{block_size} bytes")
+    digest, image_digest, blocks = md5(), sha256(), []
+    reported = 0
+
+    def progress(done: int) -> None:
+        nonlocal reported
+        percent = done * 100 // size
+        if percent > reported:
+            reported = percent
+            print(f"{done} ({percent} %)")
+
+    print("0 (0 %)")
+    start = monotonic()
+
+    with gzip_open(f"{operation['file']}.partial", 'wb', compresslevel=6) as output:
+        for position in range(address, address + size, chunk):
+            data = esp.read_flash(position, min(chunk, address + size - position),
+                                  progress_fn=lambda read, _, offset=position - address: progress(offset + read))
+            output.write(data)
+            digest.update(data)
+            image_digest.update(data)
+            blocks.extend(md5(data[index:index + block_size]).hexdigest() for index in range(0, len(data), block_size))
+
+    seconds = monotonic() - start
+    manifest = {'chip': esp.CHIP_NAME, 'address': address, 'size': size, 'block_size': block_size,
+                'md5': digest.hexdigest(), 'sha256': image_digest.hexdigest(), 'blocks': blocks}
+
+    with open(f"{operation['manifest']}.partial", 'w', encoding='utf-8') as file:
+        dump(manifest, file)
+
+    replace(f"{operation['file']}.partial", operation['file'])
+    replace(f"{operation['manifest']}.partial", operation['manifest'])
+    print(f"Read {size} bytes at 0x{address:08x} in {seconds:.1f} seconds ({size / seconds / 1024:.1f} KiB/s)")
+    return {'address': address, 'file': operation['file'], 'read': size, 'md5': digest.hexdigest()}
+
+
+def _restore_flash(esp: ESPLoader, operation: dict) -> dict:
+    """
+    Writes a backup created by the backup operation back to the flash. Blocks whose
+    MD5 on the device matches the manifest are skipped; the backup is decompressed
+    as a stream and the changed blocks are written in regions of a bounded size.
+
+    :param esp: The connected loader.
+    :type esp: ESPLoader
+    :param operation: The operation with file, manifest and region size.
+    :type operation: dict
+    :return: The structured result.
+    :rtype: dict
+    :raises FatalError: If the backup was made from another chip.
+    """
+    with open(operation['manifest'], 'r', encoding='utf-8') as file:
+        manifest = load(file)
+
+    if manifest['chip'] != esp.CHIP_NAME:
+        raise FatalError(f"Backup was made from {manifest['chip']}, the device is {esp.CHIP_NAME}")
+
+    address, size, block_size = manifest['address'], manifest['size'], manifest['block_size']
+    result = {'address': address, 'file': operation['file']}
+
+    if esp.flash_md5sum(address, size) == manifest['md5']:
+        print(f"Flash content at 0x{address:08x} is identical, skipping restore")
+        return {**result, 'written': 0, 'skipped': True}
+
+    runs = []
+    for index, digest in enumerate(manifest['blocks']):
+        length = min(block_size, size - index * block_size)
+        if esp.flash_md5sum(address + index * block_size, length) == digest:
+            continue
+
+        if runs and runs[-1][1] == index and (index + 1 - runs[-1][0]) * block_size <= operation['region']:
+            runs[-1][1] = index + 1
+        else:
+            runs.append([index, index + 1])
+
+    print(f"{sum(last - first for first, last in runs)} of {len(manifest['blocks'])} blocks differ, "
+          f"writing {len(runs)} regions")
+    written = 0
+
+    with gzip_open(operation['file'], 'rb') as backup:
+        for first, last in runs:
+            backup.seek(first * block_size)
+            region = BytesIO(backup.read((last - first) * block_size))
+            region.name = f"{operation['file']}@0x{address + first * block_size:x}"
+            cmds.write_flash(esp, _flash_args(esp, operation, [(address + first * block_size, region)]))
+            written += len(region.getvalue())
+
+    return {**result, 'written': written, 'skipped': not runs}
+
+
+OPERATIONS = {
+    'chip_info': _chip_info,
+    'read_mac': _read_mac,
+    'flash_id': _flash_id,
+    'read_flash_status': _read_flash_status,
+    'erase_flash': _erase_flash,
+    'write_flash': _write_flash,
+    'verify_flash': _verify_flash,
+    'write_flash_diff': _write_flash_diff,
+    'probe_baud': _probe_baud,
+    'read_partition_table': _read_partition_table,
+    'backup_flash': _backup_flash,
+    'restore_flash': _restore_flash
+}
+
+
+def _report(name: str, success: bool, data: dict, message: str = '') -> None:
+    """
+    Writes the result of one session operation to stdout.
+
+    :param name: The name of the operation.
+    :type name: str
+    :param success: Whether the operation succeeded.
+    :type success: bool
+    :param data: The structured result of the operation.
+    :type data: dict
+    :param message: The error message of a failed operation.
+    :type message: str
+    :return: None
+    """
+    print(f"{RESULT_MARKER}{dumps({'operation': name, 'success': success, 'data': data, 'error': message})}")
+
+
+def run_session(request: dict) -> None:
+    """
+    Connects once and runs all operations of a session in order over the same stub
+    connection. Every operation receives the current baud rate of the connection
+    as 'baud' and reports a result line which starts with RESULT_MARKER. The
+    session stops at the first failing operation, and after a baud rate probe
+    which could not return to its stable rate.
+
+    :param request: The port, chip, baud rate, operations and reset behaviour.
+    :type request: dict
+    :return: None
+    :raises FatalError: If the device cannot be connected or an operation fails.
+    """
+    esp, baud = _connect(request['port'], request.get('chip', 'auto'), request.get('baud', ESPLoader.ESP_ROM_BAUD))
+
+    with esp:
+        for index, operation in enumerate(request['operations']):
+            name = operation['name']
+            if name not in OPERATIONS:
+                raise FatalError(f"Unsupported session operation: {name}")
+
+            try:
+                data = OPERATIONS[name](esp, {**operation, 'baud': baud})
+            except Exception as err:
+                _report(name, False, {}, str(err))
+                raise
+
+            _report(name, True, data)
+            if name == 'probe_baud':
+                if not data['restored'] and index + 1 < len(request['operations']):
+                    raise FatalError(f"The connection did not return to {data['baud']} baud after the probe")
+                baud = data['baud']
+
+        if request.get('after', 'hard_reset') == 'hard_reset':
+            esp.hard_reset()
+
+
+def main() -> int:
+    """
+    Waits for one esptool request on stdin and executes it. The worker process is
+    started ahead of time, so esptool is already imported when the request arrives.
+    A list is executed as esptool command line arguments, an object as a session.
+    Output is written line by line to stdout and errors to stderr, and the exit
+    code follows the conventions of esptool. The worker exits after the request,
+    so the serial port is always released.
+
+    :return: The exit code of the request.
+    :rtype: int
+    """
+    line = stdin.readline()
+    if not line.strip():
+        return 0
+
+    request = loads(line)
+
+    try:
+        if isinstance(request, dict):
+            run_session(request)
+        else:
+            esptool_main(request)
+    except FatalError as err:
+        print(f"A fatal error occurred: {err}", file=stderr)
+        return 2
+    except SerialException as err:
+        print(f"A serial exception error occurred: {err}", file=stderr)
+        return 1
+    except StopIteration:
+        print(f"{format_exc()}A fatal error occurred: The chip stopped responding.", file=stderr)
+        return 2
+
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
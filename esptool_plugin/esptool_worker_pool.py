@@ -0,0 +1,111 @@
+from logging import getLogger, debug, error
+from os.path import abspath, dirname, join
+from subprocess import Popen, PIPE
+from sys import executable
+from threading import Lock, Thread
+from typing import List
+from config.application_configuration import ESPTOOL_SPARE_WORKERS
+
+
+logger = getLogger(__name__)
+
+
+class EsptoolWorkerPool:
+    """
+    Keeps esptool worker processes started in advance, so a command does not wait
+    for interpreter startup and the esptool import. Every worker executes exactly
+    one command and is replaced in the background after it was handed out.
+
+    :ivar _WORKER: The path of the worker script.
+    """
+    _WORKER = join(dirname(abspath(__file__)), 'esptool_worker.py')
+
+    def __init__(self, spare: int = ESPTOOL_SPARE_WORKERS):
+        """
+        Initializes an empty worker pool.
+
+        :param spare: The number of idle workers kept ready.
+        :type spare: int, optional
+        """
+        self._spare = spare
+        self._workers: List[Popen] = []
+        self._lock = Lock()
+
+    def _spawn(self) -> Popen:
+        """
+        Starts a new worker process with unbuffered, line based pipes.
+
+        :return: The worker process.
+        :rtype: Popen
+        """
+        return Popen([executable, '-u', self._WORKER], stdin=PIPE, stdout=PIPE, stderr=PIPE, text=True, bufsize=1)
+
+    def _refill(self) -> None:
+        """
+        Starts workers until the configured number of idle workers is ready.
+
+        :return: None
+        """
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.poll() is None]
+            missing = self._spare - len(self._workers)
+
+        for _ in range(max(missing, 0)):
+            try:
+                worker = self._spawn()
+            except OSError as err:
+                error(f"Starting esptool worker failed: {err}")
+                return
+
+            with self._lock:
+                self._workers.append(worker)
+
+        if missing > 0:
+            debug(f"esptool workers ready: {self._spare}")
+
+    def warm_up(self) -> None:
+        """
+        Starts the idle workers in the background.
+
+        :return: None
+        """
+        Thread(target=self._refill, daemon=True).start()
+
+    def acquire(self) -> Popen:
+        """
+        Hands out an idle worker, or starts one if none is ready, and replaces it
+        in the background.
+
+        :return: The worker process, waiting for a command on stdin.
+        :rtype: Popen
+        """
+        worker = None
+
+        with self._lock:
+            while self._workers and worker is None:
+                candidate = self._workers.pop(0)
+                if candidate.poll() is None:
+                    worker = candidate
+
+        if worker is None:
+            debug('No esptool worker ready, starting one')
+            worker = self._spawn()
+
+        self.warm_up()
+        return worker
+
+    def close_all(self) -> None:
+        """
+        Terminates all idle workers.
+
+        :return: None
+        """
+        with self._lock:
+            workers, self._workers = self._workers, []
+
+        for worker in workers:
+            worker.kill()
+            worker.wait()
+
+
+worker_pool = EsptoolWorkerPool()
@@ -0,0 +1,11 @@
+from .job_scheduler import Job, JobCancelled, JobScheduler, scheduler, batch_scheduler
+from .port_lock_manager import PortLockManager, port_locks
+
+
+__all__ = ["Job",
+           "JobCancelled",
+           "JobScheduler",
+           "scheduler",
+           "batch_scheduler",
+           "PortLockManager",
+           "port_locks"]
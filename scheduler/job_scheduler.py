@@ -0,0 +1,316 @@
+from logging import getLogger, debug, error
+from concurrent.futures import Future
+from heapq import heapify, heappush, heappop
+from itertools import count
+from threading import Condition, Event, Lock, Thread, Timer
+from typing import Any, Callable, List, Optional, Set
+from config.application_configuration import SCHEDULER_MAX_WORKERS, BATCH_MAX_WORKERS
+
+
+logger = getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job when it notices that it was cancelled.
+    """
+
+
+class Job:
+    """
+    Represents a unit of work of the scheduler. A job is cancelled cooperatively:
+    the job function checks the cancel state or registers hooks, e.g. to kill a
+    subprocess or interrupt a serial read, which run when the job is cancelled.
+    """
+
+    def __init__(self, name: str, port: Optional[str], priority: int):
+        """
+        Initializes a pending job.
+
+        :param name: The name of the job, used for logging.
+        :type name: str
+        :param port: The serial port the job uses, jobs of the same port never run at the same time.
+        :type port: Optional[str]
+        :param priority: The priority of the job, lower values run first.
+        :type priority: int
+        """
+        self.name = name
+        self.port = port
+        self.priority = priority
+        self.future: Future = Future()
+        self._cancel_event = Event()
+        self._hooks: List[Callable[[], None]] = []
+        self._lock = Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        Returns whether the job was cancelled.
+
+        :return: True if the job was cancelled.
+        :rtype: bool
+        """
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        """
+        Raises if the job was cancelled, to be called between steps of long jobs.
+
+        :return: None
+        :raises JobCancelled: If the job was cancelled.
+        """
+        if self.cancelled:
+            raise JobCancelled(f'{self.name} cancelled')
+
+    def on_cancel(self, hook: Callable[[], None]) -> None:
+        """
+        Registers a function which is executed when the job is cancelled. If the
+        job is already cancelled, the function is executed immediately.
+
+        :param hook: The function to be executed.
+        :type hook: Callable[[], None]
+        :return: None
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._hooks.append(hook)
+                return
+
+        hook()
+
+    def cancel(self) -> None:
+        """
+        Cancels the job. A pending job will not start, a running job is
+        interrupted through its cancel hooks.
+
+        :return: None
+        """
+        with self._lock:
+            if self.cancelled or self.future.done():
+                return
+
+            self._cancel_event.set()
+            hooks, self._hooks = self._hooks, []
+
+        debug(f'Cancelling job: {self.name}')
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as err:
+                error(f'Cancel hook of {self.name} failed: {err}')
+
+
+class JobScheduler:
+    """
+    Runs jobs on a bounded pool of worker threads. Jobs are started by priority
+    and submission order, jobs of the same port are serialized and every job can
+    be cancelled or given a timeout.
+
+    :ivar HIGH: The priority of interactive jobs.
+    :ivar NORMAL: The default priority.
+    :ivar LOW: The priority of background jobs.
+    """
+    HIGH = 0
+    NORMAL = 10
+    LOW = 20
+
+    def __init__(self, max_workers: int = SCHEDULER_MAX_WORKERS):
+        """
+        Initializes a scheduler without worker threads, they are started on demand.
+
+        :param max_workers: The maximum number of jobs running at the same time.
+        :type max_workers: int, optional
+        """
+        self._max_workers = max_workers
+        self._pending: List[tuple] = []
+        self._running: List[Job] = []
+        self._busy_ports: Set[str] = set()
+        self._workers: List[Thread] = []
+        self._idle = 0
+        self._sequence = count()
+        self._condition = Condition()
+
+    @property
+    def max_workers(self) -> int:
+        """
+        Returns the maximum number of jobs running at the same time.
+
+        :return: The maximum number of worker threads.
+        :rtype: int
+        """
+        return self._max_workers
+
+    @property
+    def jobs(self) -> List[Job]:
+        """
+        Returns all running and pending jobs.
+
+        :return: The running jobs followed by the pending jobs in start order.
+        :rtype: List[Job]
+        """
+        with self._condition:
+            return list(self._running) + [item[2] for item in sorted(self._pending)]
+
+    def submit(self,
+               function: Callable[[Job], Any],
+               name: str,
+               port: Optional[str] = None,
+               priority: int = NORMAL,
+               callback: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[str], None]] = None,
+               timeout: Optional[float] = None) -> Job:
+        """
+        Queues a job. The function receives its job to check for cancellation and to
+        register cancel hooks.
+
+        :param function: The function to be executed.
+        :type function: Callable[[Job], Any]
+        :param name: The name of the job.
+        :type name: str
+        :param port: The serial port the job uses, if any.
+        :type port: Optional[str]
+        :param priority: The priority of the job, lower values run first.
+        :type priority: int, optional
+        :param callback: An optional function to be executed with the result of the job.
+        :type callback: Optional[Callable[[Any], None]]
+        :param on_error: An optional function to be executed with the error message of a failed or cancelled job.
+        :type on_error: Optional[Callable[[str], None]]
+        :param timeout: The maximum number of seconds the job may run before it is cancelled.
+        :type timeout: Optional[float]
+        :return: The queued job.
+        :rtype: Job
+        """
+        job = Job(name, port, priority)
+        job.on_cancel(lambda: self._discard(job))
+
+        def run() -> None:
+            timer = Timer(timeout, job.cancel) if timeout else None
+            if timer:
+                timer.daemon = True
+                timer.start()
+
+            try:
+                job.check_cancelled()
+                result = function(job)
+                if job.cancelled:
+                    raise JobCancelled(f'{name} cancelled')
+            except Exception as err:
+                job.future.set_exception(err)
+                debug(f'Job {name} failed: {err}')
+
+                if on_error:
+                    on_error(str(err))
+                return
+            finally:
+                if timer:
+                    timer.cancel()
+
+            job.future.set_result(result)
+            if callback:
+                callback(result)
+
+        with self._condition:
+            heappush(self._pending, (priority, next(self._sequence), job, run))
+
+            if self._idle < len(self._pending) and len(self._workers) < self._max_workers:
+                worker = Thread(target=self._work, name=f'job-worker-{len(self._workers)}', daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+            self._condition.notify()
+
+        debug(f'Queued job {name} on {port} with priority {priority}')
+        return job
+
+    def _discard(self, job: Job) -> None:
+        """
+        Removes a cancelled job which did not start yet and reports its cancellation
+        right away instead of when its port becomes free. The report runs on its own
+        thread, as the callbacks of the job may block and the job may be cancelled
+        from the UI thread.
+
+        :param job: The cancelled job.
+        :type job: Job
+        :return: None
+        """
+        with self._condition:
+            item = next((item for item in self._pending if item[2] is job), None)
+
+            if item is None:
+                return
+
+            self._pending.remove(item)
+            heapify(self._pending)
+
+        Thread(target=item[3], name=f'job-cancel-{item[1]}', daemon=True).start()
+
+    def _next(self) -> Optional[tuple]:
+        """
+        Takes the first pending job whose port is not busy. The caller must hold the condition.
+
+        :return: The queue item of the job, or None if no job can start.
+        :rtype: Optional[tuple]
+        """
+        deferred = []
+        item = None
+
+        while self._pending:
+            candidate = heappop(self._pending)
+            if candidate[2].port is None or candidate[2].port not in self._busy_ports:
+                item = candidate
+                break
+            deferred.append(candidate)
+
+        for candidate in deferred:
+            heappush(self._pending, candidate)
+
+        return item
+
+    def _work(self) -> None:
+        """
+        Runs jobs until the scheduler is shut down.
+
+        :return: None
+        """
+        while True:
+            with self._condition:
+                self._idle += 1
+                item = self._next()
+
+                while item is None:
+                    self._condition.wait()
+                    item = self._next()
+
+                self._idle -= 1
+                job, run = item[2], item[3]
+                self._running.append(job)
+                if job.port:
+                    self._busy_ports.add(job.port)
+
+            run()
+
+            with self._condition:
+                self._running.remove(job)
+                if job.port:
+                    self._busy_ports.discard(job.port)
+                self._condition.notify_all()
+
+    def cancel_all(self, port: Optional[str] = None) -> int:
+        """
+        Cancels all running and pending jobs, optionally only those of one port.
+
+        :param port: The serial port whose jobs are cancelled, or None for all jobs.
+        :type port: Optional[str]
+        :return: The number of cancelled jobs.
+        :rtype: int
+        """
+        jobs = [job for job in self.jobs if port is None or job.port == port]
+
+        for job in jobs:
+            job.cancel()
+
+        return len(jobs)
+
+
+scheduler = JobScheduler()
+batch_scheduler = JobScheduler(max_workers=BATCH_MAX_WORKERS)
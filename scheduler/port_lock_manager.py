@@ -0,0 +1,152 @@
+from logging import getLogger, debug, info
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition, get_ident
+from time import monotonic
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+
+logger = getLogger(__name__)
+
+
+class PortLockManager:
+    """
+    Grants exclusive access to serial ports, shared by esptool commands and serial
+    plugins. Conflicting requests are queued in arrival order instead of colliding
+    on the port, and the time spent waiting is reported. A thread which already
+    holds a port may acquire it again.
+    """
+
+    def __init__(self):
+        """
+        Initializes a lock manager without held ports.
+        """
+        self._condition = Condition()
+        self._owners: Dict[str, List] = {}
+        self._queues: Dict[str, Deque[object]] = {}
+
+    def holder(self, port: str) -> Optional[str]:
+        """
+        Returns the description of the current holder of a port.
+
+        :param port: The serial port.
+        :type port: str
+        :return: The holder, or None if the port is free.
+        :rtype: Optional[str]
+        """
+        with self._condition:
+            owner = self._owners.get(port)
+            return owner[1] if owner else None
+
+    def acquire(self,
+                port: str,
+                holder: str,
+                on_wait: Optional[Callable[[str], None]] = None,
+                cancelled: Optional[Callable[[], bool]] = None) -> float:
+        """
+        Blocks until the port is free and all earlier requests were served, then
+        takes the port.
+
+        :param port: The serial port.
+        :type port: str
+        :param holder: A description of the requester, e.g. 'esptool write_flash'.
+        :type holder: str
+        :param on_wait: An optional function to be executed with a message if the request has to wait.
+        :type on_wait: Optional[Callable[[str], None]]
+        :param cancelled: An optional function which tells whether the waiting request was cancelled.
+        :type cancelled: Optional[Callable[[], bool]]
+        :return: The number of seconds spent waiting.
+        :rtype: float
+        :raises InterruptedError: If the request was cancelled while waiting.
+        """
+        me = get_ident()
+        start = monotonic()
+        ticket = object()
+
+        with self._condition:
+            owner = self._owners.get(port)
+            if owner and owner[0] == me:
+                owner[2] += 1
+                return 0.0
+
+            queue = self._queues.setdefault(port, deque())
+            queue.append(ticket)
+            notified = False
+
+            while port in self._owners or queue[0] is not ticket:
+                if cancelled and cancelled():
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[port]
+                    self._condition.notify_all()
+                    raise InterruptedError(f"Waiting for {port} cancelled")
+
+                if not notified:
+                    current = self._owners.get(port, [None, 'an earlier request'])[1]
+                    debug(f"{holder} waits for {port}, in use by {current}")
+                    if on_wait:
+                        on_wait(f"Waiting for {port}, in use by {current}")
+                    notified = True
+
+                self._condition.wait(0.5 if cancelled else None)
+
+            queue.popleft()
+            if not queue:
+                del self._queues[port]
+            self._owners[port] = [me, holder, 1]
+
+        waited = monotonic() - start
+        if notified:
+            info(f"{holder} waited {waited:.2f}s for {port}")
+
+        return waited
+
+    def release(self, port: str) -> None:
+        """
+        Releases a port which was acquired by the current thread.
+
+        :param port: The serial port.
+        :type port: str
+        :return: None
+        :raises RuntimeError: If the current thread does not hold the port.
+        """
+        with self._condition:
+            owner = self._owners.get(port)
+            if not owner or owner[0] != get_ident():
+                raise RuntimeError(f"{port} is not held by this thread")
+
+            owner[2] -= 1
+            if owner[2] == 0:
+                del self._owners[port]
+                self._condition.notify_all()
+
+    @contextmanager
+    def hold(self,
+             port: str,
+             holder: str,
+             on_wait: Optional[Callable[[str], None]] = None,
+             cancelled: Optional[Callable[[], bool]] = None) -> Iterator[float]:
+        """
+        Holds a port for the duration of a with block.
+
+        :param port: The serial port.
+        :type port: str
+        :param holder: A description of the requester.
+        :type holder: str
+        :param on_wait: An optional function to be executed with a message if the request has to wait.
+        :type on_wait: Optional[Callable[[str], None]]
+        :param cancelled: An optional function which tells whether the waiting request was cancelled.
+        :type cancelled: Optional[Callable[[], bool]]
+        :return: The number of seconds spent waiting.
+        :rtype: Iterator[float]
+        :raises InterruptedError: If the request was cancelled while waiting.
+        """
+        waited = self.acquire(port, holder, on_wait, cancelled)
+
+        try:
+            yield waited
+        finally:
+            self.release(port)
+
+
+port_locks = PortLockManager()
@@ -1,12 +1,25 @@
 from .serial_base import SerialBase
+from .serial_connection_pool import SerialConnectionPool, connection_pool
+from .serial_device_watcher import DeviceWatcher, DeviceInfo
 from .serial_command_runner import SerialCommandRunner
-from .serial_get_file_structure import FileStructure
+from .serial_get_file_structure import FileStructure, FileEntry
+from .serial_file_system_cache import FileSystemCache
+from .serial_file_transfer import FileTransfer
+from .serial_directory_sync import DirectorySync
 from .serial_get_version import Version
 from .serial_monitor import Debug
 
 
 __all__ = ["SerialBase",
+           "SerialConnectionPool",
+           "connection_pool",
+           "DeviceWatcher",
+           "DeviceInfo",
            "SerialCommandRunner",
            "FileStructure",
+           "FileEntry",
+           "FileSystemCache",
+           "FileTransfer",
+           "DirectorySync",
            "Version",
            "Debug"]
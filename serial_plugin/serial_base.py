@@ -1,8 +1,11 @@
 from logging import getLogger, error, debug
-from serial import Serial
-from time import sleep
+from serial import Serial, SerialException
+from struct import unpack
+from time import monotonic, sleep
 from types import TracebackType
 from typing import Optional, Type
+from .serial_connection_pool import connection_pool
+from scheduler.port_lock_manager import port_locks
 from config.application_configuration import SERIAL_RATE
 
 
@@ -12,7 +15,17 @@ logger = getLogger(__name__)
 class SerialBase:
     """
     Manages a MicroPython serial connection and offers REPL communication modes.
+
+    :ivar _REPL_PROBE: Whether a newly opened connection interrupts the device and waits for the REPL prompt.
+    :ivar _PROMPT: The prompt of the friendly REPL.
+    :ivar _RAW_PROMPT: The banner and prompt sent when the raw REPL is entered.
+    :ivar _RAW_CHUNK_SIZE: The chunk size for code written without raw-paste flow control.
+    :ivar lock_wait: The number of seconds the last connection waited for the port.
     """
+    _REPL_PROBE: bool = True
+    _PROMPT: bytes = b'>>> '
+    _RAW_PROMPT: bytes = b'raw REPL; CTRL-B to exit\r\n>'
+    _RAW_CHUNK_SIZE: int = 256
 
     def __init__(self, port: str, baudrate: int = SERIAL_RATE, timeout: int = 2):
         """
@@ -29,75 +42,343 @@ class SerialBase:
         self._baudrate = baudrate
         self._timeout = timeout
         self._ser: Optional[Serial] = None
+        self._rx_buffer: bytearray = bytearray()
+        self._raw_paste: Optional[bool] = None
+        self._paste_window: Optional[int] = None
+        self._aborted = False
+        self._locked = False
+        self.lock_wait = 0.0
 
     def _connect(self) -> bool:
         """
-        Opens a serial connection with the specified port and settings.
+        Waits for exclusive access to the port, then acquires a pooled serial
+        connection with the specified port and settings.
 
-        :return: None
+        :return: True if the connection is available, otherwise False.
+        :rtype: bool
         """
         try:
-            self._ser = Serial(self._port, self._baudrate, timeout=self._timeout)
-            sleep(self._timeout)
+            self.lock_wait = port_locks.acquire(self._port, type(self).__name__, cancelled=lambda: self._aborted)
+            self._locked = True
+        except InterruptedError as err:
+            error(f"Connection to device missed: {err}")
+            return False
+
+        try:
+            self._ser = connection_pool.acquire(port=self._port,
+                                                baudrate=self._baudrate,
+                                                timeout=self._timeout,
+                                                probe=self._REPL_PROBE)
+            self._rx_buffer.clear()
             return True
         except Exception as err:
             error(f"Connection to device missed: {err}")
+            self._release_port()
             return False
 
-    def _disconnect(self) -> None:
+    def _release_port(self) -> None:
+        """
+        Releases the exclusive access to the port.
+
+        :return: None
+        """
+        if self._locked:
+            port_locks.release(self._port)
+            self._locked = False
+
+    def _disconnect(self, discard: bool = False) -> None:
+        """
+        Returns the serial connection to the pool and releases the port.
+
+        :param discard: Whether the connection should be closed instead of kept open.
+        :type discard: bool, optional
+        :return: None
+        """
+        if self._ser:
+            connection_pool.release(self._port, discard=discard)
+            self._ser = None
+
+        self._release_port()
+
+    def _fill_buffer(self, deadline: float, timeout: float) -> None:
+        """
+        Reads everything waiting, or blocks for at least one byte, into the receive
+        buffer without reading past the deadline.
+
+        :param deadline: The monotonic time at which reading is given up.
+        :type deadline: float
+        :param timeout: The timeout of the whole operation, used for the error message.
+        :type timeout: float
+        :return: None
+        :raises TimeoutError: If the deadline has passed.
+        :raises InterruptedError: If the operation was aborted.
+        """
+        if self._aborted:
+            raise InterruptedError(f"Operation on {self._port} cancelled")
+
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"No response from device within {timeout} sec")
+
+        if self._ser.timeout is None or remaining < self._ser.timeout:
+            self._ser.timeout = remaining
+
+        self._rx_buffer += self._ser.read(self._ser.in_waiting or 1)
+
+    def abort(self) -> None:
+        """
+        Aborts the running operation from another thread. A pending read is
+        interrupted and the operation fails with an InterruptedError.
+
+        :return: None
+        """
+        self._aborted = True
+        ser = self._ser
+
+        if ser and ser.is_open:
+            ser.cancel_read()
+
+    def _restore_timeout(self) -> None:
+        """
+        Restores the configured read timeout after it was shortened for a deadline.
+
+        :return: None
+        """
+        if self._ser and self._ser.is_open and self._ser.timeout != self._timeout:
+            self._ser.timeout = self._timeout
+
+    def read_until(self, terminator: bytes, timeout: float) -> bytes:
+        """
+        Reads from the device until the terminator has been received. Data is read
+        in chunks of everything waiting into a buffer, so the terminator is also
+        found when it spans two chunks. Bytes received after the terminator are
+        kept for the next call.
+
+        :param terminator: The byte sequence which ends the response, e.g. the raw REPL prompt.
+        :type terminator: bytes
+        :param timeout: The maximum number of seconds to wait for the terminator.
+        :type timeout: float
+        :return: The received data including the terminator.
+        :rtype: bytes
+        :raises RuntimeError: If the REPL interface is not connected or available.
+        :raises TimeoutError: If the terminator was not received in time.
+        """
+        if not self._ser or not self._ser.is_open:
+            raise RuntimeError("REPL not connected")
+
+        buffer = self._rx_buffer
+        deadline = monotonic() + timeout
+        search_start = 0
+
+        try:
+            while True:
+                index = buffer.find(terminator, search_start)
+                if index >= 0:
+                    end = index + len(terminator)
+                    data = bytes(buffer[:end])
+                    del buffer[:end]
+                    return data
+
+                search_start = max(0, len(buffer) - len(terminator) + 1)
+                self._fill_buffer(deadline, timeout)
+        finally:
+            self._restore_timeout()
+
+    def _read_exactly(self, size: int, timeout: float) -> bytes:
+        """
+        Reads an exact number of bytes from the device, starting with buffered data.
+
+        :param size: The number of bytes to read.
+        :type size: int
+        :param timeout: The maximum number of seconds to wait for the bytes.
+        :type timeout: float
+        :return: The received bytes.
+        :rtype: bytes
+        :raises TimeoutError: If not enough bytes were received in time.
+        """
+        deadline = monotonic() + timeout
+
+        try:
+            while len(self._rx_buffer) < size:
+                self._fill_buffer(deadline, timeout)
+        finally:
+            self._restore_timeout()
+
+        data = bytes(self._rx_buffer[:size])
+        del self._rx_buffer[:size]
+        return data
+
+    def _raw_paste_write(self, code: bytes, timeout: float) -> None:
+        """
+        Writes code using the raw-paste protocol. The device announces a window size
+        and sends a flow control byte each time it has consumed another window, so
+        the UART buffer of the device never overflows.
+
+        :param code: The code to be written.
+        :type code: bytes
+        :param timeout: The maximum number of seconds to wait for each device response.
+        :type timeout: float
+        :return: None
+        :raises RuntimeError: If the device sends unexpected data.
         """
-        Closes the serial connection if it is currently open.
+        window_size = unpack('<H', self._read_exactly(2, timeout))[0]
+        self._paste_window = window_size
+        window_remain = window_size
+        position = 0
+
+        while position < len(code):
+            while window_remain == 0 or self._rx_buffer or self._ser.in_waiting:
+                flow = self._read_exactly(1, timeout)
+
+                if flow == b'\x01':
+                    window_remain += window_size
+                elif flow == b'\x04':
+                    self._ser.write(b'\x04')
+                    raise RuntimeError("Device aborted raw paste")
+                else:
+                    raise RuntimeError(f"Unexpected data during raw paste: {flow!r}")
+
+            chunk = code[position:position + window_remain]
+            self._ser.write(chunk)
+            window_remain -= len(chunk)
+            position += len(chunk)
+
+        self._ser.write(b'\x04')
+        self.read_until(b'\x04', timeout=timeout)
 
+    def _write_raw_code(self, code: bytes, timeout: float) -> None:
+        """
+        Submits code in raw REPL mode. Uses raw-paste mode with flow control if the
+        firmware supports it, otherwise falls back to plain raw REPL.
+
+        :param code: The code to be written.
+        :type code: bytes
+        :param timeout: The maximum number of seconds to wait for each device response.
+        :type timeout: float
         :return: None
+        :raises RuntimeError: If the device does not accept the code.
+        """
+        if self._raw_paste is not False:
+            self._ser.write(b'\x05A\x01')
+            response = self._read_exactly(2, timeout)
+
+            if response == b'R\x01':
+                self._raw_paste = True
+                self._raw_paste_write(code, timeout)
+                return
+
+            self._raw_paste = False
+            if response != b'R\x00':
+                # the firmware does not know raw-paste and echoes the raw REPL banner instead
+                self.read_until(self._RAW_PROMPT[len(response):], timeout=timeout)
+
+            debug("Raw paste mode is not supported, using raw REPL")
+
+        for position in range(0, len(code), self._RAW_CHUNK_SIZE):
+            self._ser.write(code[position:position + self._RAW_CHUNK_SIZE])
+            sleep(0.01)
+
+        self._ser.write(b'\x04')
+        response = self._read_exactly(2, timeout)
+
+        if response != b'OK':
+            raise RuntimeError(f"Device did not accept code: {response!r}")
+
+    def exec_raw(self, code: str, timeout: float = 10) -> str:
         """
-        if self._ser and self._ser.is_open:
-            self._ser.close()
+        Executes code on the device in raw REPL mode and returns its output. The
+        raw REPL must already be entered.
+
+        :param code: The MicroPython code to execute.
+        :type code: str
+        :param timeout: The maximum number of seconds to wait for the execution.
+        :type timeout: float, optional
+        :return: The standard output of the executed code.
+        :rtype: str
+        :raises RuntimeError: If the device does not accept the code or the code raises an error.
+        :raises TimeoutError: If the execution did not finish in time.
+        """
+        self._write_raw_code(code.encode('utf-8'), timeout)
+
+        response = self.read_until(b'\x04>', timeout=timeout)
+        stdout, _, stderr = response[:-2].partition(b'\x04')
+
+        if stderr:
+            message = stderr.decode(errors='ignore').strip()
+            error(f"Device raised an error: {message}")
+            raise RuntimeError(message.splitlines()[-1] if message else "Device raised an error")
+
+        return stdout.decode(errors='ignore')
 
-    def send_repl_command(self, command: str, wait: float = 0.3) -> str:
+    def send_repl_command(self, command: str, timeout: float = 5) -> str:
         """
-        Sends a command to the REPL interface and retrieves its output.
+        Sends a command to the REPL interface and retrieves its output. Returns as
+        soon as the device shows the next prompt.
 
         :param command: The command to be sent to the REPL interface.
         :type command: str
-        :param wait: The amount of time, in seconds.
-        :type wait: float, optional
+        :param timeout: The maximum number of seconds to wait for the prompt.
+        :type timeout: float, optional
         :return: The output received from the REPL
         :rtype: str
         :raises RuntimeError: If the REPL interface is not connected or available.
+        :raises TimeoutError: If the prompt was not received in time.
         """
         if not self._ser or not self._ser.is_open:
             raise RuntimeError("REPL not connected")
 
+        self._ser.reset_input_buffer()
+        self._rx_buffer.clear()
         self._ser.write(command.encode() + b'\r\n')
-        sleep(wait)
 
-        output = self._ser.read_all().decode(errors='ignore')
+        response = self.read_until(self._PROMPT, timeout=timeout)[:-len(self._PROMPT)]
+        output = response.decode(errors='ignore')
         debug(f"REPL returned output: {output}")
 
         return output.strip()
 
-    def enter_raw_repl(self) -> None:
+    def enter_raw_repl(self, timeout: float = 2) -> None:
         """
-        Enter raw REPL mode on the connected device.
+        Enter raw REPL mode on the connected device. Returns as soon as the device
+        confirms the raw REPL.
 
+        :param timeout: The maximum number of seconds to wait for the raw REPL prompt.
+        :type timeout: float, optional
         :return: None
+        :raises TimeoutError: If the raw REPL prompt was not received in time.
         """
+        self._ser.reset_input_buffer()
+        self._rx_buffer.clear()
         self._ser.write(b'\r\x03\x03')
-        sleep(0.1)
-
         self._ser.write(b'\r\x01')
-        sleep(0.1)
 
-        self._ser.reset_input_buffer()
+        self.read_until(self._RAW_PROMPT, timeout=timeout)
 
-    def exit_raw_repl(self) -> None:
+    def exit_raw_repl(self, timeout: float = 2) -> None:
         """
-        Exits raw REPL mode on the connected device.
+        Exits raw REPL mode on the connected device. Returns as soon as the device
+        shows the normal REPL prompt.
 
+        :param timeout: The maximum number of seconds to wait for the prompt.
+        :type timeout: float, optional
         :return: None
+        :raises TimeoutError: If the prompt was not received in time.
         """
         self._ser.write(b'\r\x02')
-        sleep(0.1)
+
+        self.read_until(self._PROMPT, timeout=timeout)
+
+    def _leave_raw_repl(self) -> None:
+        """
+        Exits raw REPL mode at the end of a command. A failure is only logged, so it
+        cannot replace the exception the command itself may have raised.
+
+        :return: None
+        """
+        try:
+            self.exit_raw_repl()
+        except (TimeoutError, InterruptedError, SerialException) as err:
+            error(f"Exiting raw REPL failed: {err}")
 
     def __enter__(self) -> "SerialBase":
         """
@@ -115,8 +396,8 @@ class SerialBase:
                  exc_val: Optional[BaseException],
                  exc_tb: Optional[TracebackType]) -> None:
         """
-        Handles cleanup operations upon exiting a runtime context. Ensures proper
-        closure of resources by invoking the `_close` method.
+        Handles cleanup operations upon exiting a runtime context. Returns the
+        connection to the pool, or closes it if the context exited with an error.
 
         :param exc_type: The type of the exception that caused the context to be exited.
         :type exc_type: Optional[Type[BaseException]]
@@ -126,4 +407,4 @@ class SerialBase:
         :type exc_tb: Optional[TracebackType]
         :return: None
         """
-        self._disconnect()
+        self._disconnect(discard=exc_type is not None)
@@ -1,9 +1,12 @@
 from logging import getLogger, debug
-from threading import Thread
-from typing import Callable
+from typing import Any, Callable, Dict, List, Optional
 from .serial_get_version import Version
-from .serial_get_file_structure import FileStructure
+from .serial_get_file_structure import FileStructure, FileEntry
+from .serial_file_system_cache import FileSystemCache
+from .serial_file_transfer import FileTransfer
+from .serial_directory_sync import DirectorySync
 from .serial_monitor import Debug
+from scheduler.job_scheduler import Job, JobScheduler, scheduler
 
 
 logger = getLogger(__name__)
@@ -12,86 +15,240 @@ logger = getLogger(__name__)
 class SerialCommandRunner:
     """
     A class for managing serial command executions and acquiring information from
-    serial ports, such as version and file structure data.
+    serial ports, such as version and file structure data. All work runs as jobs
+    of the shared scheduler, so it can be cancelled.
     """
 
+    def __init__(self):
+        """
+        Initializes the runner without an active serial monitor and with empty
+        per-port directory caches.
+        """
+        self._monitor: Optional[Debug] = None
+        self._file_caches: Dict[str, FileSystemCache] = {}
+
     @staticmethod
-    def _run_in_thread(worker: Callable[[], str], callback: Callable[[str], None]) -> None:
+    def _submit(name: str,
+                port: str,
+                worker: Callable[[Job], Any],
+                callback: Callable[[Any], None],
+                on_error: Optional[Callable[[str], None]] = None,
+                priority: int = JobScheduler.HIGH) -> Job:
         """
-        Runs a given worker function in a separate thread and executes a callback
-        function with the worker's result.
+        Submits a worker function as a job of the shared scheduler and executes a
+        callback function with the worker's result. Jobs of the same port run one
+        after another.
 
-        :param worker: The function to be executed in a separate thread.
-        :type worker: Callable[[], str]
+        :param name: The name of the job.
+        :type name: str
+        :param port: The serial port the worker uses.
+        :type port: str
+        :param worker: The function to be executed with its job.
+        :type worker: Callable[[Job], Any]
         :param callback: The function to be executed with the worker's result.
-        :type callback: Callable[[str], None]
-        :return: None
+        :type callback: Callable[[Any], None]
+        :param on_error: An optional function to be executed with the error message instead of the callback.
+        :type on_error: Optional[Callable[[str], None]]
+        :param priority: The priority of the job.
+        :type priority: int, optional
+        :return: The submitted job.
+        :rtype: Job
         """
-        def task() -> None:
-            try:
-                result = worker()
-            except Exception as e:
-                result = f"[ERROR] {str(e)}"
-
+        def handle_result(result: Any) -> None:
             callback(result)
             debug(f"callback result: {result}")
 
-        thread = Thread(target=task, daemon=True)
-        thread.start()
+        return scheduler.submit(worker,
+                                name=name,
+                                port=port,
+                                priority=priority,
+                                callback=handle_result,
+                                on_error=on_error or (lambda message: callback(f"[ERROR] {message}")))
 
     @staticmethod
-    def _run_monitor(port: str) -> str:
+    def _get_version(job: Job, port: str) -> str:
         """
-        Executes a monitor utility for a given port and retrieves debug information.
+        Fetches and returns the version of MicroPython from a given port.
 
+        :param job: The job which runs the worker.
+        :type job: Job
         :param port: The serial port to connect to.
         :type port: str
-        :return: The debug information as a string.
+        :return: The version of MicroPython as a string.
         :rtype: str
         """
-        with Debug(port=port) as monitor:
-            return monitor.get_debug()
+        with Version(port=port) as version_fetcher:
+            job.on_cancel(version_fetcher.abort)
+            return version_fetcher.get_version()
 
     @staticmethod
-    def _get_version(port: str) -> str:
+    def _list_directory(job: Job, port: str, path: str) -> List[FileEntry]:
         """
-        Fetches and returns the version of MicroPython from a given port.
+        Fetches and returns the entries of a single directory from a given port.
 
+        :param job: The job which runs the worker.
+        :type job: Job
         :param port: The serial port to connect to.
         :type port: str
-        :return: The version of MicroPython as a string.
+        :param path: The directory path on the device.
+        :type path: str
+        :return: The entries of the directory.
+        :rtype: List[FileEntry]
+        """
+        with FileStructure(port=port) as structure_fetcher:
+            job.on_cancel(structure_fetcher.abort)
+            return structure_fetcher.list_dir(path)
+
+    @staticmethod
+    def _put_file(job: Job,
+                  port: str,
+                  local_path: str,
+                  remote_path: str,
+                  progress: Optional[Callable[[int, int, float], None]]) -> str:
+        """
+        Uploads a local file to the device on a given port.
+
+        :param job: The job which runs the worker.
+        :type job: Job
+        :param port: The serial port to connect to.
+        :type port: str
+        :param local_path: The path of the local file.
+        :type local_path: str
+        :param remote_path: The target path on the device.
+        :type remote_path: str
+        :param progress: An optional function to be executed with bytes done, total bytes and bytes/s.
+        :type progress: Optional[Callable[[int, int, float], None]]
+        :return: A summary of the transfer.
         :rtype: str
         """
-        with Version(port=port) as version_fetcher:
-            return version_fetcher.get_version()
+        with FileTransfer(port=port) as transfer:
+            job.on_cancel(transfer.abort)
+            return transfer.put(local_path, remote_path, progress)
 
     @staticmethod
-    def _get_structure(port: str) -> str:
+    def _get_file(job: Job,
+                  port: str,
+                  remote_path: str,
+                  local_path: str,
+                  progress: Optional[Callable[[int, int, float], None]]) -> str:
         """
-        Fetches and returns the file structure from a given port.
+        Downloads a file from the device on a given port.
 
+        :param job: The job which runs the worker.
+        :type job: Job
         :param port: The serial port to connect to.
         :type port: str
-        :return: The file structure as a string.
+        :param remote_path: The path of the file on the device.
+        :type remote_path: str
+        :param local_path: The path of the local target file.
+        :type local_path: str
+        :param progress: An optional function to be executed with bytes done, total bytes and bytes/s.
+        :type progress: Optional[Callable[[int, int, float], None]]
+        :return: A summary of the transfer.
         :rtype: str
         """
-        with FileStructure(port=port) as structure_fetcher:
-            return structure_fetcher.get_tree()
+        with FileTransfer(port=port) as transfer:
+            job.on_cancel(transfer.abort)
+            return transfer.get(remote_path, local_path, progress)
 
-    def get_debug(self, port: str, callback: Callable[[str], None]) -> None:
+    @staticmethod
+    def _sync_directory(job: Job,
+                        port: str,
+                        local_dir: str,
+                        remote_dir: str,
+                        delete: bool,
+                        progress: Optional[Callable[[str], None]],
+                        confirm: Optional[Callable[[List[str]], bool]]) -> str:
         """
-        Invokes a debug process in a separate thread. The function runs a monitoring
-        process for the provided port and applies the specified callback upon completion.
+        Synchronizes a local directory to the device on a given port.
 
+        :param job: The job which runs the worker.
+        :type job: Job
         :param port: The serial port to connect to.
         :type port: str
-        :param callback: The function to be executed with the result.
+        :param local_dir: The local directory.
+        :type local_dir: str
+        :param remote_dir: The target directory on the device.
+        :type remote_dir: str
+        :param delete: Whether stale device files are deleted.
+        :type delete: bool
+        :param progress: An optional function to be executed with a message for every changed file.
+        :type progress: Optional[Callable[[str], None]]
+        :param confirm: An optional function which is asked with the stale files before they are deleted.
+        :type confirm: Optional[Callable[[List[str]], bool]]
+        :return: A summary of the synchronization.
+        :rtype: str
+        """
+        with DirectorySync(port=port) as synchronizer:
+            job.on_cancel(synchronizer.abort)
+            return synchronizer.sync(local_dir, remote_dir, delete, progress, confirm=confirm)
+
+    def file_cache(self, port: str) -> FileSystemCache:
+        """
+        Returns the directory cache of a port.
+
+        :param port: The serial port of the device.
+        :type port: str
+        :return: The directory cache of the device.
+        :rtype: FileSystemCache
+        """
+        return self._file_caches.setdefault(port, FileSystemCache())
+
+    @property
+    def monitor_running(self) -> bool:
+        """
+        Indicates whether a serial monitor is currently streaming.
+
+        :return: True if a monitor is running, otherwise False.
+        :rtype: bool
+        """
+        return self._monitor is not None
+
+    def start_monitor(self, port: str, on_line: Callable[[str], None], callback: Callable[[str], None]) -> Job:
+        """
+        Starts a long-running serial monitor as a background job. Every received line
+        is passed to on_line as it arrives, the callback is executed once the
+        monitor has stopped.
+
+        :param port: The serial port to connect to.
+        :type port: str
+        :param on_line: The function to be executed with every received line.
+        :type on_line: Callable[[str], None]
+        :param callback: The function to be executed after the monitor has stopped.
         :type callback: Callable[[str], None]
+        :return: The submitted job.
+        :rtype: Job
+        """
+        monitor = Debug(port=port)
+        self._monitor = monitor
+
+        def worker(job: Job) -> str:
+            job.on_cancel(monitor.stop)
+
+            try:
+                with monitor:
+                    monitor.stream(on_line)
+            finally:
+                self._monitor = None
+
+            return f"Serial monitor stopped, {len(monitor.history)} recent lines kept"
+
+        def handle_error(message: str) -> None:
+            self._monitor = None
+            callback(f"[ERROR] {message}")
+
+        return self._submit('Serial monitor', port, worker, callback, handle_error, priority=JobScheduler.LOW)
+
+    def stop_monitor(self) -> None:
+        """
+        Stops a running serial monitor.
+
         :return: None
         """
-        self._run_in_thread(lambda: self._run_monitor(port), callback)
+        if self._monitor:
+            self._monitor.stop()
 
-    def get_version(self, port: str, callback: Callable[[str], None]) -> None:
+    def get_version(self, port: str, callback: Callable[[str], None]) -> Job:
         """
         Executes a function to retrieve version information for a given port and
         invokes the provided callback with the result.
@@ -100,19 +257,139 @@ class SerialCommandRunner:
         :type port: str
         :param callback: The function to be executed with the result.
         :type callback: Callable[[str], None]
-        :return: None
+        :return: The submitted job.
+        :rtype: Job
         """
-        self._run_in_thread(lambda: self._get_version(port), callback)
+        return self._submit('Version', port, lambda job: self._get_version(job, port), callback)
 
-    def get_structure(self, port: str, callback: Callable[[str], None]) -> None:
+    def list_directory(self,
+                       port: str,
+                       path: str,
+                       callback: Callable[[str, List[FileEntry]], None],
+                       on_error: Callable[[str], None],
+                       refresh: bool = False) -> Optional[Job]:
         """
-        Executes a function to retrieve the file structure for a given port and
-        invokes the provided callback with the result.
+        Provides the entries of a single device directory. Cached listings are
+        returned immediately, otherwise the directory is listed in a background
+        job and the cache is updated.
 
         :param port: The serial port to connect to.
         :type port: str
-        :param callback: The function to be executed with the result.
+        :param path: The directory path on the device.
+        :type path: str
+        :param callback: The function to be executed with the directory path and its entries.
+        :type callback: Callable[[str, List[FileEntry]], None]
+        :param on_error: The function to be executed with the error message.
+        :type on_error: Callable[[str], None]
+        :param refresh: Whether the directory is listed again even if it is cached.
+        :type refresh: bool, optional
+        :return: The submitted job, or None if the cached listing was used.
+        :rtype: Optional[Job]
+        """
+        cache = self.file_cache(port)
+        entries = cache.get(path)
+
+        if entries is not None and not refresh:
+            callback(path, entries)
+            return None
+
+        def worker(job: Job) -> List[FileEntry]:
+            listing = self._list_directory(job, port, path)
+            cache.update(path, listing)
+            return listing
+
+        return self._submit(f'List {path}', port, worker, lambda result: callback(path, result), on_error)
+
+    def put_file(self,
+                 port: str,
+                 local_path: str,
+                 remote_path: str,
+                 callback: Callable[[str], None],
+                 progress: Optional[Callable[[int, int, float], None]] = None) -> Job:
+        """
+        Uploads a local file to the device as a background job and invalidates the
+        cached listing of the target directory.
+
+        :param port: The serial port to connect to.
+        :type port: str
+        :param local_path: The path of the local file.
+        :type local_path: str
+        :param remote_path: The target path on the device.
+        :type remote_path: str
+        :param callback: The function to be executed with the transfer summary.
         :type callback: Callable[[str], None]
-        :return: None
+        :param progress: An optional function to be executed with bytes done, total bytes and bytes/s.
+        :type progress: Optional[Callable[[int, int, float], None]]
+        :return: The submitted job.
+        :rtype: Job
         """
-        self._run_in_thread(lambda: self._get_structure(port), callback)
+        def worker(job: Job) -> str:
+            try:
+                return self._put_file(job, port, local_path, remote_path, progress)
+            finally:
+                self.file_cache(port).invalidate_file(remote_path)
+
+        return self._submit(f'Upload {remote_path}', port, worker, callback, priority=JobScheduler.NORMAL)
+
+    def get_file(self,
+                 port: str,
+                 remote_path: str,
+                 local_path: str,
+                 callback: Callable[[str], None],
+                 progress: Optional[Callable[[int, int, float], None]] = None) -> Job:
+        """
+        Downloads a file from the device as a background job.
+
+        :param port: The serial port to connect to.
+        :type port: str
+        :param remote_path: The path of the file on the device.
+        :type remote_path: str
+        :param local_path: The path of the local target file.
+        :type local_path: str
+        :param callback: The function to be executed with the transfer summary.
+        :type callback: Callable[[str], None]
+        :param progress: An optional function to be executed with bytes done, total bytes and bytes/s.
+        :type progress: Optional[Callable[[int, int, float], None]]
+        :return: The submitted job.
+        :rtype: Job
+        """
+        return self._submit(f'Download {remote_path}', port,
+                            lambda job: self._get_file(job, port, remote_path, local_path, progress),
+                            callback, priority=JobScheduler.NORMAL)
+
+    def sync_directory(self,
+                       port: str,
+                       local_dir: str,
+                       callback: Callable[[str], None],
+                       remote_dir: str = '/',
+                       delete: bool = False,
+                       progress: Optional[Callable[[str], None]] = None,
+                       confirm: Optional[Callable[[List[str]], bool]] = None) -> Job:
+        """
+        Uploads new or changed files of a local directory to the device as a background
+        job and invalidates the cached listings below the target directory.
+
+        :param port: The serial port to connect to.
+        :type port: str
+        :param local_dir: The local directory.
+        :type local_dir: str
+        :param callback: The function to be executed with the synchronization summary.
+        :type callback: Callable[[str], None]
+        :param remote_dir: The target directory on the device.
+        :type remote_dir: str, optional
+        :param delete: Whether stale device files below the target directory are deleted.
+        :type delete: bool, optional
+        :param progress: An optional function to be executed with a message for every changed file.
+        :type progress: Optional[Callable[[str], None]]
+        :param confirm: An optional function which is asked with the stale files before they are deleted.
+        :type confirm: Optional[Callable[[List[str]], bool]]
+        :return: The submitted job.
+        :rtype: Job
+        """
+        def worker(job: Job) -> str:
+            try:
+                return self._sync_directory(job, port, local_dir, remote_dir, delete, progress, confirm)
+            finally:
+                self.file_cache(port).invalidate(remote_dir)
+
+        return self._submit(f'Sync {local_dir}', port, worker, callback, priority=JobScheduler.NORMAL)
@@ -0,0 +1,254 @@
+from logging import getLogger, debug, error
+from serial import Serial
+from threading import Condition, Thread
+from time import monotonic, sleep
+from typing import Dict, Optional, Set
+from config.application_configuration import SERIAL_IDLE_TIMEOUT
+
+
+logger = getLogger(__name__)
+
+
+class SerialConnectionPool:
+    """
+    Keeps serial connections open across plugin calls. Connections are keyed by
+    port, handed out exclusively to one user at a time and closed after they
+    have been idle for a configurable time.
+    """
+
+    def __init__(self, idle_timeout: float = SERIAL_IDLE_TIMEOUT):
+        """
+        Initializes an empty connection pool.
+
+        :param idle_timeout: Seconds after which an unused connection is closed.
+        :type idle_timeout: float, optional
+        """
+        self._idle_timeout = idle_timeout
+        self._connections: Dict[str, Serial] = {}
+        self._last_used: Dict[str, float] = {}
+        self._in_use: Set[str] = set()
+        self._discard: Set[str] = set()
+        self._condition = Condition()
+        self._reaper: Optional[Thread] = None
+
+    @staticmethod
+    def _is_healthy(ser: Serial) -> bool:
+        """
+        Checks whether a pooled connection is still usable.
+
+        :param ser: The serial connection to check.
+        :type ser: Serial
+        :return: True if the port is open and the device is still attached.
+        :rtype: bool
+        """
+        try:
+            _ = ser.in_waiting
+            return ser.is_open
+        except Exception as err:
+            debug(f"Pooled connection is broken: {err}")
+            return False
+
+    @staticmethod
+    def _wait_for_prompt(ser: Serial, timeout: float) -> bool:
+        """
+        Interrupts the device, leaves a raw REPL which does not answer an interrupt,
+        and waits until the prompt of the friendly or the raw REPL arrives. This
+        replaces a fixed sleep after opening the port and returns as soon as the
+        board has finished booting.
+
+        :param ser: The freshly opened serial connection.
+        :type ser: Serial
+        :param timeout: The maximum number of seconds to wait for the prompt.
+        :type timeout: float
+        :return: True if a prompt was received in time.
+        :rtype: bool
+        """
+        read_timeout = ser.timeout
+        ser.timeout = 0.1
+        deadline = monotonic() + timeout
+        received = bytearray()
+
+        try:
+            while monotonic() < deadline:
+                ser.write(b'\r\x03\x02')
+                poll_end = min(deadline, monotonic() + 0.2)
+
+                while monotonic() < poll_end:
+                    received += ser.read(ser.in_waiting or 1)
+                    if received.endswith(b'>>> ') or received.endswith(b'\r\n>'):
+                        ser.reset_input_buffer()
+                        return True
+        finally:
+            ser.timeout = read_timeout
+
+        debug(f"No REPL prompt after {timeout} sec: {bytes(received[-64:])}")
+        return False
+
+    def _start_reaper(self) -> None:
+        """
+        Starts the background thread which closes idle connections, if it is not
+        already running.
+
+        :return: None
+        """
+        if self._reaper:
+            return
+
+        self._reaper = Thread(target=self._reap_idle, daemon=True)
+        self._reaper.start()
+
+    def _reap_idle(self) -> None:
+        """
+        Periodically closes connections which have not been used for longer than
+        the idle timeout. Exits when the pool is empty.
+
+        :return: None
+        """
+        interval = max(0.5, min(self._idle_timeout / 2, 5.0))
+
+        while True:
+            sleep(interval)
+
+            with self._condition:
+                now = monotonic()
+                idle = [port for port, last_used in self._last_used.items()
+                        if port not in self._in_use and now - last_used >= self._idle_timeout]
+
+                for port in idle:
+                    debug(f"Closing idle serial connection: {port}")
+                    self._close_locked(port)
+
+                if not self._connections:
+                    self._reaper = None
+                    return
+
+    def _close_locked(self, port: str) -> None:
+        """
+        Closes and forgets the connection for a port. The caller must hold the lock.
+
+        :param port: The serial device port.
+        :type port: str
+        :return: None
+        """
+        ser = self._connections.pop(port, None)
+        self._last_used.pop(port, None)
+        self._discard.discard(port)
+
+        if ser and ser.is_open:
+            try:
+                ser.close()
+            except Exception as err:
+                error(f"Closing serial connection failed: {err}")
+
+    def acquire(self, port: str, baudrate: int, timeout: float, probe: bool = True) -> Serial:
+        """
+        Hands out an open connection for the given port. Blocks while another user
+        holds the same port. A new connection is opened if none is pooled or the
+        pooled one is no longer healthy.
+
+        :param port: The serial device port.
+        :type port: str
+        :param baudrate: The baud rate for the connection.
+        :type baudrate: int
+        :param timeout: The read timeout, also used as budget for the REPL prompt check.
+        :type timeout: float
+        :param probe: Whether a newly opened port waits for a REPL prompt.
+        :type probe: bool, optional
+        :return: The exclusive serial connection.
+        :rtype: Serial
+        :raises SerialException: If the port cannot be opened.
+        :raises TimeoutError: If a newly opened port does not show a REPL prompt in time.
+        """
+        with self._condition:
+            while port in self._in_use:
+                self._condition.wait()
+
+            self._in_use.add(port)
+            ser = self._connections.pop(port, None)
+
+        try:
+            if ser is not None and not self._is_healthy(ser):
+                ser.close()
+                ser = None
+
+            if ser is None:
+                debug(f"Opening serial connection: {port}")
+                ser = Serial(port, baudrate, timeout=timeout)
+
+                if probe and not self._wait_for_prompt(ser, timeout):
+                    raise TimeoutError(f"No REPL prompt from {port} within {timeout} sec")
+            else:
+                debug(f"Reusing pooled serial connection: {port}")
+                if ser.baudrate != baudrate:
+                    ser.baudrate = baudrate
+                ser.timeout = timeout
+        except Exception:
+            if ser is not None:
+                try:
+                    ser.close()
+                except Exception as err:
+                    error(f"Closing serial connection failed: {err}")
+
+            with self._condition:
+                self._in_use.discard(port)
+                self._last_used.pop(port, None)
+                self._discard.discard(port)
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            self._connections[port] = ser
+            self._start_reaper()
+
+        return ser
+
+    def release(self, port: str, discard: bool = False) -> None:
+        """
+        Returns a connection to the pool and wakes up waiting users.
+
+        :param port: The serial device port.
+        :type port: str
+        :param discard: Whether the connection should be closed instead of kept open.
+        :type discard: bool, optional
+        :return: None
+        """
+        with self._condition:
+            self._in_use.discard(port)
+
+            if discard or port in self._discard:
+                self._close_locked(port)
+            else:
+                self._last_used[port] = monotonic()
+
+            self._condition.notify_all()
+
+    def close(self, port: str) -> None:
+        """
+        Closes the pooled connection for a port, e.g. before another tool needs the
+        port. A connection which is currently in use is closed on release.
+
+        :param port: The serial device port.
+        :type port: str
+        :return: None
+        """
+        with self._condition:
+            if port in self._in_use:
+                self._discard.add(port)
+            else:
+                self._close_locked(port)
+
+    def close_all(self) -> None:
+        """
+        Closes all pooled connections. Connections in use are closed on release.
+
+        :return: None
+        """
+        with self._condition:
+            for port in list(self._connections):
+                if port in self._in_use:
+                    self._discard.add(port)
+                else:
+                    self._close_locked(port)
+
+
+connection_pool = SerialConnectionPool()
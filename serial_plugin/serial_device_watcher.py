@@ -0,0 +1,284 @@
+from logging import getLogger, debug, error
+from ctypes import CDLL, get_errno
+from ctypes.util import find_library
+from fnmatch import fnmatch
+from glob import glob
+from os import read, close
+from os.path import basename, dirname
+from select import select
+from serial.tools import list_ports
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, List, NamedTuple, Optional
+from config.application_configuration import DEVICE_POLL_INTERVAL
+
+
+logger = getLogger(__name__)
+
+
+class DeviceInfo(NamedTuple):
+    """
+    Represents the metadata of a serial port reported by the operating system.
+    """
+    device: str
+    vid: Optional[int]
+    pid: Optional[int]
+    serial_number: Optional[str]
+    description: str
+
+    def __str__(self) -> str:
+        """
+        Returns a short text with USB ids and serial number, if known.
+
+        :return: The description of the port.
+        :rtype: str
+        """
+        parts = []
+        if self.vid is not None and self.pid is not None:
+            parts.append(f'{self.vid:04x}:{self.pid:04x}')
+        if self.serial_number:
+            parts.append(f'SN {self.serial_number}')
+
+        return ' '.join(parts) or self.description
+
+
+class DeviceWatcher:
+    """
+    Watches for serial ports appearing and disappearing in the background. On
+    Linux the device directory is watched with inotify, so changes are reported
+    immediately; elsewhere the ports are polled. Port metadata is cached and only
+    enumerated when new ports appear.
+
+    :ivar _IN_CREATE: The inotify flag for created files.
+    :ivar _IN_DELETE: The inotify flag for deleted files.
+    :ivar _IN_ATTRIB: The inotify flag for changed file attributes.
+    """
+    _IN_CREATE = 0x00000100
+    _IN_DELETE = 0x00000200
+    _IN_ATTRIB = 0x00000004
+
+    def __init__(self,
+                 patterns: List[str],
+                 on_change: Callable[[List[str], List[str], List[str]], None],
+                 interval: float = DEVICE_POLL_INTERVAL):
+        """
+        Initializes a device watcher for the given port patterns.
+
+        :param patterns: The glob patterns of the serial ports, e.g. /dev/ttyUSB*.
+        :type patterns: List[str]
+        :param on_change: A function to be executed with all, added and removed ports.
+        :type on_change: Callable[[List[str], List[str], List[str]], None]
+        :param interval: The number of seconds between two scans when polling.
+        :type interval: float, optional
+        """
+        self._patterns = patterns
+        self._on_change = on_change
+        self._interval = interval
+        self._devices: Dict[str, DeviceInfo] = {}
+        self._lock = Lock()
+        self._stop = Event()
+        self._rescan = Event()
+        self._thread: Optional[Thread] = None
+
+    @property
+    def devices(self) -> List[str]:
+        """
+        Returns the currently known ports.
+
+        :return: The sorted ports.
+        :rtype: List[str]
+        """
+        with self._lock:
+            return sorted(self._devices)
+
+    def info(self, port: str) -> Optional[DeviceInfo]:
+        """
+        Returns the cached metadata of a port.
+
+        :param port: The serial port.
+        :type port: str
+        :return: The metadata, or None if the port is unknown.
+        :rtype: Optional[DeviceInfo]
+        """
+        with self._lock:
+            return self._devices.get(port)
+
+    def start(self) -> None:
+        """
+        Starts the background thread, which reports the initial ports right away.
+
+        :return: None
+        """
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the background thread.
+
+        :return: None
+        """
+        self._stop.set()
+        self._rescan.set()
+
+    def rescan(self) -> None:
+        """
+        Requests an immediate scan, which reads the metadata of all ports again and
+        reports them even if nothing changed.
+
+        :return: None
+        """
+        self._rescan.set()
+
+    def _glob(self) -> List[str]:
+        """
+        Lists the ports which match the configured patterns.
+
+        :return: The matching ports.
+        :rtype: List[str]
+        """
+        if any(pattern.startswith('/') for pattern in self._patterns):
+            return [port for pattern in self._patterns for port in glob(pattern)]
+
+        return [port.device for port in list_ports.comports()
+                if any(fnmatch(port.device, pattern) for pattern in self._patterns)]
+
+    @staticmethod
+    def _metadata(ports: List[str]) -> Dict[str, DeviceInfo]:
+        """
+        Reads the metadata of the given ports from the operating system.
+
+        :param ports: The serial ports.
+        :type ports: List[str]
+        :return: The metadata keyed by port.
+        :rtype: Dict[str, DeviceInfo]
+        """
+        found = {port.device: port for port in list_ports.comports() if port.device in ports}
+        result = {}
+
+        for port in ports:
+            item = found.get(port)
+            if item:
+                result[port] = DeviceInfo(port, item.vid, item.pid, item.serial_number, item.description or '')
+            else:
+                result[port] = DeviceInfo(port, None, None, None, '')
+
+        return result
+
+    def _scan(self, force: bool = False) -> None:
+        """
+        Compares the current ports with the known ones and reports any difference.
+
+        :param force: Whether all ports are read again and reported even if nothing changed.
+        :type force: bool, optional
+        :return: None
+        """
+        try:
+            current = set(self._glob())
+        except Exception as err:
+            error(f"Device scan failed: {err}")
+            return
+
+        with self._lock:
+            known = set(self._devices)
+
+        added = sorted(current - known)
+        removed = sorted(known - current)
+
+        if not added and not removed and not force:
+            return
+
+        metadata = self._metadata(sorted(current) if force else added) if current else {}
+
+        with self._lock:
+            for port in removed:
+                self._devices.pop(port, None)
+            self._devices.update(metadata)
+            devices = sorted(self._devices)
+
+        debug(f"Devices changed, added: {added}, removed: {removed}")
+        self._on_change(devices, added, removed)
+
+    def _inotify(self) -> Optional[int]:
+        """
+        Creates an inotify instance which watches the directories of the patterns.
+
+        :return: The inotify file descriptor, or None if inotify is not available.
+        :rtype: Optional[int]
+        """
+        directories = {dirname(pattern) for pattern in self._patterns if pattern.startswith('/')}
+        if not directories:
+            return None
+
+        try:
+            libc = CDLL(find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(0)
+            if fd < 0:
+                raise OSError(get_errno(), 'inotify_init1 failed')
+
+            mask = self._IN_CREATE | self._IN_DELETE | self._IN_ATTRIB
+            for directory in directories:
+                if libc.inotify_add_watch(fd, directory.encode(), mask) < 0:
+                    close(fd)
+                    raise OSError(get_errno(), f'inotify_add_watch failed for {directory}')
+        except (OSError, AttributeError) as err:
+            debug(f"inotify not available, polling instead: {err}")
+            return None
+
+        return fd
+
+    def _matches(self, events: bytes) -> bool:
+        """
+        Checks whether a buffer of inotify events contains a matching port name.
+
+        :param events: The raw inotify events.
+        :type events: bytes
+        :return: True if at least one event concerns a matching port.
+        :rtype: bool
+        """
+        names = {basename(pattern) for pattern in self._patterns}
+        offset = 0
+
+        while offset + 16 <= len(events):
+            length = int.from_bytes(events[offset + 12:offset + 16], 'little')
+            name = events[offset + 16:offset + 16 + length].rstrip(b'\0').decode(errors='ignore')
+            offset += 16 + length
+
+            if any(fnmatch(name, pattern) for pattern in names):
+                return True
+
+        return False
+
+    def _run(self) -> None:
+        """
+        Reports the initial ports and then waits for changes until stopped.
+
+        :return: None
+        """
+        self._scan(force=True)
+        fd = self._inotify()
+
+        try:
+            while not self._stop.is_set():
+                if fd is None:
+                    self._rescan.wait(self._interval)
+                else:
+                    readable, _, _ = select([fd], [], [], min(self._interval, 0.5))
+                    changed = bool(readable) and self._matches(read(fd, 4096))
+                    if not changed and not self._rescan.is_set():
+                        continue
+
+                if self._stop.is_set():
+                    break
+
+                force = self._rescan.is_set()
+                self._rescan.clear()
+                self._scan(force)
+        finally:
+            if fd is not None:
+                close(fd)
+
+        debug('Device watcher stopped')
@@ -0,0 +1,283 @@
+from logging import getLogger, debug, error
+from ast import literal_eval
+from fnmatch import fnmatch
+from hashlib import sha256
+from json import load, dump
+from os import makedirs, walk, stat
+from os.path import expanduser, join, relpath, dirname, abspath
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Tuple
+from .serial_file_transfer import FileTransfer
+from config.application_configuration import CACHE_PATH, SYNC_HASH_CACHE, SYNC_IGNORE
+
+
+logger = getLogger(__name__)
+
+
+class DirectorySync(FileTransfer):
+    """
+    Represents a utility for synchronizing a local directory to a target directory
+    on the filesystem of a MicroPython firmware flashed device. Only new or changed
+    files are uploaded, based on SHA-256 hashes computed on the device and cached on
+    the host. Only files below the target directory are hashed or deleted.
+
+    :ivar _HASH_CODE: The MicroPython REPL code which hashes all files below a directory.
+    :ivar _MKDIR_CODE: The MicroPython REPL code which creates missing directories.
+    :ivar _DELETE_CODE: The MicroPython REPL code which removes stale files.
+    """
+    _HASH_CODE = (
+        "import os, hashlib, binascii\n"
+        "def walk(path):\n"
+        " try: entries = list(os.ilistdir(path))\n"
+        " except OSError: return\n"
+        " for entry in entries:\n"
+        "  full_path = path.rstrip('/') + '/' + entry[0]\n"
+        "  if entry[1] & 0x4000:\n"
+        "   print(repr((full_path, None)))\n"
+        "   walk(full_path)\n"
+        "   continue\n"
+        "  digest = hashlib.sha256()\n"
+        "  with open(full_path, 'rb') as f:\n"
+        "   while True:\n"
+        "    data = f.read(1024)\n"
+        "    if not data: break\n"
+        "    digest.update(data)\n"
+        "  print(repr((full_path, binascii.hexlify(digest.digest()).decode())))\n"
+        "walk({path!r})\n"
+    )
+    _MKDIR_CODE = (
+        "import os\n"
+        "for path in {paths!r}:\n"
+        " try: os.mkdir(path)\n"
+        " except OSError: pass\n"
+    )
+    _DELETE_CODE = (
+        "import os\n"
+        "for path in {paths!r}:\n"
+        " os.remove(path)\n"
+    )
+
+    @staticmethod
+    def _cache_file() -> str:
+        """
+        Returns the path of the local hash cache file.
+
+        :return: The path of the cache file.
+        :rtype: str
+        """
+        return join(expanduser(CACHE_PATH), SYNC_HASH_CACHE)
+
+    @classmethod
+    def _load_cache(cls) -> Dict[str, list]:
+        """
+        Loads the local hash cache, which maps absolute paths to size, mtime and hash.
+
+        :return: The cached hashes.
+        :rtype: Dict[str, list]
+        """
+        try:
+            with open(cls._cache_file(), 'r', encoding='utf-8') as file:
+                return load(file)
+        except (OSError, ValueError):
+            return {}
+
+    @classmethod
+    def _save_cache(cls, cache: Dict[str, list]) -> None:
+        """
+        Stores the local hash cache.
+
+        :param cache: The cached hashes.
+        :type cache: Dict[str, list]
+        :return: None
+        """
+        try:
+            makedirs(dirname(cls._cache_file()), exist_ok=True)
+            with open(cls._cache_file(), 'w', encoding='utf-8') as file:
+                dump(cache, file)
+        except OSError as err:
+            error(f"Saving hash cache failed: {err}")
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """
+        Calculates the SHA-256 hash of a local file.
+
+        :param path: The path of the local file.
+        :type path: str
+        :return: The hex digest of the file.
+        :rtype: str
+        """
+        digest = sha256()
+
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(65536), b''):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def _ignored(name: str) -> bool:
+        """
+        Checks whether a file or directory name matches one of the ignore patterns.
+
+        :param name: The file or directory name.
+        :type name: str
+        :return: True if the entry is not synchronized.
+        :rtype: bool
+        """
+        return any(fnmatch(name, pattern) for pattern in SYNC_IGNORE)
+
+    def _local_hashes(self, local_dir: str) -> Dict[str, Tuple[str, str]]:
+        """
+        Hashes all local files below a directory. Files whose size and modification
+        time did not change since the last run are taken from the hash cache.
+
+        :param local_dir: The local directory.
+        :type local_dir: str
+        :return: Relative paths mapped to absolute path and hex digest.
+        :rtype: Dict[str, Tuple[str, str]]
+        """
+        cache = self._load_cache()
+        hashes = {}
+        hashed = 0
+
+        for root, directories, files in walk(local_dir):
+            directories[:] = sorted(item for item in directories if not self._ignored(item))
+
+            for name in sorted(files):
+                if self._ignored(name):
+                    continue
+
+                path = abspath(join(root, name))
+                file_stat = stat(path)
+                cached = cache.get(path)
+
+                if cached and cached[0] == file_stat.st_size and cached[1] == file_stat.st_mtime_ns:
+                    digest = cached[2]
+                else:
+                    digest = self._hash_file(path)
+                    cache[path] = [file_stat.st_size, file_stat.st_mtime_ns, digest]
+                    hashed += 1
+
+                hashes[relpath(path, local_dir).replace('\\', '/')] = (path, digest)
+
+        if hashed:
+            self._save_cache(cache)
+
+        debug(f"local hashes: {len(hashes)} files, {hashed} hashed")
+        return hashes
+
+    def _remote_hashes(self, remote_dir: str, timeout: float) -> Dict[str, Optional[str]]:
+        """
+        Hashes all files below a device directory in one raw REPL execution.
+
+        :param remote_dir: The device directory.
+        :type remote_dir: str
+        :param timeout: The maximum number of seconds to wait for the hashes.
+        :type timeout: float
+        :return: Device paths mapped to hex digest, or None for directories.
+        :rtype: Dict[str, Optional[str]]
+        """
+        output = self.exec_raw(self._HASH_CODE.format(path=remote_dir), timeout=timeout)
+        hashes = {}
+
+        for line in output.splitlines():
+            if line.strip():
+                path, digest = literal_eval(line.strip())
+                hashes[path] = digest
+
+        return hashes
+
+    def sync(self,
+             local_dir: str,
+             remote_dir: str = '/',
+             delete: bool = False,
+             progress: Optional[Callable[[str], None]] = None,
+             timeout: float = 60,
+             confirm: Optional[Callable[[List[str]], bool]] = None) -> str:
+        """
+        Uploads all new or changed files of a local directory to the device and
+        optionally deletes device files which no longer exist locally.
+
+        :param local_dir: The local directory.
+        :type local_dir: str
+        :param remote_dir: The target directory on the device.
+        :type remote_dir: str, optional
+        :param delete: Whether stale device files below the target directory are deleted.
+        :type delete: bool, optional
+        :param progress: An optional function to be executed with a message for every changed file.
+        :type progress: Optional[Callable[[str], None]]
+        :param timeout: The maximum number of seconds to wait for the device hashes.
+        :type timeout: float, optional
+        :param confirm: An optional function which is asked with the stale files before they are deleted.
+        :type confirm: Optional[Callable[[List[str]], bool]]
+        :return: A summary of the synchronization.
+        :rtype: str
+        :raises RuntimeError: If the device fails.
+        :raises TimeoutError: If the device does not respond in time.
+        """
+        start = monotonic()
+        base = '/' + remote_dir.strip('/') if remote_dir.strip('/') else ''
+        local = self._local_hashes(local_dir)
+
+        self.enter_raw_repl()
+
+        try:
+            remote = self._remote_hashes(base or '/', timeout)
+
+            changed = [(path, f"{base}/{name}") for name, (path, digest) in local.items()
+                       if remote.get(f"{base}/{name}") != digest]
+
+            directories = {parent for name in local
+                           for parent in self._parents(f"{base}/{name}".rsplit('/', 1)[0], base)}
+            missing = sorted((directory for directory in directories if directory not in remote), key=len)
+            if base and local:
+                missing = self._parents(base, '') + missing
+            if missing:
+                self.exec_raw(self._MKDIR_CODE.format(paths=missing), timeout=timeout)
+
+            for local_path, remote_path in changed:
+                summary = self._send_file(local_path, remote_path, None, timeout)
+                if progress:
+                    progress(summary)
+
+            stale: List[str] = []
+            if delete:
+                targets = {f"{base}/{name}" for name in local}
+                stale = sorted(path for path, digest in remote.items()
+                               if digest is not None and path not in targets and path.startswith(f"{base}/"))
+
+                if stale and confirm and not confirm(stale):
+                    stale = []
+                    if progress:
+                        progress("Deleting stale files was declined")
+
+                if stale:
+                    self.exec_raw(self._DELETE_CODE.format(paths=stale), timeout=timeout)
+                    if progress:
+                        progress(f"Deleted {len(stale)} stale files")
+        finally:
+            self._leave_raw_repl()
+
+        unchanged = len(local) - len(changed)
+        return (f"Synced {local_dir} to {base or '/'}: {len(changed)} uploaded, {unchanged} unchanged, "
+                f"{len(stale)} deleted in {monotonic() - start:.2f}s")
+
+    @staticmethod
+    def _parents(directory: str, base: str) -> List[str]:
+        """
+        Returns a device directory and all its parents below the base directory.
+
+        :param directory: The device directory.
+        :type directory: str
+        :param base: The base directory, which is expected to exist.
+        :type base: str
+        :return: The directories from the top-most to the given one.
+        :rtype: List[str]
+        """
+        relative = directory[len(base):].strip('/')
+        if not relative:
+            return []
+
+        parts = relative.split('/')
+        return [f"{base}/{'/'.join(parts[:index])}" for index in range(1, len(parts) + 1)]
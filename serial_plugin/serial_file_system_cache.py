@@ -0,0 +1,130 @@
+from logging import getLogger, debug
+from threading import Lock
+from typing import Dict, List, Optional
+from .serial_get_file_structure import FileEntry
+
+
+logger = getLogger(__name__)
+
+
+class FileSystemCache:
+    """
+    Caches directory listings of a device filesystem so subtrees are only listed
+    when they are expanded, and only changed directories are listed again. A
+    subdirectory counts as changed when its signature in the listing of its
+    parent differs. The signature covers the names, sizes and file modification
+    times of the whole subtree, as directory modification times are not
+    maintained by every filesystem. Changes made by the application invalidate
+    the affected listings directly.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty directory cache.
+        """
+        self._directories: Dict[str, List[FileEntry]] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def _is_below(path: str, directory: str) -> bool:
+        """
+        Checks whether a path is the directory itself or located inside it.
+
+        :param path: The device path to check.
+        :type path: str
+        :param directory: The device directory path.
+        :type directory: str
+        :return: True if the path is inside the directory.
+        :rtype: bool
+        """
+        directory = directory.rstrip('/')
+        return path.rstrip('/') == directory or path.startswith(f"{directory}/")
+
+    def get(self, path: str) -> Optional[List[FileEntry]]:
+        """
+        Returns the cached entries of a directory.
+
+        :param path: The device directory path.
+        :type path: str
+        :return: The cached entries, or None if the directory is not cached.
+        :rtype: Optional[List[FileEntry]]
+        """
+        with self._lock:
+            return self._directories.get(path)
+
+    def update(self, path: str, entries: List[FileEntry]) -> List[str]:
+        """
+        Stores a fresh listing of a directory. Cached subdirectories which are gone
+        or whose signature changed are invalidated, unchanged ones are kept.
+
+        :param path: The device directory path.
+        :type path: str
+        :param entries: The fresh entries of the directory.
+        :type entries: List[FileEntry]
+        :return: The invalidated subdirectory paths.
+        :rtype: List[str]
+        """
+        with self._lock:
+            previous = {entry.path: entry for entry in self._directories.get(path, []) if entry.is_dir}
+            current = {entry.path: entry for entry in entries if entry.is_dir}
+            self._directories[path] = entries
+
+            changed = [directory for directory, entry in previous.items()
+                       if directory not in current or current[directory].signature != entry.signature]
+
+            for directory in changed:
+                self._invalidate_locked(directory)
+
+        if changed:
+            debug(f"Invalidated device directories: {changed}")
+
+        return changed
+
+    def _invalidate_locked(self, path: str) -> None:
+        """
+        Removes a directory and all cached directories below it. The caller must hold the lock.
+
+        :param path: The device directory path.
+        :type path: str
+        :return: None
+        """
+        for directory in [item for item in self._directories if self._is_below(item, path)]:
+            del self._directories[directory]
+
+    def invalidate(self, path: str) -> None:
+        """
+        Removes a directory, all cached directories below it and the listing of its
+        parent, which shows the directory itself, e.g. after files were created or
+        deleted below it.
+
+        :param path: The device directory path.
+        :type path: str
+        :return: None
+        """
+        parent = path.rstrip('/').rsplit('/', 1)[0] or '/'
+
+        with self._lock:
+            self._invalidate_locked(path)
+            self._directories.pop(parent, None)
+
+    def invalidate_file(self, path: str) -> None:
+        """
+        Invalidates the directory which contains a changed file, e.g. after an upload.
+
+        :param path: The device file path.
+        :type path: str
+        :return: None
+        """
+        parent = path.rstrip('/').rsplit('/', 1)[0] or '/'
+
+        with self._lock:
+            self._directories.pop(parent, None)
+
+    def clear(self) -> None:
+        """
+        Removes all cached directories.
+
+        :return: None
+        """
+        with self._lock:
+            self._directories.clear()
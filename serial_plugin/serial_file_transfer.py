@@ -0,0 +1,286 @@
+from logging import getLogger, debug
+from binascii import a2b_base64
+from os.path import getsize
+from time import monotonic
+from typing import Callable, Optional
+from .serial_base import SerialBase
+from config.application_configuration import SERIAL_TRANSFER_CHUNK, SERIAL_TRANSFER_WINDOW
+
+
+logger = getLogger(__name__)
+
+
+class FileTransfer(SerialBase):
+    """
+    Represents a utility for copying files between the host and the filesystem
+    of a MicroPython firmware flashed device over a serial connection. Files are
+    streamed in chunks, so they are never held in memory at once.
+
+    :ivar _PUT_CODE: The MicroPython REPL code which reads binary frames from stdin into a preallocated
+                     buffer and acknowledges each written frame.
+    :ivar _GET_CODE: The MicroPython REPL code which sends the file size followed by chunks on stdout.
+    :ivar _ACK: The byte the device sends when it is ready and after each frame has been written.
+    """
+    _PUT_CODE = (
+        "import sys, micropython\n"
+        "f = open({path!r}, 'wb')\n"
+        "b = memoryview(bytearray({frame}))\n"
+        "r = sys.stdin.buffer\n"
+        "n = 0\n"
+        "micropython.kbd_intr(-1)\n"
+        "try:\n"
+        " sys.stdout.write('\\x06')\n"
+        " while n < {size}:\n"
+        "  k = min({frame}, {size} - n)\n"
+        "  i = 0\n"
+        "  while i < k: i += r.readinto(b[i:k])\n"
+        "  n += f.write(b[:k])\n"
+        "  sys.stdout.write('\\x06')\n"
+        "finally:\n"
+        " micropython.kbd_intr(3)\n"
+        " f.close()\n"
+        "print(n)\n"
+    )
+    _GET_CODE = (
+        "import sys, os, binascii\n"
+        "f = open({path!r}, 'rb')\n"
+        "print(os.stat({path!r})[6])\n"
+        "while True:\n"
+        " data = f.read({chunk})\n"
+        " if not data: break\n"
+        " sys.stdout.write(binascii.b2a_base64(data).decode())\n"
+        "f.close()\n"
+        "print()\n"
+    )
+    _ACK = b'\x06'
+
+    @staticmethod
+    def _report(progress: Optional[Callable[[int, int, float], None]], done: int, total: int, start: float) -> float:
+        """
+        Calculates the current transfer rate and passes it to the progress callback.
+
+        :param progress: An optional function to be executed with bytes done, total bytes and bytes/s.
+        :type progress: Optional[Callable[[int, int, float], None]]
+        :param done: The number of bytes transferred so far.
+        :type done: int
+        :param total: The total number of bytes.
+        :type total: int
+        :param start: The monotonic start time of the transfer.
+        :type start: float
+        :return: The transfer rate in bytes/s.
+        :rtype: float
+        """
+        elapsed = max(monotonic() - start, 1e-6)
+        rate = done / elapsed
+
+        if progress:
+            progress(done, total, rate)
+
+        return rate
+
+    def _raise_device_error(self, received: bytes, timeout: float) -> None:
+        """
+        Reads the rest of a failed execution and raises the device error.
+
+        :param received: The data already received, starting with the end of stdout marker.
+        :type received: bytes
+        :param timeout: The maximum number of seconds to wait for the rest of the error.
+        :type timeout: float
+        :return: None
+        :raises RuntimeError: Always, with the last line of the device error.
+        """
+        if not received.endswith(b'\x04>'):
+            received += self.read_until(b'\x04>', timeout=timeout)
+
+        message = received.split(b'\x04')[1].decode(errors='ignore').strip()
+        raise RuntimeError(message.splitlines()[-1] if message else "Device aborted the transfer")
+
+    def _wait_for_ack(self, timeout: float) -> None:
+        """
+        Waits for the acknowledgement of one written frame.
+
+        :param timeout: The maximum number of seconds to wait for the acknowledgement.
+        :type timeout: float
+        :return: None
+        :raises RuntimeError: If the device fails instead of acknowledging the frame.
+        """
+        response = self._read_exactly(1, timeout)
+
+        if response != self._ACK:
+            self._raise_device_error(response, timeout)
+
+    def _line_usage(self, rate: float) -> float:
+        """
+        Returns a transfer rate as share of the line rate of the serial connection,
+        which carries ten bits per byte.
+
+        :param rate: The transfer rate in bytes/s.
+        :type rate: float
+        :return: The share of the line rate in percent.
+        :rtype: float
+        """
+        return rate * 1000 / self._baudrate
+
+    def _send_file(self,
+                   local_path: str,
+                   remote_path: str,
+                   progress: Optional[Callable[[int, int, float], None]],
+                   timeout: float) -> str:
+        """
+        Uploads a local file while the raw REPL is already entered. The file is sent
+        as raw bytes in frames of the configured chunk size, and the device
+        acknowledges each frame once it is written. Until then, the host sends at
+        most one more frame plus the stdin buffer of the device, which is the window
+        it announced for raw-paste mode or else the configured window. The device
+        reads the next frame while the host is still sending, so the transfer runs
+        close to the line rate without overrunning the device while it writes to
+        its flash.
+
+        :param local_path: The path of the local file.
+        :type local_path: str
+        :param remote_path: The target path on the device.
+        :type remote_path: str
+        :param progress: An optional function to be executed with bytes done, total bytes and bytes/s.
+        :type progress: Optional[Callable[[int, int, float], None]]
+        :param timeout: The maximum number of seconds to wait for each device response.
+        :type timeout: float
+        :return: A summary of the transfer.
+        :rtype: str
+        :raises RuntimeError: If the device fails or did not write all bytes.
+        :raises TimeoutError: If the device does not respond in time.
+        """
+        total = getsize(local_path)
+        frame = SERIAL_TRANSFER_CHUNK
+        sent = 0
+        done = 0
+
+        code = self._PUT_CODE.format(path=remote_path, frame=frame, size=total)
+        self._write_raw_code(code.encode('utf-8'), timeout)
+        self._wait_for_ack(timeout)
+        window = self._paste_window or SERIAL_TRANSFER_WINDOW
+        start = monotonic()
+
+        with open(local_path, 'rb') as file:
+            while done < total:
+                limit = min(done + frame + window, total)
+
+                if sent < limit:
+                    data = file.read(limit - sent)
+                    if not data:
+                        raise RuntimeError(f"{local_path} changed during the upload")
+
+                    self._ser.write(data)
+                    sent += len(data)
+                    continue
+
+                self._wait_for_ack(timeout)
+                done = min(done + frame, total)
+                self._report(progress, done, total, start)
+
+        response = self.read_until(b'\x04>', timeout=timeout)
+        rate = self._report(progress, done, total, start)
+
+        stdout, _, stderr = response[:-2].partition(b'\x04')
+        if stderr:
+            self._raise_device_error(b'\x04' + stderr + b'\x04>', timeout)
+
+        written = int(stdout.decode(errors='ignore').strip() or -1)
+        if written != total:
+            raise RuntimeError(f"Device wrote {written} of {total} bytes to {remote_path}")
+
+        usage = self._line_usage(rate)
+        debug(f"put {local_path} -> {remote_path}: {total} bytes, {rate:.0f} B/s, "
+              f"{usage:.0f}% of {self._baudrate} baud")
+        return (f"Uploaded {remote_path}: {total} bytes in {monotonic() - start:.2f}s "
+                f"({rate:.0f} B/s, {usage:.0f}% of the line rate)")
+
+    def put(self,
+            local_path: str,
+            remote_path: str,
+            progress: Optional[Callable[[int, int, float], None]] = None,
+            timeout: float = 10) -> str:
+        """
+        Uploads a local file to the device.
+
+        :param local_path: The path of the local file.
+        :type local_path: str
+        :param remote_path: The target path on the device.
+        :type remote_path: str
+        :param progress: An optional function to be executed with bytes done, total bytes and bytes/s.
+        :type progress: Optional[Callable[[int, int, float], None]]
+        :param timeout: The maximum number of seconds to wait for each device response.
+        :type timeout: float, optional
+        :return: A summary of the transfer.
+        :rtype: str
+        :raises RuntimeError: If the device fails or did not write all bytes.
+        :raises TimeoutError: If the device does not respond in time.
+        """
+        self.enter_raw_repl()
+
+        try:
+            return self._send_file(local_path, remote_path, progress, timeout)
+        finally:
+            self._leave_raw_repl()
+
+    def get(self,
+            remote_path: str,
+            local_path: str,
+            progress: Optional[Callable[[int, int, float], None]] = None,
+            timeout: float = 10) -> str:
+        """
+        Downloads a file from the device and streams it directly to disk.
+
+        :param remote_path: The path of the file on the device.
+        :type remote_path: str
+        :param local_path: The path of the local target file.
+        :type local_path: str
+        :param progress: An optional function to be executed with bytes done, total bytes and bytes/s.
+        :type progress: Optional[Callable[[int, int, float], None]]
+        :param timeout: The maximum number of seconds to wait for each device response.
+        :type timeout: float, optional
+        :return: A summary of the transfer.
+        :rtype: str
+        :raises RuntimeError: If the device fails or sent an incomplete file.
+        :raises TimeoutError: If the device does not respond in time.
+        """
+        done = 0
+        code = self._GET_CODE.format(path=remote_path, chunk=SERIAL_TRANSFER_CHUNK)
+
+        self.enter_raw_repl()
+
+        try:
+            self._write_raw_code(code.encode('utf-8'), timeout)
+            start = monotonic()
+
+            line = self.read_until(b'\n', timeout=timeout)
+            if b'\x04' in line:
+                self._raise_device_error(line[line.index(b'\x04'):], timeout)
+
+            total = int(line.strip())
+
+            with open(local_path, 'wb') as file:
+                while True:
+                    line = self.read_until(b'\n', timeout=timeout)
+                    if b'\x04' in line:
+                        self._raise_device_error(line[line.index(b'\x04'):], timeout)
+
+                    data = line.strip()
+                    if not data:
+                        break
+
+                    done += file.write(a2b_base64(data))
+                    self._report(progress, done, total, start)
+
+            self.read_until(b'\x04>', timeout=timeout)
+            rate = self._report(progress, done, total, start)
+        finally:
+            self._leave_raw_repl()
+
+        if done != total:
+            raise RuntimeError(f"Received {done} of {total} bytes from {remote_path}")
+
+        usage = self._line_usage(rate)
+        debug(f"get {remote_path} -> {local_path}: {total} bytes, {rate:.0f} B/s, "
+              f"{usage:.0f}% of {self._baudrate} baud")
+        return (f"Downloaded {remote_path}: {total} bytes in {monotonic() - start:.2f}s "
+                f"({rate:.0f} B/s, {usage:.0f}% of the line rate)")
@@ -1,74 +1,100 @@
 from logging import getLogger, debug
-from time import time
+from ast import literal_eval
+from typing import List, NamedTuple
 from .serial_base import SerialBase
 
 
 logger = getLogger(__name__)
 
 
+class FileEntry(NamedTuple):
+    """
+    Represents a single file or directory on the device filesystem. The signature
+    of a file is its modification time. The signature of a directory changes with
+    the names, types, sizes and signatures of all entries below it, so it also
+    changes with a same-size rewrite of a file in a subdirectory.
+    """
+    name: str
+    path: str
+    is_dir: bool
+    size: int
+    signature: int
+
+
 class FileStructure(SerialBase):
     """
     Represents a utility for interacting with a device to fetch and manage
     the file structure of MicroPython firmware flashed device over a
-    serial connection.
+    serial connection. Directories are listed one level at a time.
 
-    :ivar _TREE_CODE: The MicroPython REPL code to generate the tree structure.
+    :ivar _LIST_CODE: The MicroPython REPL code to list a single directory.
     """
-    _TREE_CODE = (
+    _LIST_CODE = (
         "import os\n"
-        "def tree(path='', prefix=''):\n"
-        " try:\n"
-        "  files = os.listdir(path) if path else os.listdir()\n"
-        " except: files = []\n"
-        " files.sort()\n"
-        " for idx, file in enumerate(files):\n"
-        "  full_path = path + '/' + file if path else file\n"
-        "  connector = '└── ' if idx == len(files) - 1 else '├── '\n"
-        "  print(prefix + connector + file)\n"
-        "  try:\n"
-        "   mode = os.stat(full_path)[0]\n"
-        "   if mode & 0x4000:\n"
-        "    extension = '    ' if idx == len(files) - 1 else '│   '\n"
-        "    tree(full_path, prefix + extension)\n"
-        "  except Exception: pass\n"
-        "tree('')\n"
+        "def sig(path, is_dir):\n"
+        " if not is_dir:\n"
+        "  return os.stat(path)[8]\n"
+        " value = 0\n"
+        " for entry in os.ilistdir(path):\n"
+        "  child = path.rstrip('/') + '/' + entry[0]\n"
+        "  size = entry[3] if len(entry) > 3 else 0\n"
+        "  value = (value + hash((entry[0], entry[1], size, sig(child, entry[1] & 0x4000 != 0)))) & 0x3fffffff\n"
+        " return value\n"
+        "def ls(path):\n"
+        " for entry in os.ilistdir(path):\n"
+        "  name = entry[0]\n"
+        "  is_dir = entry[1] & 0x4000 != 0\n"
+        "  size = entry[3] if len(entry) > 3 else 0\n"
+        "  try: signature = sig(path.rstrip('/') + '/' + name, is_dir)\n"
+        "  except Exception: signature = 0\n"
+        "  print(repr((name, is_dir, size, signature)))\n"
+        "ls({path!r})\n"
     )
 
-    def get_tree(self) -> str:
+    @staticmethod
+    def _join(path: str, name: str) -> str:
         """
-        Retrieves the current state of the tree structure by communicating with
-        a connected serial device. The method sends a specific command to the
-        device, waits for the response, and processes the output to extract
-        the tree structure information.
+        Joins a device directory path and an entry name.
 
-        :return: The tree structure information.
+        :param path: The directory path on the device.
+        :type path: str
+        :param name: The name of the entry.
+        :type name: str
+        :return: The full device path of the entry.
         :rtype: str
         """
-        self.enter_raw_repl()
-        self._ser.write(self._TREE_CODE.encode('utf-8') + b'\x04')
+        return f"{path.rstrip('/')}/{name}"
 
-        output = b''
-        start = time()
+    def list_dir(self, path: str = '/', timeout: float = 10) -> List[FileEntry]:
+        """
+        Lists a single directory of the connected device with name, type, size and
+        change signature of every entry. Directories are sorted before files.
+
+        :param path: The directory path on the device.
+        :type path: str, optional
+        :param timeout: The maximum number of seconds to wait for the listing.
+        :type timeout: float, optional
+        :return: The entries of the directory.
+        :rtype: List[FileEntry]
+        :raises RuntimeError: If the directory cannot be listed on the device.
+        :raises TimeoutError: If the device did not finish the output in time.
+        """
+        self.enter_raw_repl()
 
-        while True:
-            if time() - start > 10:
-                output = b'[ERROR] Timeout'
-                break
+        try:
+            output = self.exec_raw(self._LIST_CODE.format(path=path), timeout=timeout)
+        finally:
+            self._leave_raw_repl()
 
-            data = self._ser.read(1)
-            if not data:
-                break
-            output += data
-            if output.endswith(b'\x04>'):
-                break
+        debug(f"[DEBUG] list output for {path}: {output}")
 
-        self.exit_raw_repl()
+        entries = []
+        for line in output.splitlines():
+            if not line.strip():
+                continue
 
-        out = output.decode(errors="ignore")
-        debug(f"[DEBUG] tree output: {out}")
+            name, is_dir, size, signature = literal_eval(line.strip())
+            entries.append(FileEntry(name, self._join(path, name), is_dir, size, signature))
 
-        if 'OK' in out:
-            tree_output = out.split('OK', 1)[1].rsplit('\x04', 1)[0].strip()
-        else:
-            tree_output = out
-        return tree_output.replace('\x04', '').rstrip()
+        entries.sort(key=lambda item: (not item.is_dir, item.name.lower()))
+        return entries
@@ -1,7 +1,9 @@
 from logging import getLogger, debug, error
-from time import time
+from collections import deque
+from threading import Event
+from typing import Callable, Deque, List
 from .serial_base import SerialBase
-from config.application_configuration import SERIAL_SECONDS
+from config.application_configuration import SERIAL_RATE, SERIAL_MONITOR_LINES
 
 
 logger = getLogger(__name__)
@@ -9,33 +11,83 @@ logger = getLogger(__name__)
 
 class Debug(SerialBase):
     """
-    Represents a utility for interacting with a device to fetch the
-    current console output over a serial connection for a specific time.
+    Represents a utility for interacting with a device to stream the
+    console output over a serial connection until it is stopped.
+    The device is not interrupted when the connection is opened.
     """
+    _REPL_PROBE: bool = False
 
-    def get_debug(self, seconds: int = SERIAL_SECONDS) -> str:
+    def __init__(self, port: str, baudrate: int = SERIAL_RATE, timeout: int = 2, history: int = SERIAL_MONITOR_LINES):
         """
-        Retrieves debug information from a serial connection over a fixed period.
+        Initializes a serial monitor with a bounded history of recent lines.
 
-        :param seconds: The number of seconds to wait for debug information.
-        :type seconds: int
-        :return: The debug information as a string.
-        :rtype: str
+        :param port: The serial device port to connect to.
+        :type port: str
+        :param baudrate: The baud rate for the connection, which determines data transmission speed.
+        :type baudrate: int, optional
+        :param timeout: The timeout duration in seconds for the serial connection, default is 2.
+        :type timeout: int, optional
+        :param history: The maximum number of recent lines kept in the ring buffer.
+        :type history: int, optional
         """
-        debug(f"read debug for {seconds} sec")
-        output = []
-        start_time = time()
-        end_time = start_time + seconds
+        super().__init__(port=port, baudrate=baudrate, timeout=timeout)
+        self._history: Deque[str] = deque(maxlen=history)
+        self._stop_event = Event()
 
-        while time() < end_time:
+    @property
+    def history(self) -> List[str]:
+        """
+        Returns the most recent lines received by the monitor.
+
+        :return: The lines in the ring buffer, oldest first.
+        :rtype: List[str]
+        """
+        return list(self._history)
+
+    def stream(self, on_line: Callable[[str], None]) -> None:
+        """
+        Blocks on serial reads and passes every complete line to the callback as
+        soon as it arrives, until the monitor is stopped or the device is gone.
+
+        :param on_line: The function to be executed with every received line.
+        :type on_line: Callable[[str], None]
+        :return: None
+        :raises RuntimeError: If the serial connection is not available.
+        """
+        if not self._ser or not self._ser.is_open:
+            raise RuntimeError("Serial monitor not connected")
+
+        debug(f"start serial monitor on {self._port}")
+        buffer = self._rx_buffer
+
+        while not self._stop_event.is_set():
             try:
-                if self._ser.in_waiting:
-                    line = self._ser.readline().decode('utf-8', errors='ignore').strip()
-                    if line:
-                        debug(line)
-                        output.append(line)
+                buffer += self._ser.read(self._ser.in_waiting or 1)
             except Exception as e:
                 error(e)
                 break
 
-        return "\n".join(output)
+            while True:
+                index = buffer.find(b'\n')
+                if index < 0:
+                    break
+
+                line = buffer[:index].decode('utf-8', errors='ignore').strip()
+                del buffer[:index + 1]
+
+                if line:
+                    self._history.append(line)
+                    on_line(line)
+
+        debug(f"serial monitor on {self._port} stopped")
+
+    def stop(self) -> None:
+        """
+        Stops a running stream and interrupts a pending read.
+
+        :return: None
+        """
+        self._stop_event.set()
+
+        if self._ser and self._ser.is_open:
+            self._ser.cancel_read()
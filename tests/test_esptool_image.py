@@ -0,0 +1,138 @@
+from pathlib import Path
+from struct import pack
+from typing import Tuple
+from esptool.bin_image import ESP32C3FirmwareImage, ESP32FirmwareImage, ImageSegment
+import pytest
+from esptool_plugin.esptool_image import EspImage
+
+
+APP_DESC = pack('<I', 0xABCD5432) + bytes(252)
+CODE = bytes(range(256)) * 4
+ADDRESSES = (0x3C000020, 0x40380000)
+
+
+def build_image(path: Path, image_class: type = ESP32C3FirmwareImage, segments: Tuple[bytes, ...] = (CODE,),
+                digest: bool = True) -> bytes:
+    """
+    Builds an image with esptool and returns its content.
+
+    :param path: The path of the image file.
+    :type path: Path
+    :param image_class: The esptool image class of the chip.
+    :type image_class: type, optional
+    :param segments: The data of the segments.
+    :type segments: Tuple[bytes, ...], optional
+    :param digest: Whether a SHA-256 digest is appended.
+    :type digest: bool, optional
+    :return: The image.
+    :rtype: bytes
+    """
+    image = image_class()
+    image.entrypoint = ADDRESSES[1]
+    image.segments = [ImageSegment(address, data) for address, data in zip(ADDRESSES, segments)]
+    image.append_digest = digest
+    image.save(str(path))
+    return path.read_bytes()
+
+
+def test_parse_header_detects_app(tmp_path):
+    header = EspImage.parse_header(build_image(tmp_path / 'app.bin', segments=(APP_DESC, CODE)))
+
+    assert header.chip == 'esp32c3'
+    assert header.segments == 2
+    assert header.hash_appended
+    assert (header.kind, header.offset) == ('app', EspImage.APP_OFFSET)
+
+
+def test_parse_header_detects_bootloader(tmp_path):
+    header = EspImage.parse_header(build_image(tmp_path / 'boot.bin', ESP32FirmwareImage))
+
+    assert header.chip == 'esp32'
+    assert (header.kind, header.offset) == ('bootloader', 0x1000)
+
+
+def test_parse_header_detects_merged_image(tmp_path):
+    bootloader = build_image(tmp_path / 'boot.bin', ESP32FirmwareImage)
+    table = EspImage.PARTITION_TABLE - 0x1000
+    merged = bootloader.ljust(table, b'\xff') + b'\xaa\x50' + bytes(30)
+
+    header = EspImage.parse_header(merged)
+
+    assert (header.kind, header.offset) == ('merged', 0x1000)
+
+
+def test_parse_header_rejects_other_data():
+    with pytest.raises(ValueError):
+        EspImage.parse_header(b'\xaa\x50' + bytes(62))
+
+    with pytest.raises(ValueError):
+        EspImage.parse_header(b'\xe9' + bytes(8))
+
+
+def test_validate_accepts_intact_image(tmp_path):
+    build_image(tmp_path / 'app.bin', segments=(APP_DESC, CODE))
+
+    result = EspImage.validate(str(tmp_path / 'app.bin'))
+
+    assert result.valid
+    assert result.errors == [] and result.warnings == []
+    assert result.header.kind == 'app'
+
+
+def test_check_image_reports_checksum(tmp_path):
+    data = bytearray(build_image(tmp_path / 'app.bin', digest=False))
+    data[EspImage.HEADER_SIZE + 8] ^= 0xFF
+
+    errors = EspImage._check_image(bytes(data), 0, False)
+
+    assert len(errors) == 1 and 'checksum' in errors[0]
+
+
+def test_check_image_reports_digest(tmp_path):
+    data = bytearray(build_image(tmp_path / 'app.bin'))
+    data[-1] ^= 0xFF
+
+    errors = EspImage._check_image(bytes(data), 0, False)
+
+    assert errors == ['Image at 0x0 does not match its appended SHA-256 digest']
+
+
+def test_check_image_reports_truncation(tmp_path):
+    data = build_image(tmp_path / 'app.bin', digest=False)
+
+    assert 'truncated in segment 0' in EspImage._check_image(data[:100], 0, False)[0]
+    assert 'header of segment 0' in EspImage._check_image(data[:EspImage.HEADER_SIZE + 4], 0, False)[0]
+
+
+def test_check_image_checks_app_of_merged_image(tmp_path):
+    bootloader = build_image(tmp_path / 'boot.bin', ESP32FirmwareImage)
+    app = bytearray(build_image(tmp_path / 'app.bin', ESP32FirmwareImage, segments=(APP_DESC, CODE)))
+    app[-1] ^= 0xFF
+    merged = (bootloader.ljust(EspImage.PARTITION_TABLE - 0x1000, b'\xff') + b'\xaa\x50' + bytes(30)).ljust(
+        EspImage.APP_OFFSET - 0x1000, b'\xff') + bytes(app)
+    (tmp_path / 'merged.bin').write_bytes(merged)
+
+    result = EspImage.validate(str(tmp_path / 'merged.bin'))
+
+    assert not result.valid
+    assert result.errors == ['Image at 0xf000 does not match its appended SHA-256 digest']
+
+
+def test_validate_reports_image_exceeding_flash(tmp_path):
+    build_image(tmp_path / 'app.bin')
+
+    result = EspImage.validate(str(tmp_path / 'app.bin'), offset=0x3FFF00, flash_size='4MB')
+
+    assert not result.valid
+    assert result.errors[0].endswith('does not fit into 4096 KB of flash')
+
+
+def test_validate_warns_about_raw_data(tmp_path):
+    (tmp_path / 'partitions.bin').write_bytes(b'\xaa\x50' + bytes(3070))
+
+    result = EspImage.validate(str(tmp_path / 'partitions.bin'), offset=0x8000, flash_size='4MB')
+    too_large = EspImage.validate(str(tmp_path / 'partitions.bin'), offset=0x3FFF00, flash_size='4MB')
+
+    assert result.valid and result.header is None
+    assert result.warnings == ['Not an ESP image, the magic byte 0xE9 is missing, it is flashed as raw data']
+    assert not too_large.valid
@@ -0,0 +1,116 @@
+from struct import pack
+import pytest
+from esptool_plugin.esptool_partition_table import PartitionTable
+
+
+def entry(label: str, partition_type: int, subtype: int, offset: int, size: int) -> bytes:
+    """
+    Encodes a single partition table entry.
+
+    :param label: The label of the partition.
+    :type label: str
+    :param partition_type: The partition type.
+    :type partition_type: int
+    :param subtype: The partition subtype.
+    :type subtype: int
+    :param offset: The flash address of the partition.
+    :type offset: int
+    :param size: The size of the partition.
+    :type size: int
+    :return: The entry.
+    :rtype: bytes
+    """
+    return b'\xaa\x50' + pack('<BBII16sI', partition_type, subtype, offset, size, label.encode(), 0)
+
+
+def ota_entry(sequence: int, crc: int, state: int = 0xFFFFFFFF) -> bytes:
+    """
+    Encodes an OTA selection entry.
+
+    :param sequence: The sequence number.
+    :type sequence: int
+    :param crc: The checksum of the sequence number.
+    :type crc: int
+    :param state: The OTA state of the selected slot, by default undefined.
+    :type state: int, optional
+    :return: The entry.
+    :rtype: bytes
+    """
+    return pack('<I20xII', sequence, state, crc)
+
+
+# the first entries of otadata dumps after the first and the second OTA update
+OTA_SELECT_1 = bytes.fromhex('01000000' + 'ff' * 24 + '9a984347')
+OTA_SELECT_2 = bytes.fromhex('02000000' + 'ff' * 24 + '7437f655')
+OTA_SELECT_3 = ota_entry(3, 0xED4A5011)
+
+
+TABLE = b''.join([
+    entry('nvs', 0x01, 0x02, 0x9000, 0x5000),
+    entry('otadata', 0x01, 0x00, 0xE000, 0x2000),
+    entry('ota_0', 0x00, 0x10, 0x10000, 0x180000),
+    entry('ota_1', 0x00, 0x11, 0x190000, 0x180000),
+    entry('vfs', 0x01, 0x81, 0x310000, 0xF0000),
+    b'\xeb\xeb' + b'\xff' * 14 + bytes(16)
+]).ljust(PartitionTable.SIZE, b'\xff')
+
+FACTORY_TABLE = b''.join([
+    entry('nvs', 0x01, 0x02, 0x9000, 0x6000),
+    entry('phy_init', 0x01, 0x01, 0xF000, 0x1000),
+    entry('factory', 0x00, 0x00, 0x10000, 0x1F0000),
+    entry('vfs', 0x01, 0x83, 0x200000, 0x200000)
+]).ljust(PartitionTable.SIZE, b'\xff')
+
+
+def test_parse_stops_at_md5_entry():
+    partitions = PartitionTable.parse(TABLE)
+
+    assert [partition.label for partition in partitions] == ['nvs', 'otadata', 'ota_0', 'ota_1', 'vfs']
+    assert (partitions[2].offset, partitions[2].size) == (0x10000, 0x180000)
+    assert [partition.subtype_name for partition in partitions] == ['nvs', 'ota', 'ota_0', 'ota_1', 'fat']
+
+
+def test_parse_rejects_invalid_data():
+    with pytest.raises(ValueError):
+        PartitionTable.parse(b'\xff' * PartitionTable.SIZE)
+
+    with pytest.raises(ValueError):
+        PartitionTable.parse(TABLE[:32] + b'\x00' * 32)
+
+
+def test_filesystem_prefers_vfs():
+    partitions = PartitionTable.parse(FACTORY_TABLE)
+
+    assert PartitionTable.filesystem(partitions).label == 'vfs'
+    assert PartitionTable.filesystem(partitions, 'data') is None
+
+
+def test_ota_sequence_accepts_dumped_entries():
+    assert PartitionTable._ota_sequence(OTA_SELECT_1 + b'\xff' * 32) == 1
+    assert PartitionTable._ota_sequence(b'\xff' * 32 + OTA_SELECT_2) == 2
+
+
+def test_ota_sequence_uses_highest_valid_entry():
+    assert PartitionTable._ota_sequence(OTA_SELECT_1 + OTA_SELECT_2) == 2
+    assert PartitionTable._ota_sequence(OTA_SELECT_1 + ota_entry(2, 0)) == 1
+    assert PartitionTable._ota_sequence(OTA_SELECT_1 + ota_entry(2, 0x55F63774, state=3)) == 1
+    assert PartitionTable._ota_sequence(b'\xff' * 64) is None
+
+
+def test_ota_sequence_rejects_crc_without_seed():
+    assert PartitionTable._ota_sequence(ota_entry(1, 0x99F8B879) + b'\xff' * 32) is None
+
+
+@pytest.mark.parametrize('otadata, label', [(OTA_SELECT_1, 'ota_0'), (OTA_SELECT_2, 'ota_1'), (OTA_SELECT_3, 'ota_0')])
+def test_boot_app_follows_ota_sequence(otadata, label):
+    partitions = PartitionTable.parse(TABLE)
+
+    assert PartitionTable.boot_app(partitions, otadata + b'\xff' * 32).label == label
+
+
+def test_boot_app_without_ota_selection():
+    partitions = PartitionTable.parse(TABLE)
+
+    assert PartitionTable.boot_app(partitions).label == 'ota_0'
+    assert PartitionTable.boot_app(partitions, b'\xff' * 64).label == 'ota_0'
+    assert PartitionTable.boot_app(PartitionTable.parse(FACTORY_TABLE)).label == 'factory'
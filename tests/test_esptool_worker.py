@@ -0,0 +1,109 @@
+from argparse import Namespace
+from hashlib import md5
+from pathlib import Path
+from typing import List, Tuple
+import pytest
+from esptool_plugin import esptool_worker
+
+
+BLOCK_SIZE = 0x1000
+
+
+class FakeLoader:
+    """
+    Represents a connected loader whose flash is a byte array.
+    """
+    CHIP_NAME = 'ESP32'
+    IS_STUB = True
+
+    def __init__(self, flash: bytes):
+        """
+        Initializes the loader with the flash content.
+
+        :param flash: The flash content.
+        :type flash: bytes
+        """
+        self.flash = flash
+
+    def flash_md5sum(self, address: int, size: int) -> str:
+        """
+        Returns the MD5 of a flash region, like the stub calculates it.
+
+        :param address: The flash address.
+        :type address: int
+        :param size: The size of the region.
+        :type size: int
+        :return: The hex digest.
+        :rtype: str
+        """
+        return md5(self.flash[address:address + size]).hexdigest()
+
+
+@pytest.fixture
+def writes(monkeypatch) -> List[Tuple[int, bytes]]:
+    """
+    Replaces esptool's write_flash and collects the written regions.
+
+    :param monkeypatch: The pytest fixture for patching attributes.
+    :type monkeypatch: pytest.MonkeyPatch
+    :return: The flash addresses and data of the written regions.
+    :rtype: List[Tuple[int, bytes]]
+    """
+    regions = []
+
+    def write_flash(esp: FakeLoader, args: Namespace) -> None:
+        regions.extend((address, file.getvalue()) for address, file in args.addr_filename)
+
+    monkeypatch.setattr(esptool_worker.cmds, 'write_flash', write_flash)
+    return regions
+
+
+def operation(path: Path, image: bytes, address: int = 0x10000) -> dict:
+    """
+    Creates a write_flash_diff operation with the hashes of an image.
+
+    :param path: The path the image is written to.
+    :type path: Path
+    :param image: The image.
+    :type image: bytes
+    :param address: The flash address of the image.
+    :type address: int, optional
+    :return: The operation.
+    :rtype: dict
+    """
+    path.write_bytes(image)
+    return {'address': address, 'file': str(path), 'size': len(image), 'md5': md5(image).hexdigest(),
+            'block_size': BLOCK_SIZE,
+            'blocks': [md5(image[index:index + BLOCK_SIZE]).hexdigest() for index in range(0, len(image), BLOCK_SIZE)]}
+
+
+def test_write_flash_diff_skips_identical_image(tmp_path, writes):
+    image = bytes(range(256)) * 64
+    flash = bytes(0x10000) + image
+
+    result = esptool_worker._write_flash_diff(FakeLoader(flash), operation(tmp_path / 'app.bin', image))
+
+    assert result['skipped'] and result['written'] == 0
+    assert writes == []
+
+
+def test_write_flash_diff_merges_adjacent_blocks(tmp_path, writes):
+    image = bytes(range(256)) * 96
+    flash = bytearray(bytes(0x10000) + image)
+    for block in (1, 2, 4):
+        flash[0x10000 + block * BLOCK_SIZE] ^= 0xFF
+
+    result = esptool_worker._write_flash_diff(FakeLoader(bytes(flash)), operation(tmp_path / 'app.bin', image))
+
+    assert writes == [(0x11000, image[BLOCK_SIZE:3 * BLOCK_SIZE]), (0x14000, image[4 * BLOCK_SIZE:5 * BLOCK_SIZE])]
+    assert result['written'] == 3 * BLOCK_SIZE and not result['skipped']
+
+
+def test_write_flash_diff_writes_partial_last_block(tmp_path, writes):
+    image = bytes(range(256)) * 20
+    flash = bytes(0x10000) + image[:-1] + b'\x00'
+
+    result = esptool_worker._write_flash_diff(FakeLoader(flash), operation(tmp_path / 'app.bin', image))
+
+    assert writes == [(0x11000, image[BLOCK_SIZE:])]
+    assert result['written'] == len(image) - BLOCK_SIZE
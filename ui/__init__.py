@@ -5,6 +5,8 @@ from .frame_erase_device import FrameEraseDevice
 from .frame_firmware_flash import FrameFirmwareFlash
 from .frame_plugins import FramePlugIns
 from .frame_search_device import FrameSearchDevice
+from .toplevel_file_browser import ToplevelFileBrowser
+from .toplevel_batch_flash import ToplevelBatchFlash
 
 
 __all__ = ["BaseUI",
@@ -13,5 +15,7 @@ __all__ = ["BaseUI",
            "FrameDeviceInformation",
            "FrameEraseDevice",
            "FramePlugIns",
-           "FrameFirmwareFlash"
+           "FrameFirmwareFlash",
+           "ToplevelFileBrowser",
+           "ToplevelBatchFlash"
            ]
@@ -1,7 +1,8 @@
 from logging import getLogger, debug
+from typing import List
 from customtkinter import CTkFrame, CTkLabel, CTkTextbox
 from config.application_configuration import FONT_CATEGORY
-from config.application_configuration import CONSOLE_INFO, CONSOLE_COMMAND, CONSOLE_ERROR
+from config.application_configuration import CONSOLE_INFO, CONSOLE_COMMAND, CONSOLE_ERROR, CONSOLE_MAX_LINES
 
 
 logger = getLogger(__name__)
@@ -9,18 +10,21 @@ logger = getLogger(__name__)
 
 class FrameConsole(CTkFrame):
     """
-    A specialized class designed to facilitate console output operations.
+    A specialized class designed to facilitate console output operations. The
+    console keeps at most a maximum number of lines, older lines are dropped.
     """
 
-    def __init__(self, master, *args, **kwargs):
+    def __init__(self, master, *args, max_lines: int = CONSOLE_MAX_LINES, **kwargs):
         """
-        A custom frame designed with widgets for erasing flash. This frame
+        A custom frame designed with widgets for console output. This frame
         is a child of the specified parent widget (master) and includes a
         Label and a Textbox with customizable UI features.
         """
         super().__init__(master, *args, **kwargs)
         debug('Create Console Frame')
 
+        self._max_lines = max_lines
+
         self.grid(row=4, column=0, columnspan=2, pady=10, padx=10, sticky="nsew")
         self.grid_columnconfigure(0, weight=1)
 
@@ -33,3 +37,28 @@ class FrameConsole(CTkFrame):
         self.console_text.tag_config("info", foreground=CONSOLE_INFO)
         self.console_text.tag_config("normal", foreground=CONSOLE_COMMAND)
         self.console_text.tag_config("error", foreground=CONSOLE_ERROR)
+
+    def append(self, lines: List[str], tag: str = "normal") -> None:
+        """
+        Appends lines with a single insert and drops the oldest lines beyond the
+        maximum. The view follows the new lines only if it was at the bottom, so
+        scrolling back is not interrupted.
+
+        :param lines: The lines to append.
+        :type lines: List[str]
+        :param tag: The tag of the lines.
+        :type tag: str, optional
+        :return: None
+        """
+        if not lines:
+            return
+
+        at_bottom = self.console_text.yview()[1] >= 1.0
+        self.console_text.insert("end", '\n'.join(lines) + '\n', tag)
+
+        count = int(self.console_text.index("end-1c").split('.')[0]) - 1
+        if count > self._max_lines:
+            self.console_text.delete("1.0", f"{count - self._max_lines + 1}.0")
+
+        if at_bottom:
+            self.console_text.see("end")
@@ -38,3 +38,12 @@ class FrameDeviceInformation(CTkFrame):
 
         self.flash_status_btn = CTkButton(self, text='Flash Status', fg_color=FRAME_BTN_COLOR_INFORMATION)
         self.flash_status_btn.pack(padx=10, pady=5)
+
+        self.report_btn = CTkButton(self, text='Device Report', fg_color=FRAME_BTN_COLOR_INFORMATION)
+        self.report_btn.pack(padx=10, pady=5)
+
+        self.baud_probe_btn = CTkButton(self, text='Probe Baud Rate', fg_color=FRAME_BTN_COLOR_INFORMATION)
+        self.baud_probe_btn.pack(padx=10, pady=5)
+
+        self.partition_btn = CTkButton(self, text='Partition Table', fg_color=FRAME_BTN_COLOR_INFORMATION)
+        self.partition_btn.pack(padx=10, pady=5)
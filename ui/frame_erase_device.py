@@ -1,6 +1,6 @@
 from logging import getLogger, debug
 from customtkinter import CTkFrame, CTkLabel, CTkButton
-from config.application_configuration import FONT_CATEGORY, FRAME_BTN_COLOR_ERASE
+from config.application_configuration import FONT_CATEGORY, FRAME_BTN_COLOR_ERASE, FRAME_BTN_COLOR_BACKUP
 
 
 logger = getLogger(__name__)
@@ -8,14 +8,14 @@ logger = getLogger(__name__)
 
 class FrameEraseDevice(CTkFrame):
     """
-    A specialized class designed to facilitate flash erasing operations.
+    A specialized class designed to facilitate flash erasing, backup and restore operations.
     """
 
     def __init__(self, master, *args, **kwargs):
         """
         A custom frame designed with widgets for erasing flash. This frame
         is a child of the specified parent widget (master) and includes a
-        Label and a Button with customizable UI features.
+        Label and Buttons with customizable UI features.
         """
         super().__init__(master, *args, **kwargs)
         debug('Create Erase Device Frame')
@@ -23,9 +23,15 @@ class FrameEraseDevice(CTkFrame):
         self.grid(row=2, column=0, padx=10, pady=5, sticky="nsew")
         self.grid_columnconfigure(0, weight=1)
 
-        self.label = CTkLabel(self, text='Erase')
+        self.label = CTkLabel(self, text='Backup & Erase')
         self.label.pack(padx=10, pady=10)
         self.label.configure(font=FONT_CATEGORY)
 
         self.erase_btn = CTkButton(self, text='Erase Flash', fg_color=FRAME_BTN_COLOR_ERASE)
         self.erase_btn.pack(padx=10, pady=5)
+
+        self.backup_btn = CTkButton(self, text='Backup Flash', fg_color=FRAME_BTN_COLOR_BACKUP)
+        self.backup_btn.pack(padx=10, pady=5)
+
+        self.restore_btn = CTkButton(self, text='Restore Flash', fg_color=FRAME_BTN_COLOR_BACKUP)
+        self.restore_btn.pack(padx=10, pady=5)
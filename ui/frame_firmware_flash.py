@@ -1,7 +1,8 @@
 from logging import getLogger, debug
-from customtkinter import CTkFrame, CTkLabel, CTkSwitch, CTkOptionMenu, CTkCheckBox, CTkButton, CTkEntry
+from customtkinter import (CTkFrame, CTkLabel, CTkSwitch, CTkOptionMenu, CTkCheckBox, CTkButton, CTkEntry,
+                           CTkProgressBar, CTkComboBox)
 from tkinter import Canvas
-from config.application_configuration import FONT_CATEGORY, FONT_DESCRIPTION, LINK_OBJECT
+from config.application_configuration import FONT_CATEGORY, FONT_DESCRIPTION, LINK_OBJECT, FRAME_BTN_COLOR_ERASE
 from config.device_configuration import (CONFIGURED_DEVICES, BAUDRATE_OPTIONS, FLASH_MODE_OPTIONS,
                                          FLASH_FREQUENCY_OPTIONS, FLASH_SIZE_OPTIONS)
 
@@ -63,9 +64,9 @@ class FrameFirmwareFlash(CTkFrame):
         self.link_label.grid(row=2, column=3, padx=(10, 0), pady=5, sticky="w")
         self.link_label.configure(font=(*FONT_DESCRIPTION, "underline"))
 
-        self.firmware_info = CTkLabel(self, text='and select the firmware file to upload')
-        self.firmware_info.grid(row=2, column=4, columnspan=2, padx=(5, 10), pady=5, sticky="w")
-        self.firmware_info.configure(font=FONT_DESCRIPTION)
+        self.firmware_search = CTkComboBox(self, values=[], width=300)
+        self.firmware_search.grid(row=2, column=4, columnspan=2, padx=(5, 10), pady=5, sticky="w")
+        self.firmware_search.set('')
 
         self.baudrate_label = CTkLabel(self, text='Step 3:')
         self.baudrate_label.grid(row=3, column=0, padx=10, pady=5, sticky="w")
@@ -132,8 +133,43 @@ class FrameFirmwareFlash(CTkFrame):
         self.erase_before_info = CTkLabel(self, text='Erase flash before flashing firmware')
         self.erase_before_info.grid(row=8, column=3, columnspan=3, padx=10, pady=5, sticky="w")
 
+        self.images_label = CTkLabel(self, text='Step 9:')
+        self.images_label.grid(row=9, column=0, padx=10, pady=5, sticky="w")
+
+        self.images_btn = CTkButton(self, text='Add Image', width=150)
+        self.images_btn.grid(row=9, column=1, padx=10, pady=5, sticky="w")
+
+        self.images_clear_btn = CTkButton(self, text='Clear', width=60)
+        self.images_clear_btn.grid(row=9, column=3, padx=10, pady=5, sticky="w")
+
+        self.images_info = CTkLabel(self, text='Add bootloader, partition or filesystem images')
+        self.images_info.grid(row=9, column=4, padx=10, pady=5, sticky="w")
+
+        self.merge_btn = CTkButton(self, text='Build Merged Image')
+        self.merge_btn.grid(row=9, column=5, padx=10, pady=5, sticky="e")
+
         self.separator_canvas = Canvas(self, height=1, highlightthickness=0, bg="white", bd=0)
-        self.separator_canvas.grid(row=9, columnspan=6, sticky="ew", padx=10, pady=10)
+        self.separator_canvas.grid(row=10, columnspan=6, sticky="ew", padx=10, pady=10)
 
         self.flash_btn = CTkButton(self, text='Flash Firmware')
-        self.flash_btn.grid(row=10, column=1, columnspan=5, padx=10, pady=5, sticky="w")
+        self.flash_btn.grid(row=11, column=1, padx=10, pady=5, sticky="w")
+
+        self.batch_flash_btn = CTkButton(self, text='Batch Flash')
+        self.batch_flash_btn.grid(row=11, column=2, padx=10, pady=5, sticky="w")
+
+        self.cancel_btn = CTkButton(self, text='Cancel', fg_color=FRAME_BTN_COLOR_ERASE)
+        self.cancel_btn.grid(row=11, column=3, padx=10, pady=5, sticky="w")
+
+        self.diff_switch = CTkSwitch(self, text='Changed sectors only')
+        self.diff_switch.grid(row=11, column=4, padx=10, pady=5, sticky="w")
+
+        self.app_only_switch = CTkSwitch(self, text='App partition only')
+        self.app_only_switch.grid(row=11, column=5, padx=10, pady=5, sticky="w")
+
+        self.progress_bar = CTkProgressBar(self)
+        self.progress_bar.grid(row=12, column=0, columnspan=6, padx=10, pady=5, sticky="ew")
+        self.progress_bar.set(0)
+
+        self.progress_label = CTkLabel(self, text='')
+        self.progress_label.grid(row=13, column=0, columnspan=6, padx=10, pady=5, sticky="w")
+        self.progress_label.configure(font=FONT_DESCRIPTION)
@@ -0,0 +1,121 @@
+from logging import getLogger, debug
+from customtkinter import CTkToplevel, CTkScrollableFrame, CTkFrame, CTkLabel, CTkButton, CTkCheckBox
+from typing import Callable, Dict, List
+from config.application_configuration import FONT_CATEGORY, FONT_DESCRIPTION
+
+
+logger = getLogger(__name__)
+
+
+class ToplevelBatchFlash(CTkToplevel):
+    """
+    A specialized window designed to flash the same firmware to several devices
+    at once, with the progress and result of every device in its own row.
+    """
+
+    def __init__(self,
+                 master,
+                 ports: List[str],
+                 on_start: Callable[[List[str]], None],
+                 max_parallel: int,
+                 *args, **kwargs):
+        """
+        A custom window with one row per device. This window is a child of the
+        specified parent widget (master) and includes a Label, CheckBox and Button
+        with customizable UI features.
+
+        :param ports: The serial ports of the connected devices.
+        :type ports: List[str]
+        :param on_start: The function which starts the batch flash for the selected ports.
+        :type on_start: Callable[[List[str]], None]
+        :param max_parallel: The maximum number of devices flashed at the same time.
+        :type max_parallel: int
+        """
+        super().__init__(master, *args, **kwargs)
+        debug('Create Batch Flash Toplevel')
+
+        self._on_start = on_start
+        self._max_parallel = max_parallel
+        self._checkboxes: Dict[str, CTkCheckBox] = {}
+        self._status_labels: Dict[str, CTkLabel] = {}
+
+        self.title('Batch Flash')
+        self.geometry('600x400')
+
+        self.label = CTkLabel(self, text='Batch Flash')
+        self.label.pack(padx=10, pady=10)
+        self.label.configure(font=FONT_CATEGORY)
+
+        self.device_frame = CTkScrollableFrame(self)
+        self.device_frame.pack(padx=10, pady=5, fill="both", expand=True)
+        self.device_frame.grid_columnconfigure(1, weight=1)
+
+        for row, port in enumerate(ports):
+            checkbox = CTkCheckBox(self.device_frame, text=port)
+            checkbox.grid(row=row, column=0, padx=10, pady=5, sticky="w")
+            checkbox.select()
+            self._checkboxes[port] = checkbox
+
+            status_label = CTkLabel(self.device_frame, text='', anchor="w")
+            status_label.grid(row=row, column=1, padx=10, pady=5, sticky="ew")
+            status_label.configure(font=FONT_DESCRIPTION)
+            self._status_labels[port] = status_label
+
+        self.summary_label = CTkLabel(self, text='')
+        self.summary_label.pack(padx=10, pady=5)
+
+        self.button_frame = CTkFrame(self, fg_color="transparent")
+        self.button_frame.pack(padx=10, pady=5)
+
+        self.start_btn = CTkButton(self.button_frame, text='Start')
+        self.start_btn.pack(side="left", padx=10, pady=5)
+        self.start_btn.configure(command=self._handle_start)
+
+    def _handle_start(self) -> None:
+        """
+        Passes the selected ports to the start handler and locks the selection.
+
+        :return: None
+        """
+        ports = [port for port, checkbox in self._checkboxes.items() if checkbox.get()]
+
+        if not ports:
+            self.summary_label.configure(text='[ERROR] No device selected')
+            return
+
+        for port, checkbox in self._checkboxes.items():
+            checkbox.configure(state='disabled')
+            self._status_labels[port].configure(text='Waiting...' if port in ports else '')
+
+        self.start_btn.configure(state='disabled')
+        parallel = min(len(ports), self._max_parallel)
+        self.summary_label.configure(text=f'Flashing {len(ports)} devices, {parallel} at a time...')
+        self._on_start(ports)
+
+    def show_status(self, port: str, message: str) -> None:
+        """
+        Shows the latest progress message of a device in its row.
+
+        :param port: The serial port of the device.
+        :type port: str
+        :param message: The status message.
+        :type message: str
+        :return: None
+        """
+        if port in self._status_labels:
+            self._status_labels[port].configure(text=message)
+
+    def show_summary(self, summary: str) -> None:
+        """
+        Shows the summary of a finished batch and allows starting a new one.
+
+        :param summary: The summary text.
+        :type summary: str
+        :return: None
+        """
+        self.summary_label.configure(text=summary.splitlines()[0])
+
+        for checkbox in self._checkboxes.values():
+            checkbox.configure(state='normal')
+
+        self.start_btn.configure(state='normal')
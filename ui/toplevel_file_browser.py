@@ -0,0 +1,218 @@
+from logging import getLogger, debug
+from customtkinter import CTkToplevel, CTkFrame, CTkLabel, CTkButton
+from tkinter import ttk, Event
+from typing import Callable, Dict, List
+from serial_plugin.serial_get_file_structure import FileEntry
+from config.application_configuration import FONT_CATEGORY, FRAME_BTN_COLOR_PLUGINS
+
+
+logger = getLogger(__name__)
+
+
+class ToplevelFileBrowser(CTkToplevel):
+    """
+    A specialized window designed to browse the device filesystem. Directories
+    are only listed when they are expanded.
+
+    :ivar _PLACEHOLDER: The text of the dummy child which makes unlisted directories expandable.
+    """
+    _PLACEHOLDER = '...'
+
+    def __init__(self,
+                 master,
+                 port: str,
+                 loader: Callable[[str, bool], None],
+                 on_upload: Callable[[str], None],
+                 on_download: Callable[[str], None],
+                 *args, **kwargs):
+        """
+        A custom window with a tree view of the device filesystem. This window
+        is a child of the specified parent widget (master) and includes a
+        Label, Treeview and Button with customizable UI features.
+
+        :param port: The serial port of the device.
+        :type port: str
+        :param loader: The function which requests the entries of a directory, with a refresh flag.
+        :type loader: Callable[[str, bool], None]
+        :param on_upload: The function which uploads a local file into the given device directory.
+        :type on_upload: Callable[[str], None]
+        :param on_download: The function which downloads the given device file.
+        :type on_download: Callable[[str], None]
+        """
+        super().__init__(master, *args, **kwargs)
+        debug('Create File Browser Toplevel')
+
+        self.port = port
+        self._loader = loader
+        self._on_download = on_download
+        self._nodes: Dict[str, str] = {}
+        self._paths: Dict[str, str] = {}
+        self._loaded: Dict[str, bool] = {}
+
+        self.title(f'File Structure: {port}')
+        self.geometry('500x400')
+
+        self.label = CTkLabel(self, text='File Structure')
+        self.label.pack(padx=10, pady=10)
+        self.label.configure(font=FONT_CATEGORY)
+
+        self.tree = ttk.Treeview(self, columns=("size",), selectmode="browse")
+        self.tree.heading("#0", text="Name", anchor="w")
+        self.tree.heading("size", text="Size", anchor="e")
+        self.tree.column("size", width=100, anchor="e", stretch=False)
+        self.tree.pack(padx=10, pady=5, fill="both", expand=True)
+        self.tree.bind("<<TreeviewOpen>>", self._handle_open)
+
+        self.status_label = CTkLabel(self, text='')
+        self.status_label.pack(padx=10, pady=5)
+
+        self.button_frame = CTkFrame(self, fg_color="transparent")
+        self.button_frame.pack(padx=10, pady=5)
+
+        self.refresh_btn = CTkButton(self.button_frame, text='Refresh', fg_color=FRAME_BTN_COLOR_PLUGINS)
+        self.refresh_btn.pack(side="left", padx=10, pady=5)
+        self.refresh_btn.configure(command=self.refresh)
+
+        self.upload_btn = CTkButton(self.button_frame, text='Upload', fg_color=FRAME_BTN_COLOR_PLUGINS)
+        self.upload_btn.pack(side="left", padx=10, pady=5)
+        self.upload_btn.configure(command=lambda: on_upload(self._selected_directory()))
+
+        self.download_btn = CTkButton(self.button_frame, text='Download', fg_color=FRAME_BTN_COLOR_PLUGINS)
+        self.download_btn.pack(side="left", padx=10, pady=5)
+        self.download_btn.configure(command=self._handle_download)
+
+        self._nodes['/'] = ''
+        self._paths[''] = '/'
+
+    def request(self, path: str, refresh: bool) -> None:
+        """
+        Requests the entries of a directory from the loader.
+
+        :param path: The device directory path.
+        :type path: str
+        :param refresh: Whether a cached listing is bypassed.
+        :type refresh: bool
+        :return: None
+        """
+        self.status_label.configure(text=f'Loading {path}...')
+        self._loader(path, refresh)
+
+    def _handle_open(self, event: Event) -> None:
+        """
+        Lists a directory the first time its node is expanded.
+
+        :param event: The event instance is triggering this method
+        :type event: Event
+        :return: None
+        """
+        _ = event
+
+        path = self._paths.get(self.tree.focus())
+
+        if path and not self._loaded.get(path):
+            self.request(path, refresh=False)
+
+    def _selected_directory(self) -> str:
+        """
+        Returns the selected directory, the parent of a selected file, or the root.
+
+        :return: The device directory path.
+        :rtype: str
+        """
+        path = self._paths.get(self.tree.focus(), '/')
+
+        if path in self._loaded:
+            return path
+
+        return path.rsplit('/', 1)[0] or '/'
+
+    def _handle_download(self) -> None:
+        """
+        Passes the selected file to the download handler.
+
+        :return: None
+        """
+        path = self._paths.get(self.tree.focus())
+
+        if not path or path in self._loaded:
+            self.show_error('Select a file to download')
+            return
+
+        self._on_download(path)
+
+    def refresh(self) -> None:
+        """
+        Lists the selected directory again. Changed subdirectories are collapsed and
+        listed again when they are expanded.
+
+        :return: None
+        """
+        self.request(self._selected_directory(), refresh=True)
+
+    def show_entries(self, path: str, entries: List[FileEntry]) -> None:
+        """
+        Replaces the children of a directory node with the given entries.
+
+        :param path: The device directory path.
+        :type path: str
+        :param entries: The entries of the directory.
+        :type entries: List[FileEntry]
+        :return: None
+        """
+        parent = self._nodes.get(path)
+        if parent is None:
+            return
+
+        for child in self.tree.get_children(parent):
+            self._forget(child)
+            self.tree.delete(child)
+
+        for entry in entries:
+            size = '' if entry.is_dir else str(entry.size)
+            node = self.tree.insert(parent, "end", text=entry.name, values=(size,))
+            self._nodes[entry.path] = node
+            self._paths[node] = entry.path
+
+            if entry.is_dir:
+                self._loaded[entry.path] = False
+                self.tree.insert(node, "end", text=self._PLACEHOLDER)
+
+        self._loaded[path] = True
+        self.status_label.configure(text=f'{path}: {len(entries)} entries')
+
+    def _forget(self, node: str) -> None:
+        """
+        Forgets the paths of a node and all its descendants.
+
+        :param node: The tree node identifier.
+        :type node: str
+        :return: None
+        """
+        for child in self.tree.get_children(node):
+            self._forget(child)
+
+        path = self._paths.pop(node, None)
+
+        if path:
+            self._nodes.pop(path, None)
+            self._loaded.pop(path, None)
+
+    def show_status(self, message: str) -> None:
+        """
+        Shows a message in the status line, e.g. the progress of a transfer.
+
+        :param message: The status message.
+        :type message: str
+        :return: None
+        """
+        self.status_label.configure(text=message)
+
+    def show_error(self, message: str) -> None:
+        """
+        Shows an error message in the status line.
+
+        :param message: The error message.
+        :type message: str
+        :return: None
+        """
+        self.status_label.configure(text=f'[ERROR] {message}')